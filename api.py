@@ -0,0 +1,482 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from database import FINANCIAL_RECORD_INSERT, REPORT_QUERIES, STOCK_INSERT, STOCK_UPSERT
+from database import financial_record_row, stock_row
+from invoicing import init_worker, render_one
+from paging import FILTER_COLUMNS, keyset_filters, keyset_query, sort_key
+from models import INVOICE_NUMBER, INVOICE_NUMBER_ERROR, FinancialRecord, Invoice, StockTransaction
+from reports import LedgerAnalytics, REPORTS, run_report
+
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+MAX_BODY = 16 * 1024 * 1024
+# Write requests committed together in one transaction at most
+MAX_BATCH = 256
+# LedgerAnalytics snapshots kept per date range until the database changes
+ANALYTICS_CACHE = 8
+
+# Columns returned by GET /stock and /financial_records; money in integer cents
+API_COLUMNS = {
+    'stock': ('id', 'date', 'transaction_type', 'vendor_name', 'item_name', 'quantity', 'unit_price_cents',
+              'total_price_cents'),
+    'financial_records': ('id', 'type', 'date', 'category', 'description', 'amount_cents', 'verified'),
+}
+# REPORT_QUERIES name -> query parameter for its first (non-date) argument
+REPORT_FILTERS = {
+    'records_by_type': 'type',
+    'totals_by_category': 'type',
+    'category_total': 'category',
+    'stock_by_item': 'item_name',
+    'vendor_totals': 'vendor_name',
+}
+FIRST_DAY, LAST_DAY = '0001-01-01', '9999-12-31'
+
+
+def _slug(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+# URL slug -> reports.REPORTS name, e.g. monthly-p-l -> 'Monthly P&L'
+ANALYTICS = {_slug(name): name for name in REPORTS}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_stock(values):
+    return StockTransaction(
+        date=date.fromisoformat(str(values['date'])),
+        transaction_type=str(values['transaction_type']).strip().capitalize(),
+        vendor_name=str(values['vendor_name']),
+        item_name=str(values['item_name']),
+        quantity=float(values['quantity']),
+        unit_price=values['unit_price']
+    )
+
+
+def _parse_financial_record(values):
+    return FinancialRecord(
+        record_type=str(values['type']).strip().lower(),
+        date=date.fromisoformat(str(values['date'])),
+        category=str(values['category']),
+        description=str(values.get('description') or ''),
+        amount=values['amount']
+    )
+
+
+# table -> (JSON object -> model, model -> insert row)
+PARSERS = {
+    'stock': (_parse_stock, stock_row),
+    'financial_records': (_parse_financial_record, financial_record_row),
+}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'item'):
+        return value.item()  # NumPy scalars from the analytics reports
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# Funnels every write through one thread and one connection. Jobs that queue up
+# while a group is committing go into the next BEGIN IMMEDIATE ... COMMIT
+# together, each inside its own SAVEPOINT so a failing request rolls back alone;
+# under load one fsync covers many requests. A job is fn(conn) -> result
+class WriteCoalescer:
+    def __init__(self, db, max_batch=MAX_BATCH):
+        self.db = db
+        self.max_batch = max_batch
+        self.groups = 0
+        self.jobs = 0
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='api-writer')
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, job):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            outcomes = await loop.run_in_executor(self._executor, self._commit, [job for job, _ in batch])
+            self.groups += 1
+            self.jobs += len(batch)
+            for (_, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _commit(self, jobs):
+        outcomes = []
+        try:
+            with self.db.transaction() as conn:
+                for job in jobs:
+                    conn.execute("SAVEPOINT api_write")
+                    try:
+                        outcomes.append((True, job(conn)))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO api_write")
+                        outcomes.append((False, e))
+                    conn.execute("RELEASE api_write")
+        except sqlite3.Error as e:
+            logging.error(f"API write group of {len(jobs)} requests failed: {str(e)}")
+            return [(False, e)] * len(jobs)
+        return outcomes
+
+
+def _insert_job(table, rows, upsert):
+    # rows: [(input index, insert row)]; constraint violations reject single rows
+    if table == 'stock':
+        query = STOCK_UPSERT if upsert else STOCK_INSERT
+    else:
+        query = FINANCIAL_RECORD_INSERT
+    query += " RETURNING id"
+
+    def job(conn):
+        ids, rejects = [], []
+        for index, row in rows:
+            try:
+                ids.append(conn.execute(query, row).fetchone()[0])
+            except sqlite3.IntegrityError as e:
+                rejects.append((index, [str(e)]))
+        return ids, rejects
+    return job
+
+
+# Local JSON-over-HTTP service on top of a pooled Database (readers > 0), on
+# asyncio streams with HTTP/1.1 keep-alive and no dependencies. Reads run on a
+# thread per reader connection, writes go through a WriteCoalescer and invoice
+# PDFs are rendered in a process pool. Routes:
+#   GET  /health
+#   GET  /stock, /financial_records     ?sort= &order=desc &<filter column>= &start= &end= &limit= &after=
+#   POST /stock (?upsert=1), /financial_records   one JSON object or a list
+#   GET  /reports, /reports/<query>     ?<filter>= &start= &end=
+#   GET  /analytics/<report slug>       ?start= &end=
+#   POST /invoices                      an invoice spec as for 'cli.py invoices'
+#   GET  /invoices/<number>
+class ApiServer:
+    def __init__(self, db, host='127.0.0.1', port=DEFAULT_PORT, invoice_dir='invoices', logo_path=None,
+                 render_workers=None, max_batch=MAX_BATCH):
+        if not db.readers:
+            raise ValueError("ApiServer needs a pooled Database (readers > 0)")
+        self.db = db
+        self.host = host
+        self.port = port
+        self.invoice_dir = Path(invoice_dir)
+        self.logo_path = logo_path
+        self.render_workers = render_workers
+        self.writes = WriteCoalescer(db, max_batch)
+        self._reads = ThreadPoolExecutor(max_workers=db.readers, thread_name_prefix='api-reader')
+        self._renderer = None
+        self._server = None
+        self._analytics = {}
+        self._version_conn = None
+        self._routes = [
+            ('GET', re.compile(r'/health'), self._health),
+            ('GET', re.compile(r'/(stock|financial_records)'), self._list_rows),
+            ('POST', re.compile(r'/(stock|financial_records)'), self._add_rows),
+            ('GET', re.compile(r'/reports'), self._list_reports),
+            ('GET', re.compile(r'/reports/(\w+)'), self._report),
+            ('GET', re.compile(r'/analytics/([\w-]+)'), self._run_analytics),
+            ('POST', re.compile(r'/invoices'), self._create_invoice),
+            ('GET', re.compile(r'/invoices/([^/]+)'), self._get_invoice),
+        ]
+
+    async def start(self):
+        self.writes.start()
+        self._server = await asyncio.start_server(self._client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info(f"API listening on {self.host}:{self.port}")
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.writes.close()
+        self._reads.shutdown(wait=True)
+        if self._renderer is not None:
+            self._renderer.shutdown(wait=True)
+        if self._version_conn is not None:
+            self._version_conn.close()
+        logging.info("API stopped")
+
+    async def _read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._reads, fn, *args)
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "Malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {'error': f"Body larger than {MAX_BODY} bytes"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                status, payload = await self._dispatch(method.upper(), target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=_json_default).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip('/') or '/'
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        allowed = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.fullmatch(path)
+            if not match:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            try:
+                return await handler(*match.groups(), query=query, body=body)
+            except ApiError as e:
+                return e.status, {'error': str(e)}
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                return 400, {'error': f"{type(e).__name__}: {e}"}
+            except sqlite3.Error as e:
+                logging.error(f"API {method} {path} failed: {str(e)}")
+                return 503, {'error': f"Database error: {e}"}
+            except Exception as e:
+                logging.error(f"API {method} {path} failed: {type(e).__name__}: {str(e)}")
+                return 500, {'error': f"{type(e).__name__}: {e}"}
+        if allowed:
+            return 405, {'error': f"{method} not allowed on {path}"}
+        return 404, {'error': f"No route for {path}"}
+
+    async def _health(self, query, body):
+        return 200, {
+            'status': 'ok',
+            'write_groups': self.writes.groups,
+            'write_requests': self.writes.jobs,
+            'readers': self.db.readers,
+        }
+
+    def _select_rows(self, table, query):
+        key = sort_key(table, query.get('sort', 'id'))
+        order = query.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ApiError(400, "order must be asc or desc")
+        filters = {column: query[column] for column in FILTER_COLUMNS[table] if column in query}
+        clauses, params = keyset_filters(table, filters, query.get('start'), query.get('end'))
+        after = json.loads(query['after']) if 'after' in query else None
+        if after is not None and (not isinstance(after, list) or len(after) != len(key)):
+            raise ApiError(400, f"after must be the 'next' value of the previous page ({len(key)} values)")
+        limit = max(1, min(int(query.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+        columns = API_COLUMNS[table]
+        sql, params = keyset_query(table, columns + key, key, clauses, params, after, order == 'desc', limit)
+        with self.db.reader() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        width = len(columns)
+        return {
+            'rows': [dict(zip(columns, row[:width])) for row in rows],
+            # Pass back as ?after= (JSON) for the following page
+            'next': json.dumps(list(rows[-1][width:])) if len(rows) == limit else None,
+        }
+
+    async def _list_rows(self, table, query, body):
+        return 200, await self._read(self._select_rows, table, query)
+
+    async def _add_rows(self, table, query, body):
+        payload = json.loads(body or b'null')
+        items = payload if isinstance(payload, list) else [payload]
+        parse, to_row = PARSERS[table]
+        rows, rejects = [], []
+        for index, values in enumerate(items):
+            try:
+                record = parse(values)
+                errors = record.validate()
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                errors = [f"Could not parse record: {type(e).__name__}: {e}"]
+            if errors:
+                rejects.append((index, errors))
+            else:
+                rows.append((index, to_row(record)))
+        ids = []
+        if rows:
+            upsert = table == 'stock' and query.get('upsert') in ('1', 'true')
+            ids, failed = await self.writes.submit(_insert_job(table, rows, upsert))
+            rejects = sorted(rejects + failed)
+        result = {'ids': ids, 'rejected': [{'index': index, 'errors': errors} for index, errors in rejects]}
+        return (201 if ids else 422), result
+
+    async def _list_reports(self, query, body):
+        return 200, {'queries': {name: REPORT_FILTERS[name] for name in REPORT_QUERIES},
+                     'analytics': sorted(ANALYTICS)}
+
+    async def _report(self, name, query, body):
+        if name not in REPORT_QUERIES:
+            raise ApiError(404, f"Unknown report {name!r}")
+        value = query.get(REPORT_FILTERS[name])
+        if value is None:
+            raise ApiError(400, f"Report {name} needs ?{REPORT_FILTERS[name]}=")
+        params = (value, query.get('start') or FIRST_DAY, query.get('end') or LAST_DAY)
+        rows = await self._read(self.db.report_query, name, params)
+        return 200, {'rows': [list(row) for row in rows]}
+
+    def _data_version(self):
+        # PRAGMA data_version on a connection that never writes changes with
+        # every commit from any other connection: this server's writer, but also
+        # cli.py import, the desktop app or the archiver in other processes
+        if self._version_conn is None:
+            self._version_conn = sqlite3.connect(f"{self.db.db_path.resolve().as_uri()}?mode=ro", uri=True)
+        return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    async def _ledger(self, start, end):
+        # One LedgerAnalytics load per date range, shared by concurrent requests
+        # and reused until the database next changes
+        key = (start, end)
+        version = self._data_version()
+        entry = self._analytics.get(key)
+        if entry is None or entry[0] != version:
+            future = asyncio.ensure_future(self._read(LedgerAnalytics, self.db, start, end))
+            entry = self._analytics[key] = (version, future)
+            while len(self._analytics) > ANALYTICS_CACHE:
+                self._analytics.pop(next(iter(self._analytics)))
+        try:
+            return await entry[1]
+        except Exception:
+            self._analytics.pop(key, None)
+            raise
+
+    async def _run_analytics(self, slug, query, body):
+        name = ANALYTICS.get(slug)
+        if name is None:
+            raise ApiError(404, f"Unknown analytics report {slug!r}; choose from {sorted(ANALYTICS)}")
+        analytics = await self._ledger(query.get('start'), query.get('end'))
+        columns, rows = await self._read(run_report, analytics, name)
+        return 200, {'report': name, 'columns': list(columns), 'rows': [list(row) for row in rows]}
+
+    def _render_pool(self):
+        if self._renderer is None:
+            # spawn: this process has live threads and SQLite connections a fork would copy
+            self._renderer = ProcessPoolExecutor(
+                max_workers=self.render_workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker, initargs=(self.logo_path,)
+            )
+        return self._renderer
+
+    async def _create_invoice(self, query, body):
+        spec = json.loads(body or b'null')
+        if not isinstance(spec, dict):
+            raise ApiError(400, "Expected an invoice spec object")
+        if spec.get('tax_rate') is None:
+            spec['tax_rate'] = await self._read(self.db.config.tax_rate)
+        errors = Invoice(
+            str(spec.get('customer_name') or ''), str(spec.get('customer_address') or ''),
+            spec.get('items') or [], float(spec['tax_rate'])
+        ).validate()
+        if errors:
+            raise ApiError(400, '; '.join(errors))
+        if spec.get('number') and not INVOICE_NUMBER.fullmatch(str(spec['number'])):
+            raise ApiError(400, INVOICE_NUMBER_ERROR)
+        spec['date'] = str(spec.get('date') or date.today().isoformat())
+        claim = [(spec.get('number') or None, spec['date'], spec['customer_name'])]
+        try:
+            (number,) = await self.writes.submit(lambda conn: self.db.claim_invoices(claim, conn))
+        except ValueError as e:
+            raise ApiError(409, str(e))
+        job = ({**spec, 'number': number, 'logo_path': spec.get('logo_path', self.logo_path)}, str(self.invoice_dir))
+        loop = asyncio.get_running_loop()
+        success, detail, totals = False, None, None
+        try:
+            self.invoice_dir.mkdir(parents=True, exist_ok=True)
+            _, success, detail, totals = await loop.run_in_executor(self._render_pool(), render_one, job)
+        finally:
+            # totals stay None unless rendering finished, so a broken pool or a
+            # cancelled request voids the claim instead of leaving it pending
+            await self.writes.submit(lambda conn: self.db.complete_invoices([(number, detail, totals)], conn))
+        if not success:
+            logging.error(f"Invoice {number} failed: {detail}")
+            return 500, {'number': number, 'status': 'void', 'error': detail}
+        return 201, {
+            'number': number, 'status': 'issued', 'path': detail,
+            'subtotal_cents': totals['subtotal'], 'tax_cents': totals['tax'], 'total_cents': totals['total'],
+        }
+
+    async def _get_invoice(self, number, query, body):
+        invoice = await self._read(self.db.find_invoice, number)
+        if invoice is None:
+            raise ApiError(404, f"No invoice {number}")
+        return 200, invoice
+
+
+async def serve(db, host='127.0.0.1', port=DEFAULT_PORT, **options):
+    # Runs an ApiServer until cancelled (Ctrl+C under asyncio.run)
+    server = ApiServer(db, host, port, **options)
+    await server.start()
+    print(f"Serving on http://{server.host}:{server.port}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
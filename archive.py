@@ -0,0 +1,412 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import stat
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ARCHIVED_TABLES = ('stock', 'financial_records')
+# Summed into each archive's checksum next to the row count
+CHECKSUM_COLUMNS = {'stock': 'total_price_cents', 'financial_records': 'amount_cents'}
+# Delete triggers suspended while a year moves out: archived rows still count
+# towards the daily totals and inventory history, they only live in another file
+SUSPENDED_TRIGGERS = ('financial_daily_totals_delete', 'inventory_dirty_delete', 'stock_verified_delete')
+ALIAS_PREFIX = 'archive_'
+# SQLite's default SQLITE_MAX_ATTACHED, for Pythons without Connection.getlimit
+DEFAULT_ATTACH_LIMIT = 10
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def fiscal_year(year, start_month=1):
+    # (first day, last day) of the fiscal year that begins in calendar year `year`
+    first = date(year, start_month, 1)
+    return first, date(year + 1, start_month, 1) - timedelta(days=1)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_only_uri(path):
+    return f"{Path(path).resolve().as_uri()}?mode=ro"
+
+
+def _attach_limit(conn):
+    try:
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    except AttributeError:
+        return DEFAULT_ATTACH_LIMIT
+
+
+def _alias(years):
+    # Schema name of the file holding `years` (its archived years, oldest first)
+    return f"{ALIAS_PREFIX}{years[0]}" if len(years) == 1 else f"{ALIAS_PREFIX}{years[0]}_{years[-1]}"
+
+
+def _totals(conn, schema, first, last):
+    # {table: (rows, checksum cents)} for rows dated in [first, last]
+    return {
+        table: tuple(conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM({column}), 0) FROM {schema}.{table} WHERE date BETWEEN ? AND ?",
+            (first, last)
+        ).fetchone())
+        for table, column in CHECKSUM_COLUMNS.items()
+    }
+
+
+# Closed fiscal years of stock and financial_records, moved out of the hot
+# database into one read-only SQLite file per year under archive/. Rows keep
+# their ids, so AUTOINCREMENT never reuses one and exports keep them.
+# archived_years records every file with its date range, row counts, money
+# checksums and SHA-256. The files never change once written, so routine
+# backups (which copy only the main database) leave them out. Once there are
+# more files than SQLite can attach at once, compact() merges the oldest into
+# one, so a query over every year (inventory replays) can still reach them all.
+#
+# source() is the query router: for a date range that touches no archived
+# year it returns the plain table name, so the hot path is untouched;
+# otherwise it ATTACHes only the files of the overlapping years, read-only,
+# and returns a UNION ALL subquery over main and those files.
+class ArchiveManager:
+    def __init__(self, db, archive_dir=None, start_month=1):
+        self.db = db
+        self.archive_dir = Path(archive_dir) if archive_dir else Path(db.db_path).parent / 'archive'
+        self.start_month = start_month
+        self._years = None
+        self._columns = {}
+
+    def invalidate(self):
+        self._years = None
+        self._columns = {}
+
+    def years(self, conn=None):
+        # {year: (first_day, last_day, file name)}; conn lets callers that already
+        # hold a connection avoid taking a second one from the reader pool
+        years = self._years
+        if years is not None:
+            return years
+        if conn is None:
+            with self.db.reader() as conn:
+                return self.years(conn)
+        rows = conn.execute("SELECT year, first_day, last_day, file FROM archived_years ORDER BY year").fetchall()
+        self._years = {year: (first, last, name) for year, first, last, name in rows}
+        return self._years
+
+    def files(self, conn=None):
+        # {file name: [archived years it holds]}, oldest first
+        files = {}
+        for year, (_, _, name) in self.years(conn).items():
+            files.setdefault(name, []).append(year)
+        return files
+
+    def path(self, name):
+        return self.archive_dir / name
+
+    def overlapping(self, conn, start=None, end=None):
+        start = None if start is None else str(start)
+        end = None if end is None else str(end)
+        return [
+            year for year, (first, last, _) in self.years(conn).items()
+            if (end is None or first <= end) and (start is None or last >= start)
+        ]
+
+    def _attached(self, conn):
+        return {name for _, name, _ in conn.execute("PRAGMA database_list") if name.startswith(ALIAS_PREFIX)}
+
+    def attach(self, conn, years=None):
+        # ATTACHes the files holding archived years (all when None) read-only on
+        # conn, detaching ones not asked for if SQLite's attach limit would be
+        # exceeded, and returns their schema names, oldest first.
+        # SQLite refuses to ATTACH inside a transaction.
+        archived = self.years(conn)
+        files = self.files(conn)
+        wanted = {}
+        for year in sorted(archived if years is None else years):
+            name = archived[year][2]
+            wanted.setdefault(_alias(files[name]), name)
+        attached = self._attached(conn)
+        missing = [alias for alias in wanted if alias not in attached]
+        if not missing:
+            return list(wanted)
+        if conn.in_transaction:
+            raise ArchiveError("Archived years must be attached before a transaction starts")
+        limit = _attach_limit(conn)
+        if len(wanted) > limit:
+            raise ArchiveError(
+                f"The query spans {len(wanted)} archive files but SQLite attaches at most {limit}; "
+                f"run 'archive compact' to merge the oldest ones"
+            )
+        in_use = len(conn.execute("PRAGMA database_list").fetchall()) - 2  # main and temp
+        surplus = sorted(attached.difference(wanted))[:max(0, in_use + len(missing) - limit)]
+        for alias in surplus:
+            conn.execute(f"DETACH DATABASE {alias}")
+        for alias in missing:
+            path = self.path(wanted[alias])
+            if not path.exists():
+                raise ArchiveError(f"Archive file {path} is missing")
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (_read_only_uri(path),))
+        return list(wanted)
+
+    def _table_columns(self, conn, schema, table):
+        key = (schema, table)
+        columns = self._columns.get(key)
+        if columns is None:
+            columns = self._columns[key] = [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+        return columns
+
+    def parts(self, conn, table, start=None, end=None):
+        # [(schema, columns it has)] holding table's rows in [start, end]: the
+        # overlapping archive files, attached, oldest first, then main. For
+        # callers that must read each file separately instead of through source()
+        if table not in ARCHIVED_TABLES:
+            raise ValueError(f"{table!r} is not archived")
+        years = self.overlapping(conn, start, end)
+        schemas = (self.attach(conn, years) if years else []) + ['main']
+        # Archives keep the schema they were written with
+        return [(schema, self._table_columns(conn, schema, table)) for schema in schemas]
+
+    def source(self, conn, table, start=None, end=None, columns=None):
+        # FROM-clause text for table restricted to [start, end] by the caller's
+        # WHERE; callers build the query around it and keep referring to `table`.
+        # Naming the columns the query reads keeps covering indexes covering:
+        # SQLite does not prune unused columns out of a UNION ALL subquery.
+        parts = self.parts(conn, table, start, end)
+        if len(parts) == 1:
+            return table
+        columns = list(columns or parts[-1][1])
+        selects = []
+        # Oldest first, so unordered scans still come back roughly in date order
+        for schema, present in parts:
+            # Columns added after an archive was written read as NULL
+            select = ', '.join(column if column in present else f"NULL AS {column}" for column in columns)
+            selects.append(f"SELECT {select} FROM {schema}.{table}")
+        return f"({' UNION ALL '.join(selects)}) AS {table}"
+
+    def entries(self):
+        with self.db.reader() as conn:
+            cursor = conn.execute("SELECT * FROM archived_years ORDER BY year")
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def archive_year(self, year, today=None, vacuum=False):
+        # Moves every stock and financial_records row dated in fiscal year `year`
+        # into its own read-only file and returns its archived_years entry
+        first, last = (day.isoformat() for day in fiscal_year(year, self.start_month))
+        if last >= (today or date.today()).isoformat():
+            raise ArchiveError(f"Fiscal year {year} ({first} to {last}) is not closed yet")
+        if year in self.years():
+            raise ArchiveError(f"Fiscal year {year} is already archived")
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        path = self.path(f"{Path(self.db.db_path).stem}_{year}.db")
+        staging = path.with_name(f"{path.name}.tmp")
+        # Only an interrupted earlier attempt leaves these; it never reached archived_years
+        self._remove(staging, path)
+
+        try:
+            # BEGIN IMMEDIATE first: no other writer can change the year between
+            # the copy and the delete, so the checksums compare like for like
+            with self.db.transaction() as conn:
+                totals = _totals(conn, 'main', first, last)
+                if not any(rows for rows, _ in totals.values()):
+                    raise ArchiveError(f"Fiscal year {year} has no rows to archive")
+                copied = self._write_file(staging, year, first, last)
+                if copied != totals:
+                    raise ArchiveError(f"Archive copy of {year} does not match: {copied} != {totals}")
+                os.replace(staging, path)
+                os.chmod(path, READ_ONLY)
+                entry = {
+                    'year': year,
+                    'file': path.name,
+                    'first_day': first,
+                    'last_day': last,
+                    'stock_rows': totals['stock'][0],
+                    'stock_total_cents': totals['stock'][1],
+                    'record_rows': totals['financial_records'][0],
+                    'record_total_cents': totals['financial_records'][1],
+                    'sha256': file_digest(path),
+                    'archived_at': datetime.now().isoformat(timespec='seconds'),
+                }
+                triggers = conn.execute(
+                    f"SELECT sql FROM sqlite_master WHERE type = 'trigger' "
+                    f"AND name IN ({', '.join('?' * len(SUSPENDED_TRIGGERS))})", SUSPENDED_TRIGGERS
+                ).fetchall()
+                for name in SUSPENDED_TRIGGERS:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                for table in ARCHIVED_TABLES:
+                    conn.execute(f"DELETE FROM {table} WHERE date BETWEEN ? AND ?", (first, last))
+                for (sql,) in triggers:
+                    conn.execute(sql)
+                conn.execute(
+                    f"INSERT INTO archived_years ({', '.join(entry)}) VALUES ({', '.join('?' * len(entry))})",
+                    list(entry.values())
+                )
+        except BaseException:
+            self._remove(staging, path)
+            raise
+        finally:
+            self.invalidate()
+        logging.info(
+            f"Archived fiscal year {year} to {path}: {entry['stock_rows']} stock rows, "
+            f"{entry['record_rows']} financial records"
+        )
+        self.compact()
+        if vacuum:
+            self.db.vacuum()
+        return entry
+
+    def _remove(self, *paths):
+        for leftover in paths:
+            if leftover.exists():
+                os.chmod(leftover, stat.S_IWUSR | READ_ONLY)
+                leftover.unlink()
+
+    def _hot_schema(self, out):
+        # (table, index) CREATE statements of the hot tables, with hot attached on out
+        schema = out.execute(
+            f"SELECT type, sql FROM hot.sqlite_master WHERE tbl_name IN ({', '.join('?' * len(ARCHIVED_TABLES))}) "
+            "AND type IN ('table', 'index') AND sql IS NOT NULL", ARCHIVED_TABLES
+        ).fetchall()
+        return [sql for kind, sql in schema if kind == 'table'], [sql for kind, sql in schema if kind == 'index']
+
+    def _write_file(self, staging, year, first, last):
+        # A new database holding the year's rows under the hot tables' own
+        # schema and indexes; returns its totals for comparison
+        with closing(sqlite3.connect(staging)) as out:
+            out.execute("ATTACH DATABASE ? AS hot", (_read_only_uri(self.db.db_path),))
+            tables, indexes = self._hot_schema(out)
+            with out:
+                for sql in tables:
+                    out.execute(sql)
+                for table in ARCHIVED_TABLES:
+                    out.execute(f"INSERT INTO main.{table} SELECT * FROM hot.{table} WHERE date BETWEEN ? AND ?",
+                                (first, last))
+                # Indexes after the bulk copy, which is cheaper than maintaining them row by row
+                for sql in indexes:
+                    out.execute(sql)
+                out.execute("CREATE TABLE archive_info (key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+                out.executemany("INSERT INTO archive_info (key, value) VALUES (?, ?)", [
+                    ('fiscal_year', year), ('first_day', first), ('last_day', last),
+                    ('source', Path(self.db.db_path).name),
+                ])
+            copied = _totals(out, 'main', first, last)
+            out.execute("DETACH DATABASE hot")
+            out.execute("ANALYZE")
+        return copied
+
+    def compact(self, limit=None):
+        # Merges the oldest archive files into one so that no more than `limit`
+        # (default: SQLite's attach limit) remain. Every year keeps its
+        # archived_years entry, pointing at the merged file. Returns the merged years
+        with self.db.reader() as conn:
+            limit = limit or _attach_limit(conn)
+            files = self.files(conn)
+            archived = self.years(conn)
+        if len(files) <= limit:
+            return []
+        merged = list(files)[:len(files) - limit + 1]
+        years = [year for name in merged for year in files[name]]
+        path = self.path(f"{Path(self.db.db_path).stem}_{years[0]}-{years[-1]}.db")
+        staging = path.with_name(f"{path.name}.tmp")
+        self._remove(staging, path)
+        expected = {entry['year']: entry for entry in self.entries() if entry['year'] in years}
+
+        try:
+            with closing(sqlite3.connect(staging)) as out:
+                out.execute("ATTACH DATABASE ? AS hot", (_read_only_uri(self.db.db_path),))
+                tables, indexes = self._hot_schema(out)
+                with out:
+                    for sql in tables:
+                        out.execute(sql)
+                    for name in merged:
+                        # One at a time, whatever the number of files being merged
+                        out.execute("ATTACH DATABASE ? AS part", (_read_only_uri(self.path(name)),))
+                        for table in ARCHIVED_TABLES:
+                            present = {row[1] for row in out.execute(f"PRAGMA part.table_info({table})")}
+                            columns = ', '.join(row[1] for row in out.execute(f"PRAGMA main.table_info({table})")
+                                                if row[1] in present)
+                            out.execute(f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM part.{table}")
+                        out.commit()
+                        out.execute("DETACH DATABASE part")
+                    for sql in indexes:
+                        out.execute(sql)
+                    out.execute("CREATE TABLE archive_info (key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+                    out.executemany("INSERT INTO archive_info (key, value) VALUES (?, ?)", [
+                        ('fiscal_years', f"{years[0]}-{years[-1]}"), ('first_day', archived[years[0]][0]),
+                        ('last_day', archived[years[-1]][1]), ('source', Path(self.db.db_path).name),
+                    ])
+                for year, entry in expected.items():
+                    copied = _totals(out, 'main', entry['first_day'], entry['last_day'])
+                    counts = {
+                        'stock': (entry['stock_rows'], entry['stock_total_cents']),
+                        'financial_records': (entry['record_rows'], entry['record_total_cents']),
+                    }
+                    if copied != counts:
+                        raise ArchiveError(f"Merged copy of {year} does not match: {copied} != {counts}")
+                out.execute("DETACH DATABASE hot")
+                out.execute("ANALYZE")
+            os.replace(staging, path)
+            os.chmod(path, READ_ONLY)
+            with self.db.transaction() as conn:
+                conn.execute(
+                    f"UPDATE archived_years SET file = ?, sha256 = ? WHERE year IN ({', '.join('?' * len(years))})",
+                    [path.name, file_digest(path), *years]
+                )
+        except BaseException:
+            self._remove(staging, path)
+            raise
+        finally:
+            self.invalidate()
+        for name in merged:
+            try:
+                self._remove(self.path(name))
+            except OSError as e:
+                # Still attached elsewhere (Windows); nothing refers to it any more
+                logging.warning(f"Could not remove merged archive file {name}: {str(e)}")
+        logging.info(f"Merged archived years {years[0]}..{years[-1]} into {path}")
+        return years
+
+    def verify(self, year=None):
+        # {year: [problems]} for one archived year or all of them; empty lists are healthy
+        entries = [entry for entry in self.entries() if year is None or entry['year'] == year]
+        if year is not None and not entries:
+            raise ArchiveError(f"Fiscal year {year} is not archived")
+        results = {}
+        digests = {}  # merged files hold several years
+        for entry in entries:
+            problems = []
+            path = self.path(entry['file'])
+            if not path.exists():
+                results[entry['year']] = [f"missing file {path}"]
+                continue
+            if path not in digests:
+                digests[path] = file_digest(path)
+            if digests[path] != entry['sha256']:
+                problems.append("SHA-256 differs from archived_years")
+            try:
+                with closing(sqlite3.connect(_read_only_uri(path), uri=True)) as conn:
+                    totals = _totals(conn, 'main', entry['first_day'], entry['last_day'])
+                    check = conn.execute("PRAGMA quick_check").fetchone()[0]
+            except sqlite3.Error as e:
+                results[entry['year']] = problems + [f"unreadable: {e}"]
+                continue
+            if check != 'ok':
+                problems.append(f"quick_check: {check}")
+            expected = {
+                'stock': (entry['stock_rows'], entry['stock_total_cents']),
+                'financial_records': (entry['record_rows'], entry['record_total_cents']),
+            }
+            for table, counts in expected.items():
+                if totals[table] != counts:
+                    problems.append(f"{table} holds {totals[table]}, archived_years says {counts}")
+            results[entry['year']] = problems
+        return results
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Small enough that a day of appended entries touches only a handful of blocks
+BLOCK_SIZE = 64 * 1024
+# How many snapshots to keep per bucket: the newest in each of the last
+# 24 hours, 7 days and 4 ISO weeks survives pruning
+DEFAULT_RETENTION = {'hourly': 24, 'daily': 7, 'weekly': 4}
+RETENTION_BUCKETS = {
+    'hourly': lambda created: created.strftime('%Y-%m-%d %H'),
+    'daily': lambda created: created.strftime('%Y-%m-%d'),
+    'weekly': lambda created: '%d-W%02d' % created.isocalendar()[:2],
+}
+MANIFEST_TIME_FORMAT = '%Y%m%d_%H%M%S_%f'
+# One lock per backup directory: overlapping create() and prune() calls (the
+# startup backup and File > Backup run as separate tasks) would otherwise
+# prune each other's freshly stored blocks before their manifests exist
+_DIR_LOCKS = {}
+_DIR_LOCKS_GUARD = threading.Lock()
+
+
+class BackupError(Exception):
+    pass
+
+
+def _dir_lock(path):
+    with _DIR_LOCKS_GUARD:
+        return _DIR_LOCKS.setdefault(str(Path(path).resolve()), threading.RLock())
+
+
+def _write_atomic(path, data):
+    temp_path = path.with_name(f"{path.name}.tmp")
+    with open(temp_path, 'wb') as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_path, path)
+
+
+# Deduplicated, compressed snapshots of a Database. A snapshot is copied with
+# sqlite3's online backup API a few pages at a time, then cut into fixed-size
+# blocks stored zlib-compressed under their SHA-256, so blocks unchanged since
+# an earlier snapshot cost nothing. Each snapshot is a JSON manifest listing its
+# blocks; pruning drops manifests outside the retention policy and any blocks
+# no remaining manifest references.
+class BackupManager:
+    def __init__(self, db, backup_dir=None, block_size=BLOCK_SIZE, retention=None):
+        self.db = db
+        self.backup_dir = Path(backup_dir) if backup_dir else Path(db.db_path).parent / 'backups'
+        self.block_dir = self.backup_dir / 'blocks'
+        self.manifest_dir = self.backup_dir / 'manifests'
+        self.block_size = block_size
+        self.retention = retention or DEFAULT_RETENTION
+
+    def _block_path(self, digest):
+        return self.block_dir / digest[:2] / f"{digest}.z"
+
+    def create(self, progress=None, pages=1024):
+        # progress(remaining, total) follows the page copy; raising from it aborts
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        with _dir_lock(self.backup_dir):
+            return self._create(progress, pages)
+
+    def _create(self, progress, pages):
+        created = datetime.now()
+        # A name of its own, so not even another process's backup can touch it
+        handle, snapshot_path = tempfile.mkstemp(dir=self.backup_dir, prefix='snapshot_', suffix='.tmp')
+        os.close(handle)
+        snapshot_path = Path(snapshot_path)
+        try:
+            with sqlite3.connect(snapshot_path) as snapshot, self.db.reader() as source:
+                source.backup(
+                    snapshot, pages=pages,
+                    progress=(lambda status, remaining, total: progress(remaining, total)) if progress else None
+                )
+            snapshot.close()
+            manifest = self._store_blocks(snapshot_path, created)
+        finally:
+            snapshot_path.unlink(missing_ok=True)
+
+        manifest_path = self.manifest_dir / f"{created.strftime(MANIFEST_TIME_FORMAT)}.json"
+        _write_atomic(manifest_path, json.dumps(manifest, indent=1).encode())
+        logging.info(
+            f"Backup {manifest_path.name}: {manifest['size']} bytes in {len(manifest['blocks'])} blocks, "
+            f"{manifest['new_blocks']} new ({manifest['stored_bytes']} bytes stored)"
+        )
+        self.prune(now=created)
+        return manifest_path.name, manifest
+
+    def _store_blocks(self, snapshot_path, created):
+        whole = hashlib.sha256()
+        blocks = []
+        new_blocks = stored_bytes = size = 0
+        with open(snapshot_path, 'rb') as handle:
+            while True:
+                block = handle.read(self.block_size)
+                if not block:
+                    break
+                size += len(block)
+                whole.update(block)
+                digest = hashlib.sha256(block).hexdigest()
+                blocks.append(digest)
+                path = self._block_path(digest)
+                if not path.exists():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    compressed = zlib.compress(block, 6)
+                    _write_atomic(path, compressed)
+                    new_blocks += 1
+                    stored_bytes += len(compressed)
+        return {
+            'created': created.isoformat(),
+            'source': str(self.db.db_path),
+            'size': size,
+            'sha256': whole.hexdigest(),
+            'block_size': self.block_size,
+            'blocks': blocks,
+            'new_blocks': new_blocks,
+            'stored_bytes': stored_bytes,
+        }
+
+    def list(self):
+        # [(name, manifest), ...] newest first
+        if not self.manifest_dir.exists():
+            return []
+        return [
+            (path.name, json.loads(path.read_text()))
+            for path in sorted(self.manifest_dir.glob('*.json'), reverse=True)
+        ]
+
+    def _load(self, name):
+        path = self.manifest_dir / name
+        if not path.exists():
+            raise BackupError(f"No backup named {name}")
+        return json.loads(path.read_text())
+
+    def prune(self, now=None):
+        with _dir_lock(self.backup_dir):
+            return self._prune(now)
+
+    def _prune(self, now):
+        snapshots = self.list()
+        if not snapshots:
+            return []
+        now = now or datetime.now()
+        keep = {snapshots[0][0]}
+        for policy, count in self.retention.items():
+            bucket_of = RETENTION_BUCKETS[policy]
+            seen = []
+            for name, manifest in snapshots:
+                created = datetime.fromisoformat(manifest['created'])
+                if created > now + timedelta(minutes=1):
+                    keep.add(name)
+                    continue
+                bucket = bucket_of(created)
+                if bucket in seen:
+                    continue
+                if len(seen) == count:
+                    break
+                seen.append(bucket)
+                keep.add(name)
+
+        removed = [name for name, _ in snapshots if name not in keep]
+        for name in removed:
+            (self.manifest_dir / name).unlink()
+        if removed:
+            self._collect_garbage()
+            logging.info(f"Pruned {len(removed)} backups by retention policy {self.retention}")
+        return removed
+
+    def _collect_garbage(self):
+        referenced = set()
+        for _, manifest in self.list():
+            referenced.update(manifest['blocks'])
+        for path in self.block_dir.glob('*/*.z'):
+            if path.stem not in referenced:
+                path.unlink()
+
+    def verify(self, name):
+        # Re-hash every block of a snapshot; returns a list of problems
+        manifest = self._load(name)
+        problems = []
+        whole = hashlib.sha256()
+        for digest in manifest['blocks']:
+            path = self._block_path(digest)
+            if not path.exists():
+                problems.append(f"missing block {digest}")
+                continue
+            block = zlib.decompress(path.read_bytes())
+            if hashlib.sha256(block).hexdigest() != digest:
+                problems.append(f"corrupt block {digest}")
+            whole.update(block)
+        if not problems and whole.hexdigest() != manifest['sha256']:
+            problems.append("snapshot checksum mismatch")
+        return problems
+
+    def restore(self, name, target_path, overwrite=False):
+        # Rebuilds the snapshot next to target_path, checks its SHA-256 and
+        # PRAGMA integrity_check, and only then moves it into place
+        manifest = self._load(name)
+        target_path = Path(target_path)
+        if target_path.exists() and not overwrite:
+            raise BackupError(f"Refusing to overwrite existing {target_path}")
+
+        temp_path = target_path.with_name(f"{target_path.name}.restore")
+        whole = hashlib.sha256()
+        try:
+            with open(temp_path, 'wb') as handle:
+                for digest in manifest['blocks']:
+                    path = self._block_path(digest)
+                    if not path.exists():
+                        raise BackupError(f"Backup {name} is missing block {digest}")
+                    block = zlib.decompress(path.read_bytes())
+                    whole.update(block)
+                    handle.write(block)
+                handle.flush()
+                os.fsync(handle.fileno())
+            if whole.hexdigest() != manifest['sha256']:
+                raise BackupError(f"Backup {name} failed checksum verification")
+            with sqlite3.connect(temp_path) as restored:
+                result = restored.execute("PRAGMA integrity_check").fetchone()[0]
+            restored.close()
+            if result != 'ok':
+                raise BackupError(f"Restored database failed integrity_check: {result}")
+            for suffix in ('-wal', '-shm'):
+                Path(f"{target_path}{suffix}").unlink(missing_ok=True)
+            os.replace(temp_path, target_path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        logging.info(f"Restored backup {name} to {target_path}")
+        return target_path
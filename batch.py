@@ -0,0 +1,313 @@
+import numpy as np
+
+from models import FrozenFinancialRecord, FrozenStockTransaction
+from money import MAX_CENTS, multiply_cents, to_cents
+
+STOCK_TYPES = ('Purchase', 'Sale')
+RECORD_TYPES = ('income', 'expense')
+
+
+def _type_codes(values, labels):
+    # int8 code per row, -1 for anything that is not one of labels
+    codes = np.full(len(values), -1, dtype=np.int8)
+    values = np.asarray(values, dtype=object)
+    for code, label in enumerate(labels):
+        codes[values == label] = code
+    return codes
+
+
+def _days(values):
+    # Ledgers repeat the same few thousand dates, so each distinct one is parsed once
+    parsed = {}
+    days = np.empty(len(values), dtype='datetime64[D]')
+    for index, value in enumerate(values):
+        day = parsed.get(value)
+        if day is None:
+            day = parsed[value] = np.datetime64(str(value)[:10], 'D')
+        days[index] = day
+    return days
+
+
+def _cents(values):
+    # Vectorised money.to_cents over dollar amounts: (int64 cents, unconvertible mask).
+    # Whole-cent floats are converted in NumPy; the rest go through to_cents one by one
+    cents = np.zeros(len(values), dtype=np.int64)
+    bad = np.zeros(len(values), dtype=np.bool_)
+    try:
+        dollars = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        dollars = None
+    if dollars is not None:
+        with np.errstate(invalid='ignore', over='ignore'):
+            scaled = dollars * 100
+            nearest = np.rint(scaled)
+            fast = (np.abs(scaled - nearest) < 1e-6) & (np.abs(dollars) < 1e12)
+        cents[fast] = nearest[fast].astype(np.int64)
+        slow = np.flatnonzero(~fast)
+        values = dollars
+    else:
+        slow = range(len(values))
+    for index in slow:
+        try:
+            cents[index] = to_cents(values[index].item() if dollars is not None else values[index])
+        except (TypeError, ValueError):
+            bad[index] = True
+    return cents, bad
+
+
+def _multiply(cents, quantity):
+    # Vectorised money.multiply_cents; only fractional quantities take the Decimal path
+    totals = np.zeros(len(cents), dtype=np.int64)
+    with np.errstate(invalid='ignore'):
+        whole = np.isfinite(quantity) & (quantity == np.floor(quantity)) & (np.abs(quantity) < 1e12)
+    totals[whole] = cents[whole] * quantity[whole].astype(np.int64)
+    for index in np.flatnonzero(~whole & np.isfinite(quantity)):
+        totals[index] = multiply_cents(int(cents[index]), float(quantity[index]))
+    return totals
+
+
+class Labels:
+    # Dictionary-encoded strings: int32 code per row plus one list of distinct labels
+    def __init__(self, values):
+        index = {}
+        self.codes = np.fromiter(
+            (index.setdefault(str(value), len(index)) for value in values), dtype=np.int32, count=len(values)
+        )
+        self.labels = list(index)
+
+    @classmethod
+    def from_codes(cls, codes, labels):
+        encoded = cls.__new__(cls)
+        encoded.codes = np.asarray(codes, dtype=np.int32)
+        encoded.labels = list(labels)
+        return encoded
+
+    @classmethod
+    def concat(cls, parts):
+        # One Labels over several, re-coding each part against the merged label list
+        index = {}
+        codes = []
+        for part in parts:
+            mapping = np.array([index.setdefault(label, len(index)) for label in part.labels], dtype=np.int32)
+            codes.append(mapping[part.codes] if len(mapping) else part.codes)
+        return cls.from_codes(np.concatenate(codes) if codes else (), index)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def values(self, mask=None):
+        codes = self.codes if mask is None else self.codes[mask]
+        labels = self.labels
+        return [labels[code] for code in codes.tolist()]
+
+    def blank(self):
+        # Row mask of labels that are empty after stripping, checked once per distinct label
+        empty = np.array([not label.strip() for label in self.labels], dtype=np.bool_)
+        return empty[self.codes] if len(empty) else np.zeros(len(self.codes), dtype=np.bool_)
+
+
+# Columnar batches of stock or financial_records rows: one NumPy array per
+# field (strings dictionary-encoded, money in int64 cents) instead of one
+# Python object per record. validate_batch() applies the same rules as the
+# models' validate() in a few vectorised passes and returns one row mask per
+# error message, so a million-row reconciliation never builds a million lists.
+class RecordBatch:
+    table = None
+    # Column order of select_sql() and from_rows()
+    COLUMNS = ()
+
+    @classmethod
+    def select_sql(cls, where=""):
+        return f"SELECT {', '.join(cls.COLUMNS)} FROM {cls.table}{where}"
+
+    @classmethod
+    def from_cursor(cls, cursor, fetch_size=50000):
+        # Converts each fetchmany() chunk to columns before reading the next, so
+        # at most fetch_size rows exist as Python tuples at once
+        batches = []
+        while True:
+            chunk = cursor.fetchmany(fetch_size)
+            if not chunk:
+                break
+            batches.append(cls.from_rows(chunk))
+        return cls.concat(batches)
+
+    @classmethod
+    def concat(cls, batches):
+        if not batches:
+            return cls.from_rows([])
+        batch = cls.__new__(cls)
+        for name, value in vars(batches[0]).items():
+            parts = [getattr(part, name) for part in batches]
+            setattr(batch, name, Labels.concat(parts) if isinstance(value, Labels) else np.concatenate(parts))
+        return batch
+
+    def __len__(self):
+        return len(self.day)
+
+    @property
+    def nbytes(self):
+        total = 0
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                total += value.nbytes
+            elif isinstance(value, Labels):
+                total += value.codes.nbytes + sum(len(label) + 49 for label in value.labels)
+        return total
+
+    def valid_mask(self, errors=None):
+        errors = self.validate_batch() if errors is None else errors
+        invalid = np.zeros(len(self), dtype=np.bool_)
+        for mask in errors.values():
+            invalid |= mask
+        return ~invalid
+
+    def rejects(self, errors=None):
+        # [(row index, [messages]), ...] in the same shape as Database.insert_*_many rejects
+        errors = self.validate_batch() if errors is None else errors
+        by_row = {}
+        for message, mask in errors.items():
+            for index in np.flatnonzero(mask).tolist():
+                by_row.setdefault(index, []).append(message)
+        return sorted(by_row.items())
+
+    def insert_rows(self):
+        # ([(row index, insert row), ...] for valid rows, rejects) for Database.insert_batch
+        errors = self.validate_batch()
+        valid = self.valid_mask(errors)
+        return list(zip(np.flatnonzero(valid).tolist(), self.to_rows(valid))), self.rejects(errors)
+
+
+class StockBatch(RecordBatch):
+    table = 'stock'
+    COLUMNS = ('date', 'transaction_type', 'vendor_name', 'item_name', 'quantity', 'unit_price_cents')
+
+    def __init__(self, day, type_code, vendor, item, quantity, unit_price_cents, total_price_cents, bad_number=None):
+        self.day = day
+        self.type_code = type_code
+        self.vendor = vendor
+        self.item = item
+        self.quantity = quantity
+        self.unit_price_cents = unit_price_cents
+        self.total_price_cents = total_price_cents
+        self.bad_number = np.zeros(len(day), dtype=np.bool_) if bad_number is None else bad_number
+
+    @classmethod
+    def from_rows(cls, rows):
+        # Rows in COLUMNS order, e.g. straight from select_sql()
+        dates, types, vendors, items, quantities, unit_cents = zip(*rows) if rows else ((),) * 6
+        quantity = np.array(quantities, dtype=np.float64)
+        unit_price_cents = np.array(unit_cents, dtype=np.int64)
+        return cls(_days(dates), _type_codes(types, STOCK_TYPES), Labels(vendors), Labels(items),
+                   quantity, unit_price_cents, _multiply(unit_price_cents, quantity))
+
+    @classmethod
+    def from_records(cls, records):
+        # From StockTransaction / FrozenStockTransaction objects (prices in dollars)
+        columns = [(r.date, r.transaction_type, r.vendor_name, r.item_name, r.quantity, r.unit_price) for r in records]
+        dates, types, vendors, items, quantities, prices = zip(*columns) if columns else ((),) * 6
+        try:
+            quantity = np.array(quantities, dtype=np.float64)
+        except (TypeError, ValueError):
+            quantity = np.array([_float_or_nan(value) for value in quantities], dtype=np.float64)
+        unit_price_cents, bad = _cents(list(prices))
+        return cls(_days(dates), _type_codes(types, STOCK_TYPES), Labels(vendors), Labels(items),
+                   quantity, unit_price_cents, _multiply(unit_price_cents, quantity), bad | ~np.isfinite(quantity))
+
+    def validate_batch(self):
+        # {message: row mask}, messages as in StockTransaction.validate; only errors that occur
+        numbers_ok = ~self.bad_number
+        checks = (
+            ("Transaction type must be 'Purchase' or 'Sale'", self.type_code < 0),
+            ("Vendor name cannot be empty", self.vendor.blank()),
+            ("Item name cannot be empty", self.item.blank()),
+            ("Quantity must be positive", ~(self.quantity > 0) & np.isfinite(self.quantity)),
+            ("Quantity and unit price must be numbers", self.bad_number),
+            ("Unit price cannot be negative", numbers_ok & (self.unit_price_cents < 0)),
+            ("Unit price is too large", numbers_ok & (np.abs(self.unit_price_cents) >= MAX_CENTS)),
+            ("Total price is too large", numbers_ok & (np.abs(self.total_price_cents) >= MAX_CENTS)),
+        )
+        return {message: mask for message, mask in checks if mask.any()}
+
+    def to_rows(self, mask=None):
+        # Insert rows in database.STOCK_INSERT order
+        pick = (lambda array: array) if mask is None else (lambda array: array[mask])
+        return list(zip(
+            pick(self.day).astype(str).tolist(),
+            [STOCK_TYPES[code] if code >= 0 else None for code in pick(self.type_code).tolist()],
+            self.vendor.values(mask),
+            self.item.values(mask),
+            pick(self.quantity).tolist(),
+            pick(self.unit_price_cents).tolist(),
+            pick(self.total_price_cents).tolist(),
+        ))
+
+    def to_records(self):
+        return [
+            FrozenStockTransaction(day, transaction_type, vendor, item, quantity, cents / 100)
+            for (_, transaction_type, vendor, item, quantity, cents, _), day in zip(self.to_rows(), self.day.tolist())
+        ]
+
+
+class FinancialRecordBatch(RecordBatch):
+    table = 'financial_records'
+    COLUMNS = ('type', 'date', 'category', 'description', 'amount_cents')
+
+    def __init__(self, type_code, day, category, description, amount_cents, bad_number=None):
+        self.type_code = type_code
+        self.day = day
+        self.category = category
+        self.description = description
+        self.amount_cents = amount_cents
+        self.bad_number = np.zeros(len(day), dtype=np.bool_) if bad_number is None else bad_number
+
+    @classmethod
+    def from_rows(cls, rows):
+        types, dates, categories, descriptions, amounts = zip(*rows) if rows else ((),) * 5
+        return cls(_type_codes(types, RECORD_TYPES), _days(dates), Labels(categories),
+                   np.array(descriptions, dtype=object), np.array(amounts, dtype=np.int64))
+
+    @classmethod
+    def from_records(cls, records):
+        # From FinancialRecord / FrozenFinancialRecord objects (amounts in dollars)
+        columns = [(r.record_type, r.date, r.category, r.description, r.amount) for r in records]
+        types, dates, categories, descriptions, amounts = zip(*columns) if columns else ((),) * 5
+        amount_cents, bad = _cents(list(amounts))
+        return cls(_type_codes(types, RECORD_TYPES), _days(dates), Labels(categories),
+                   np.array(descriptions, dtype=object), amount_cents, bad)
+
+    def validate_batch(self):
+        # {message: row mask}, messages as in FinancialRecord.validate; only errors that occur
+        numbers_ok = ~self.bad_number
+        checks = (
+            ("Record type must be 'income' or 'expense'", self.type_code < 0),
+            ("Category cannot be empty", self.category.blank()),
+            ("Amount must be a number", self.bad_number),
+            ("Amount must be positive", numbers_ok & (self.amount_cents <= 0)),
+            ("Amount is too large", numbers_ok & (np.abs(self.amount_cents) >= MAX_CENTS)),
+        )
+        return {message: mask for message, mask in checks if mask.any()}
+
+    def to_rows(self, mask=None):
+        # Insert rows in database.FINANCIAL_RECORD_INSERT order
+        pick = (lambda array: array) if mask is None else (lambda array: array[mask])
+        return list(zip(
+            [RECORD_TYPES[code] if code >= 0 else None for code in pick(self.type_code).tolist()],
+            pick(self.day).astype(str).tolist(),
+            self.category.values(mask),
+            pick(self.description).tolist(),
+            pick(self.amount_cents).tolist(),
+        ))
+
+    def to_records(self):
+        return [
+            FrozenFinancialRecord(record_type, day, category, description, cents / 100)
+            for (record_type, _, category, description, cents), day in zip(self.to_rows(), self.day.tolist())
+        ]
+
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
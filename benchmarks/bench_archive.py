@@ -0,0 +1,55 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from backup import BackupManager
+from benchmarks.run_all import best_of, report_params
+from benchmarks.synthetic import START, YEARS, build
+from database import Database, REPORT_QUERIES
+from reports import LedgerAnalytics
+from totals import ProfitLossEngine
+
+LAST_YEAR = START.year + YEARS - 1
+
+
+def measure(db, tmp, repeat):
+    results = {'database_mb': db.db_path.stat().st_size / 1e6}
+    manager = BackupManager(db, backup_dir=Path(tmp) / f"backups_{time.time_ns()}")
+    results['backup_s'], _ = best_of(1, manager.create)
+    recent = (f"{LAST_YEAR}-01-01", f"{LAST_YEAR}-12-31")
+    results['analytics_last_year_s'], _ = best_of(repeat, lambda: LedgerAnalytics(db, *recent))
+    results['analytics_all_years_s'], _ = best_of(repeat, lambda: LedgerAnalytics(db))
+    results['profit_loss_load_s'], _ = best_of(repeat, lambda: ProfitLossEngine().load(db))
+    for name in REPORT_QUERIES:
+        seconds, _ = best_of(repeat, lambda: db.report_query(name, report_params(name)))
+        results[f"{name}_ms"] = seconds * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot database size, backup and report latency before/after archiving")
+    parser.add_argument('--rows', type=int, default=500000, help="Synthetic rows per table")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'archive.db'
+        build(path, args.rows)
+        db = Database(path)
+        db.initialize()
+        before = measure(db, tmp, args.repeat)
+        started = time.perf_counter()
+        for year in range(START.year, LAST_YEAR):
+            db.archives.archive_year(year)
+        db.vacuum()
+        print(f"Archived {START.year}..{LAST_YEAR - 1} and vacuumed in {time.perf_counter() - started:.1f}s")
+        after = measure(db, tmp, args.repeat)
+        print(f"{'':28} {'before':>12} {'archived':>12}")
+        for metric, value in before.items():
+            print(f"{metric:28} {value:12.2f} {after[metric]:12.2f}")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
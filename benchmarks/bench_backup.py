@@ -0,0 +1,53 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from backup import BackupManager
+from database import Database
+from models import FinancialRecord
+from benchmarks.check_query_plans import make_records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-copy backups with incremental deduplicated snapshots")
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--appended', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / 'ledger.db')
+        db.initialize()
+        db.insert_financial_records_many(make_records(args.rows))
+        size_mb = os.path.getsize(db.db_path) / 1e6
+        print(f"{args.rows} financial_records rows, database {size_mb:.1f} MB")
+
+        started = time.perf_counter()
+        shutil.copyfile(db.db_path, Path(tmp) / 'full_copy.db')
+        print(f"full copy          {time.perf_counter() - started:6.2f}s, {size_mb:8.1f} MB written")
+
+        manager = BackupManager(db)
+        for label in ('first snapshot', 'unchanged', f'+{args.appended} rows'):
+            if label.startswith('+'):
+                # A day's worth of new entries, like a normal session between startups
+                db.insert_financial_records_many(
+                    FinancialRecord('income', date.today(), 'Sales', f"sale {n}", 10 + n % 50)
+                    for n in range(args.appended)
+                )
+            started = time.perf_counter()
+            name, manifest = manager.create()
+            elapsed = time.perf_counter() - started
+            print(f"{label:18} {elapsed:6.2f}s, {manifest['stored_bytes'] / 1e6:8.1f} MB stored, "
+                  f"{manifest['new_blocks']}/{len(manifest['blocks'])} new blocks")
+
+        started = time.perf_counter()
+        manager.restore(name, Path(tmp) / 'restored.db')
+        print(f"verified restore   {time.perf_counter() - started:6.2f}s")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from database import Database
+from export import export_table
+from benchmarks.check_query_plans import make_records
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure streaming export throughput and memory")
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / 'export.db')
+        db.initialize()
+        db.insert_financial_records_many(make_records(args.rows))
+        print(f"{args.rows} financial_records rows, peak RSS before export: {peak_rss_mb():.0f} MB")
+
+        for name in ('ledger.csv', 'ledger.jsonl', 'ledger.csv.gz', 'ledger.jsonl.gz'):
+            path = Path(tmp) / name
+            started = time.perf_counter()
+            rows = export_table(db, 'financial_records', path)
+            elapsed = time.perf_counter() - started
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"{name:16} {rows} rows, {size_mb:8.1f} MB in {elapsed:6.2f}s "
+                  f"= {size_mb / elapsed:6.1f} MB/s written, {rows / elapsed:,.0f} rows/s, "
+                  f"peak RSS {peak_rss_mb():.0f} MB")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
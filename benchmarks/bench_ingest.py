@@ -0,0 +1,68 @@
+import argparse
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from database import Database, STOCK_INSERT, stock_row
+from models import StockTransaction
+
+VENDORS = ['Acme Wholesale', 'Northwind', 'Contoso Foods', 'Globex', 'Initech Supply']
+ITEMS = [f"SKU-{n:05d}" for n in range(2000)]
+
+
+def make_transactions(count, seed=42):
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    for n in range(count):
+        yield StockTransaction(
+            date=start + timedelta(days=n // len(ITEMS)),
+            transaction_type=rng.choice(['Purchase', 'Sale']),
+            vendor_name=rng.choice(VENDORS),
+            item_name=ITEMS[n % len(ITEMS)],
+            quantity=rng.randint(1, 50),
+            unit_price=round(rng.uniform(0.5, 200), 2)
+        )
+
+
+def bench_per_row(db, count):
+    started = time.perf_counter()
+    for transaction in make_transactions(count):
+        db.execute_query(STOCK_INSERT, stock_row(transaction), commit=True)
+    return count / (time.perf_counter() - started)
+
+
+def bench_bulk(db, count, chunk_size):
+    started = time.perf_counter()
+    written, rejects = db.insert_stock_many(make_transactions(count), chunk_size=chunk_size)
+    elapsed = time.perf_counter() - started
+    assert written == count and not rejects, (written, len(rejects))
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-row and bulk stock ingest")
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--per-row-rows', type=int, default=2000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        per_row_db = Database(Path(tmp) / 'per_row.db')
+        per_row_db.initialize()
+        per_row = bench_per_row(per_row_db, args.per_row_rows)
+        per_row_db.close()
+
+        bulk_db = Database(Path(tmp) / 'bulk.db')
+        bulk_db.initialize()
+        bulk = bench_bulk(bulk_db, args.rows, args.chunk_size)
+        bulk_db.close()
+
+    print(f"execute_query(commit=True): {per_row:,.0f} rows/sec ({args.per_row_rows} rows)")
+    print(f"insert_stock_many:          {bulk:,.0f} rows/sec ({args.rows} rows)")
+    print(f"speedup: {bulk / per_row:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from database import Database
+from instrumentation import QueryStats
+
+POINT_QUERY = "SELECT name FROM categories WHERE id = ?"
+INSERT_QUERY = "INSERT INTO financial_records (type, date, category, description, amount_cents) VALUES (?, ?, ?, ?, ?)"
+
+
+def per_call(label, count, fn, baseline=None):
+    started = time.perf_counter()
+    for n in range(count):
+        fn(n)
+    micros = (time.perf_counter() - started) / count * 1e6
+    overhead = f"  (+{micros - baseline:.2f} µs)" if baseline is not None else ""
+    print(f"{label:46} {micros:8.2f} µs/query{overhead}")
+    return micros
+
+
+def run(db, count):
+    point = lambda n: db.execute_query(POINT_QUERY, (n % 4 + 1,)).fetchone()
+    insert = lambda n: db.execute_query(INSERT_QUERY, ('income', '2024-01-01', 'Sales', '', 100 + n))
+    return per_call("  point SELECT + fetchone", count, point), per_call("  INSERT (no commit)", count, insert)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of Database.execute_query instrumentation")
+    parser.add_argument('--queries', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / 'instrumentation.db')
+        db.initialize()
+        with db.reader() as conn:
+            print("raw sqlite3 cursor (no Database wrapper)")
+            raw = per_call("  point SELECT + fetchone", args.queries,
+                           lambda n: conn.execute(POINT_QUERY, (n % 4 + 1,)).fetchone())
+
+        modes = (
+            ("instrumentation disabled", None),
+            ("QueryStats", {}),
+            ("QueryStats + trace callback", {'trace': True}),
+            ("QueryStats + trace + progress handler (1000)", {'trace': True, 'progress_steps': 1000}),
+        )
+        baseline = None
+        for label, hooks in modes:
+            if hooks is None:
+                db.disable_instrumentation()
+            else:
+                db.enable_instrumentation(QueryStats(), **hooks)
+            print(label)
+            point, insert = run(db, args.queries)
+            if baseline is None:
+                baseline = (point, insert)
+                print(f"  execute_query wrapper over raw cursor: +{point - raw:.2f} µs")
+            else:
+                print(f"  overhead vs. disabled: +{point - baseline[0]:.2f} / +{insert - baseline[1]:.2f} µs")
+            db.conn.rollback()
+        stats = db.disable_instrumentation()
+        print(f"{len(stats.snapshot()['queries'])} statement shapes recorded, e.g.:")
+        for key, series in stats.top(2):
+            print(f"  {series['count']:>8} x {series['mean_seconds'] * 1e6:6.1f} µs  {key}")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
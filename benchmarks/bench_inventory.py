@@ -0,0 +1,61 @@
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from database import Database
+from inventory import HISTORY_COLUMNS, STOCK_HISTORY, InventoryEngine, ItemState
+from benchmarks.bench_ingest import ITEMS, make_transactions
+
+
+def naive_value_as_of(db, day):
+    # What a query without the engine has to do: replay every row up to day
+    states = {}
+    with db.reader() as conn:
+        history = STOCK_HISTORY.format(stock=db.archives.source(conn, 'stock', end=day, columns=HISTORY_COLUMNS))
+        for stock_id, row_day, transaction_type, item, quantity, unit_price in conn.execute(
+                f"{history} WHERE date <= ? ORDER BY item_name, date, id", (day,)):
+            state = states.get(item) or states.setdefault(item, ItemState(item))
+            state.apply(stock_id, row_day, transaction_type, quantity, unit_price)
+    return sum(state.fifo_value for state in states.values())
+
+
+def timed(label, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    print(f"{label:34} {time.perf_counter() - started:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inventory valuation over a large stock history")
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / 'inventory.db')
+        db.initialize()
+        db.insert_stock_many(make_transactions(args.rows))
+        last_day = (date(2020, 1, 1) + timedelta(days=(args.rows - 1) // len(ITEMS))).isoformat()
+        print(f"{args.rows} stock rows over {len(ITEMS)} items, last day {last_day}")
+
+        engine = InventoryEngine(db)
+        timed("initial build (full replay)", engine.sync)
+        appended = list(make_transactions(args.rows + len(ITEMS), seed=7))[args.rows:]
+        db.insert_stock_many(appended)
+        timed(f"incremental sync (+{len(appended)} rows)", engine.sync)
+        db.execute_query("UPDATE stock SET quantity = quantity + 1 WHERE id = 1", commit=True)
+        timed("sync after editing one old row", engine.sync)
+
+        middle = (date(2020, 1, 1) + timedelta(days=args.rows // len(ITEMS) // 2)).isoformat()
+        fifo, _ = timed(f"value_as_of({middle})", engine.value_as_of, middle)
+        timed(f"cogs(2020-01-01, {middle})", engine.cogs, '2020-01-01', middle)
+        naive = timed("naive replay for the same value", naive_value_as_of, db, middle)
+        print(f"engine {fifo:,.2f} vs naive {naive:,.2f}")
+        assert abs(fifo - naive) < 1e-6 * max(abs(naive), 1), (fifo, naive)
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
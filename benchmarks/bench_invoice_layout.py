@@ -0,0 +1,50 @@
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from invoicing import render_invoice
+from money import format_cents
+
+
+def line_items(count):
+    for n in range(count):
+        yield {"description": f"Wholesale item {n:05d}", "quantity": 1 + n % 12, "price": 0.5 + (n % 400) / 4}
+
+
+def make_invoice(size):
+    return {
+        "number": f"BENCH-{size}",
+        "date": "2024-01-31",
+        "customer_name": "Benchmark Customer",
+        "customer_address": "1 Bench Street",
+        "items": line_items(size),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time multi-page invoice rendering by line-item count")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            output = Path(tmp) / f"bench_{size}.pdf"
+            started = time.perf_counter()
+            path, totals = render_invoice(make_invoice(size), output)
+            elapsed = time.perf_counter() - started
+
+            # Separate pass: tracemalloc slows rendering down several times over
+            tracemalloc.start()
+            render_invoice(make_invoice(size), output)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            pages = Path(path).read_bytes().count(b'/Type /Page\n')
+            print(f"{size:>6} lines: {elapsed:7.3f}s, {pages:4d} pages, "
+                  f"{size / elapsed:8,.0f} lines/s, peak Python heap {peak / 1e6:6.1f} MB, "
+                  f"total {format_cents(totals['total'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import build
+from database import Database
+from ledger_view import LEDGER_COLUMNS
+from paging import LedgerPager, PAGE_SIZE
+
+# (label, table, sort, fixed filters)
+VIEWS = [
+    ("stock by date", 'stock', 'date', {}),
+    ("stock by item", 'stock', 'item_name', {}),
+    ("expenses by date", 'financial_records', 'date', {'type': 'expense'}),
+]
+
+
+def timed_ms(fn):
+    started = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def offset_ms(db, pager, index):
+    # What the same page costs with LIMIT/OFFSET from the top
+    state = pager._state
+    sql, params = pager._query(state, pager.columns, limit=pager.page_size, offset=index * pager.page_size)
+    with db.reader() as conn:
+        return timed_ms(lambda: conn.execute(sql, params).fetchall())[0]
+
+
+def scroll(pager, pages, frame_ms):
+    # Reads pages in order with frame_ms of "rendering" in between; counts how
+    # often the next page had already been prefetched
+    hits, waited = 0, 0.0
+    for index in range(pages):
+        start = index * pager.page_size
+        rows, missing = pager.window(start, pager.page_size)
+        if missing:
+            started = time.perf_counter()
+            for future in missing:
+                future.result()
+            waited += time.perf_counter() - started
+            pager.window(start, pager.page_size)
+        else:
+            hits += 1
+        time.sleep(frame_ms / 1000)
+    return hits, waited * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyset paging for the ledger tabs vs. LIMIT/OFFSET")
+    parser.add_argument('--rows', type=int, default=1000000, help="Synthetic rows per table")
+    parser.add_argument('--db', default=None, help="Use an existing database (e.g. from benchmarks.synthetic)")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--scroll-pages', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.db) if args.db else Path(tmp) / 'ledger.db'
+        if not args.db:
+            started = time.perf_counter()
+            build(path, args.rows)
+            print(f"{args.rows:,} rows per table generated in {time.perf_counter() - started:.1f}s")
+        db = Database(path, readers=2)
+        db.initialize()
+        for label, table, sort, fixed in VIEWS:
+            columns = [column for column, *_ in LEDGER_COLUMNS[table]]
+            pager = LedgerPager(db, table, columns, page_size=args.page_size)
+            pager.configure(sort, filters=fixed)
+            first_ms, _ = timed_ms(lambda: pager.page(0))
+            count_ms, total = timed_ms(lambda: pager.count_future().result())
+            pages = max(1, (total + args.page_size - 1) // args.page_size)
+            print(f"{label}: {total:,} rows, {pages:,} pages; first page {first_ms:.2f} ms, count {count_ms:.1f} ms")
+            for fraction in (0.1, 0.5, 0.9, 1.0):
+                index = min(pages - 1, int(pages * fraction))
+                seek_ms, _ = timed_ms(lambda: pager.page(index))
+                next_ms, _ = timed_ms(lambda: pager.page(min(pages - 1, index + 1)) if index + 1 < pages
+                                      else pager.page(index - 1))
+                print(f"  page {index:>7,} ({fraction:4.0%})  jump {seek_ms:8.2f} ms  neighbour {next_ms:6.2f} ms"
+                      f"  OFFSET {offset_ms(db, pager, index):8.2f} ms")
+            pager.refresh()
+            hits, waited_ms = scroll(pager, min(pages, args.scroll_pages), frame_ms=5)
+            print(f"  scrolling {min(pages, args.scroll_pages)} pages at 5 ms/frame: {hits} prefetched, "
+                  f"{waited_ms:.1f} ms waiting")
+            pager.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
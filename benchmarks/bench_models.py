@@ -0,0 +1,70 @@
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from dataclasses import astuple
+from pathlib import Path
+
+from batch import StockBatch
+from benchmarks.bench_ingest import make_transactions
+from database import Database
+from models import FrozenStockTransaction, StockTransaction
+
+
+def measure(label, build):
+    # (result, traced bytes still allocated by build(), seconds)
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:40} {current / 2 ** 20:8.1f} MiB {elapsed:7.2f} s")
+    return result
+
+
+def timed(label, count, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:40} {count / elapsed:12,.0f} rows/sec")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory and validation throughput of record representations")
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    # Fields are generated once and shared, so the numbers are the per-record overhead
+    fields = [astuple(transaction) for transaction in make_transactions(args.rows)]
+    print(f"{args.rows} stock transactions")
+
+    records = measure("StockTransaction (dataclass)", lambda: [StockTransaction(*row) for row in fields])
+    frozen = measure("FrozenStockTransaction (__slots__)", lambda: [FrozenStockTransaction(*row) for row in fields])
+    batch = measure("StockBatch (columnar)", lambda: StockBatch.from_records(frozen))
+    print(f"{'':40} StockBatch.nbytes {batch.nbytes / 2 ** 20:.1f} MiB")
+
+    errors = timed("validate() loop", args.rows, lambda: [record.validate() for record in records])
+    batch_errors = timed("validate_batch()", args.rows, batch.validate_batch)
+    assert sum(map(bool, errors)) == (~batch.valid_mask(batch_errors)).sum()
+
+    rows = timed("StockBatch.to_rows()", args.rows, batch.to_rows)
+    del records, frozen
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / 'models.db')
+        db.initialize()
+        written, rejects = timed("Database.insert_batch()", args.rows, lambda: db.insert_batch(batch))
+        assert written == args.rows and not rejects
+        with db.reader() as conn:
+            loaded = timed("StockBatch.from_cursor()", args.rows,
+                           lambda: StockBatch.from_cursor(conn.execute(StockBatch.select_sql(" ORDER BY id"))))
+        assert loaded.to_rows() == rows
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import random
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+
+from database import Database
+from models import FinancialRecord
+from money import format_cents, from_cents, to_cents
+
+
+def make_amounts(count, seed=42):
+    rng = random.Random(seed)
+    return [round(rng.uniform(0.01, 5000), 2) for _ in range(count)]
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:36} {elapsed * 1000:9.1f} ms  -> {result}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Integer-cents aggregation against float and Decimal baselines")
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    amounts = make_amounts(args.rows)
+    decimals = [Decimal(repr(amount)) for amount in amounts]
+    cents = [to_cents(amount) for amount in amounts]
+    cents_array = np.array(cents, dtype=np.int64)
+    print(f"{args.rows} amounts")
+
+    exact = timed("Decimal sum (baseline)", lambda: sum(decimals, Decimal(0)))
+    floating = timed("float sum", lambda: sum(amounts))
+    print(f"{'':36} float drift: {Decimal(repr(floating)) - exact}")
+    timed("int cents sum", lambda: format_cents(sum(cents)))
+    timed("NumPy int64 cents sum", lambda: format_cents(int(cents_array.sum())))
+    assert from_cents(sum(cents)) == exact == from_cents(int(cents_array.sum()))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / 'money.db')
+        db.initialize()
+        db.insert_financial_records_many(
+            FinancialRecord('income', '2024-01-01', 'Sales', '', amount) for amount in amounts
+        )
+        with db.reader() as conn:
+            timed("SQL SUM(amount_cents)", lambda: format_cents(
+                conn.execute("SELECT SUM(amount_cents) FROM financial_records").fetchone()[0]
+            ))
+            timed("fetch + Decimal sum (baseline)", lambda: sum(
+                (Decimal(cents) / 100 for (cents,) in conn.execute("SELECT amount_cents FROM financial_records")),
+                Decimal(0)
+            ))
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
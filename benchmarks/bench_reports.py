@@ -0,0 +1,37 @@
+import argparse
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from database import Database
+from reports import LedgerAnalytics, REPORTS, run_report
+from benchmarks.bench_ingest import make_transactions
+from benchmarks.check_query_plans import make_records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the NumPy reports over a synthetic ledger")
+    parser.add_argument('--rows', type=int, default=500000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / 'reports.db')
+        db.initialize()
+        db.insert_financial_records_many(make_records(args.rows))
+        db.insert_stock_many(make_transactions(args.rows))
+
+        started = time.perf_counter()
+        analytics = LedgerAnalytics(db)
+        print(f"load: {time.perf_counter() - started:.3f}s for {args.rows} + {args.rows} rows, "
+              f"{analytics.nbytes / 1e6:.1f} MB of arrays")
+        for name in REPORTS:
+            started = time.perf_counter()
+            _, rows = run_report(analytics, name)
+            print(f"{name}: {(time.perf_counter() - started) * 1000:.1f} ms ({len(rows)} rows)")
+        db.close()
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import build
+from database import Database
+
+# (label, search() arguments, equivalent LIKE scan)
+QUERIES = [
+    ("rare words", ('consulting 4242',), "SELECT COUNT(*) FROM financial_records WHERE description LIKE '%Consulting #4242%'"),
+    ("item prefix", ('sku-0421',), "SELECT COUNT(*) FROM stock WHERE item_name LIKE '%SKU-0421%'"),
+    ("vendor, ranked", ('pied piper',), "SELECT COUNT(*) FROM stock WHERE vendor_name LIKE '%Pied Piper%'"),
+    ("common word, ranked", ('supplies',), "SELECT COUNT(*) FROM financial_records WHERE description LIKE '%Supplies%'"),
+    ("common word, newest first", ('supplies', {'order': 'recent'}), None),
+    ("common word, page 20", ('supplies', {'order': 'recent', 'offset': 950}), None),
+]
+
+
+def best_ms(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FTS5 search latency against LIKE '%...%' scans")
+    parser.add_argument('--rows', type=int, default=500000, help="Synthetic rows per table")
+    parser.add_argument('--db', default=None, help="Use an existing database (e.g. from benchmarks.synthetic)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.db) if args.db else Path(tmp) / 'search.db'
+        if not args.db:
+            started = time.perf_counter()
+            build(path, args.rows)
+            print(f"{args.rows:,} rows per table generated and indexed in {time.perf_counter() - started:.1f}s")
+        db = Database(path)
+        db.initialize()
+        if not db.search_available():
+            raise SystemExit("This SQLite build has no FTS5")
+        for label, search_args, like in QUERIES:
+            text, options = search_args[0], (search_args[1] if len(search_args) > 1 else {})
+            fts_ms, results = best_ms(lambda: db.search(text, limit=50, **options), args.repeat)
+            line = f"{label:28} search {fts_ms:8.2f} ms ({len(results)} rows)"
+            if like:
+                with db.reader() as conn:
+                    like_ms, (matches,) = best_ms(lambda: conn.execute(like).fetchone(), 1)
+                line += f"   LIKE scan {like_ms:8.1f} ms ({matches} matches)"
+            print(line)
+        started = time.perf_counter()
+        db.rebuild_search_index()
+        print(f"rebuild_search_index {time.perf_counter() - started:.1f}s")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
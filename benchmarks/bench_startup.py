@@ -0,0 +1,48 @@
+import argparse
+import subprocess
+import sys
+
+# module -> (import-time budget in ms, modules that must not be imported eagerly)
+BUDGETS = {
+    'invoice_template': (150, ('reportlab', 'PIL', 'urllib.request', 'invoicing', 'numpy')),
+    'main': (400, ('reportlab', 'PIL', 'urllib.request', 'invoicing')),
+}
+
+
+def import_profile(module):
+    # {module name: cumulative microseconds} from python -X importtime
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        profile[name] = int(cumulative)
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time regression check (python -X importtime)")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    failures = []
+    for module, (budget_ms, forbidden) in BUDGETS.items():
+        profiles = [import_profile(module) for _ in range(args.runs)]
+        best_ms = min(profile[module] for profile in profiles) / 1000
+        eager = sorted({name for name in profiles[0] if name.split('.')[0] in forbidden or name in forbidden})
+        status = 'ok' if best_ms <= budget_ms and not eager else 'FAIL'
+        print(f"[{status}] import {module}: {best_ms:.1f} ms (budget {budget_ms} ms, best of {args.runs})")
+        if eager:
+            print(f"       imported eagerly: {', '.join(eager)}")
+        if status == 'FAIL':
+            failures.append(module)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import build
+from database import Database
+from verifier import verify_data
+
+
+def timed(db, report, **options):
+    started = time.perf_counter()
+    summary = verify_data(db, report, **options)
+    return time.perf_counter() - started, summary
+
+
+def touch(db, rows, seed):
+    # Edits `rows` random stock rows and adds as many expenses, as a day of bookkeeping would
+    rng = random.Random(seed)
+    with db.transaction() as conn:
+        last = conn.execute("SELECT MAX(id) FROM stock").fetchone()[0]
+        conn.executemany("UPDATE stock SET quantity = quantity + 1, total_price_cents = total_price_cents + "
+                         "unit_price_cents WHERE id = ?", [(rng.randint(1, last),) for _ in range(rows)])
+        conn.executemany(
+            "INSERT INTO financial_records (type, date, category, description, amount_cents) "
+            "VALUES ('expense', '2024-06-01', 'Supplies', 'bench', ?)", [(rng.randint(100, 9999),) for _ in range(rows)]
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel data verification: full runs by workers, then incremental")
+    parser.add_argument('--rows', type=int, default=1000000, help="Synthetic rows per table")
+    parser.add_argument('--db', default=None, help="Use an existing database (its rows get marked verified)")
+    parser.add_argument('--workers', type=int, nargs='*', default=None,
+                        help="Worker counts to compare (default: 1, 2, 4 ... up to the CPU count)")
+    parser.add_argument('--changed', type=int, default=1000, help="Rows edited before the incremental run")
+    args = parser.parse_args()
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({n for n in (1, 2, 4, 8) if n <= cpus} | {cpus})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.db) if args.db else Path(tmp) / 'verify.db'
+        if not args.db:
+            started = time.perf_counter()
+            build(path, args.rows)
+            print(f"{args.rows:,} rows per table generated in {time.perf_counter() - started:.1f}s")
+        report = Path(tmp) / 'report.jsonl'
+        db = Database(path, readers=1)
+        db.initialize()
+        seconds, summary = timed(db, report, integrity='full', workers=max(workers))
+        print(f"first run (marks every row, with integrity_check): {seconds:6.2f}s  findings {summary['findings']}")
+        for count in workers:
+            seconds, summary = timed(db, report, integrity='skip', workers=count, full=True)
+            checked = summary['checked']['stock'] + summary['checked']['financial_records']
+            print(f"full, {count:2} workers: {seconds:6.2f}s  {checked / seconds:12,.0f} rows/s")
+        touch(db, args.changed, seed=7)
+        seconds, summary = timed(db, report, integrity='skip', workers=max(workers))
+        print(f"incremental after {args.changed} edits and {args.changed} inserts: {seconds:6.3f}s  "
+              f"checked {summary['checked']}")
+        seconds, _ = timed(db, report, integrity='skip', workers=max(workers))
+        print(f"incremental with nothing new: {seconds:6.3f}s")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from database import Database, REPORT_QUERIES, SCHEMA_VERSION, report_sql
+from benchmarks.bench_ingest import make_transactions
+from models import FinancialRecord
+
+SAMPLE_PARAMS = {
+    'records_by_type': ('income', '2020-01-01', '2020-12-31'),
+    'totals_by_category': ('expense', '2020-01-01', '2020-12-31'),
+    'category_total': ('Rent', '2020-01-01', '2020-12-31'),
+    'stock_by_item': ('SKU-00001', '2020-01-01', '2020-12-31'),
+    'vendor_totals': ('Globex', '2020-01-01', '2020-12-31'),
+}
+
+
+def make_records(count):
+    categories = {'income': ['Sales', 'Services'], 'expense': ['Supplies', 'Rent']}
+    for n in range(count):
+        record_type = 'income' if n % 3 else 'expense'
+        yield FinancialRecord(
+            record_type=record_type,
+            date=date(2019, 1, 1) + timedelta(days=n % 1500),
+            category=categories[record_type][n % 2],
+            description=f"entry {n}",
+            amount=10 + n % 500
+        )
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / 'plans.db')
+        db.initialize()
+        assert db.schema_version() == SCHEMA_VERSION
+        db.insert_stock_many(make_transactions(50000))
+        db.insert_financial_records_many(make_records(50000))
+        db.execute_query("ANALYZE", commit=True)
+
+        for name in REPORT_QUERIES:
+            query = report_sql(name)
+            params = SAMPLE_PARAMS[name]
+            plan = db.explain_query_plan(query, params)
+            uses_index = any('USING INDEX' in step or 'USING COVERING INDEX' in step for step in plan)
+            full_scan = any(step.startswith('SCAN') and 'USING' not in step for step in plan)
+            started = time.perf_counter()
+            db.execute_query(query, params).fetchall()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            status = 'ok' if uses_index and not full_scan else 'FAIL'
+            if status == 'FAIL':
+                failures.append(name)
+            print(f"[{status}] {name} ({elapsed_ms:.2f} ms): {' | '.join(plan)}")
+        db.close()
+
+    if failures:
+        print(f"Report queries not using an index: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
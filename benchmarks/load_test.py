@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import json
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from benchmarks.synthetic import ITEMS, START, VENDORS, YEARS, build
+
+CATEGORIES = ('Supplies', 'Travel', 'Marketing', 'Utilities')
+DAYS = YEARS * 365
+CLI = Path(__file__).resolve().parent.parent / 'cli.py'
+
+
+def _day(rng):
+    return (START + timedelta(days=rng.randrange(DAYS))).isoformat()
+
+
+def list_stock(rng, worker, n):
+    return 'GET', f"/stock?sort=date&limit=50&start={_day(rng)}", None
+
+
+def list_expenses(rng, worker, n):
+    return 'GET', f"/financial_records?type=expense&sort=category&limit=50&category={rng.choice(CATEGORIES)}", None
+
+
+def vendor_report(rng, worker, n):
+    year = rng.randrange(START.year, START.year + YEARS)
+    vendor = quote(rng.choice(VENDORS))
+    return 'GET', f"/reports/vendor_totals?vendor_name={vendor}&start={year}-01-01&end={year}-12-31", None
+
+
+def post_record(rng, worker, n):
+    return 'POST', "/financial_records", {
+        'type': 'expense', 'date': _day(rng), 'category': rng.choice(CATEGORIES),
+        'description': f"load test {worker}-{n}", 'amount': round(rng.uniform(5, 500), 2),
+    }
+
+
+def post_stock(rng, worker, n):
+    # Item names unique per run, worker and request so no row hits the UNIQUE constraint
+    return 'POST', "/stock", [
+        {'date': _day(rng), 'transaction_type': 'Purchase', 'vendor_name': rng.choice(VENDORS),
+         'item_name': f"LOAD-{worker}-{n}-{line}", 'quantity': rng.randrange(1, 20), 'unit_price': '4.25'}
+        for line in range(5)
+    ]
+
+
+def post_invoice(rng, worker, n):
+    return 'POST', "/invoices", {
+        'customer_name': f"Load Customer {worker}", 'customer_address': "1 Load Street",
+        'items': [{'description': rng.choice(ITEMS), 'quantity': rng.randrange(1, 5), 'price': 19.99}
+                  for _ in range(10)],
+    }
+
+
+# scenario -> [(weight, request builder)]
+SCENARIOS = {
+    'mixed': [(40, list_stock), (15, list_expenses), (15, vendor_report), (20, post_record), (9, post_stock),
+              (1, post_invoice)],
+    'reads': [(60, list_stock), (20, list_expenses), (20, vendor_report)],
+    'writes': [(70, post_record), (30, post_stock)],
+}
+
+
+async def _request(reader, writer, host, method, path, body):
+    data = b'' if body is None else json.dumps(body).encode('utf-8')
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _worker(url, scenario, run_id, worker, deadline, samples, seed):
+    rng = random.Random(seed + worker)
+    builders = [builder for _, builder in SCENARIOS[scenario]]
+    weights = [weight for weight, _ in SCENARIOS[scenario]]
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+    n = 0
+    try:
+        while time.perf_counter() < deadline:
+            builder = rng.choices(builders, weights)[0]
+            method, path, body = builder(rng, f"{run_id}-{worker}", n)
+            started = time.perf_counter()
+            status = await _request(reader, writer, parts.hostname, method, path, body)
+            samples.append((builder.__name__, time.perf_counter() - started, status))
+            n += 1
+    finally:
+        writer.close()
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))] * 1000
+
+
+def report(samples, seconds):
+    by_name = {}
+    for name, latency, status in samples:
+        by_name.setdefault(name, []).append((latency, status))
+    print(f"{'request':16} {'count':>8} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for name, results in sorted(by_name.items()) + [('total', [(l, s) for _, l, s in samples])]:
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status >= 400)
+        print(f"{name:16} {len(results):8} {errors:7} {_percentile(latencies, 0.5):9.2f} "
+              f"{_percentile(latencies, 0.99):9.2f} {len(results) / seconds:9.1f}")
+
+
+async def run(url, scenario, connections, seconds, seed):
+    samples = []
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    run_id = f"{time.time_ns():x}"
+    await asyncio.gather(*(
+        _worker(url, scenario, run_id, worker, deadline, samples, seed) for worker in range(connections)
+    ))
+    return samples, time.perf_counter() - started
+
+
+async def health(url):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+    writer.write(f"GET /health HTTP/1.1\r\nHost: {parts.hostname}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+def start_server(db_path, invoice_dir, max_batch):
+    # 'cli.py serve' in its own process so client and server do not share a GIL
+    process = subprocess.Popen(
+        [sys.executable, str(CLI), '--db', str(db_path), 'serve', '--port', '0', '--invoice-dir', str(invoice_dir),
+         '--max-batch', str(max_batch)],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline()
+    if not line.startswith("Serving on "):
+        process.kill()
+        raise SystemExit(f"Server did not start: {line!r}")
+    return process, line.split()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the JSON API: p50/p99 latency and requests/sec")
+    parser.add_argument('--url', default=None, help="A running 'cli.py serve' instance (default: start one)")
+    parser.add_argument('--rows', type=int, default=200000, help="Synthetic rows per table for the local instance")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+    parser.add_argument('--connections', type=int, default=32, help="Concurrent keep-alive clients")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--compare-batching', action='store_true',
+                        help="Also run against a server started with --max-batch 1 (no write coalescing)")
+    args = parser.parse_args()
+
+    if args.url:
+        samples, seconds = asyncio.run(run(args.url, args.scenario, args.connections, args.seconds, args.seed))
+        report(samples, seconds)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'load.db'
+        build(db_path, args.rows)
+        for max_batch in ((256, 1) if args.compare_batching else (256,)):
+            process, url = start_server(db_path, Path(tmp) / 'invoices', max_batch)
+            try:
+                samples, seconds = asyncio.run(run(url, args.scenario, args.connections, args.seconds, args.seed))
+                stats = asyncio.run(health(url))
+            finally:
+                process.send_signal(signal.SIGINT)
+                process.wait(timeout=30)
+            groups = stats['write_groups']
+            print(f"\n{args.scenario}, {args.connections} connections, {seconds:.1f}s, --max-batch {max_batch}: "
+                  f"{stats['write_requests']} writes in {groups} transactions "
+                  f"({stats['write_requests'] / groups if groups else 0:.1f} per commit)")
+            report(samples, seconds)
+
+
+if __name__ == '__main__':
+    main()
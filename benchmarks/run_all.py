@@ -0,0 +1,235 @@
+import argparse
+import json
+import platform
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+from backup import BackupManager
+from benchmarks.bench_ingest import make_transactions
+from benchmarks.bench_invoice_layout import make_invoice
+from benchmarks.synthetic import ITEMS, SIZES, START, VENDORS, YEARS, build
+from database import Database, REPORT_QUERIES, STOCK_INSERT, report_sql, stock_row
+from invoicing import render_invoice
+from reports import LedgerAnalytics, REPORTS, run_report
+from totals import ProfitLossEngine
+
+# Metric name suffix -> (whether bigger is better, seconds per unit); anything else is informational
+DIRECTIONS = {'_per_s': (True, None), '_ms': (False, 0.001), '_s': (False, 1)}
+# Timings that moved by less than this are never flagged, however large the ratio
+NOISE_FLOOR_S = 0.002
+INSERT_ROWS = 2000
+BULK_ROWS = 50000
+INVOICE_SIZES = (10, 1000)
+PNL_RANGES = 1000
+
+
+def best_of(repeat, fn):
+    # (fastest wall time in seconds, result of the last run)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_inserts(db, tmp, repeat):
+    # Per-row Database.execute_query with a commit each, as the UI does, and the bulk API
+    results = {}
+    rows = [stock_row(transaction) for transaction in make_transactions(INSERT_ROWS)]
+    scratch = Database(Path(tmp) / 'inserts.db')
+    scratch.initialize()
+
+    def per_row():
+        scratch.execute_query("DELETE FROM stock", commit=True)
+        for row in rows:
+            scratch.execute_query(STOCK_INSERT, row, commit=True)
+
+    seconds, _ = best_of(repeat, per_row)
+    results['execute_query_rows_per_s'] = INSERT_ROWS / seconds
+
+    def bulk():
+        scratch.execute_query("DELETE FROM stock", commit=True)
+        return scratch.insert_stock_many(make_transactions(BULK_ROWS))
+
+    seconds, (written, _) = best_of(repeat, bulk)
+    results['insert_stock_many_rows_per_s'] = written / seconds
+    scratch.close()
+    return results
+
+
+def report_params(name):
+    first, last = START.isoformat(), date(START.year + YEARS - 1, 12, 31).isoformat()
+    year = (f"{START.year + 1}-01-01", f"{START.year + 1}-12-31")
+    return {
+        'records_by_type': ('income', *year),
+        'totals_by_category': ('expense', first, last),
+        'category_total': ('Supplies', first, last),
+        'stock_by_item': (ITEMS[0], first, last),
+        'vendor_totals': (VENDORS[0], first, last),
+    }[name]
+
+
+def bench_report_queries(db, tmp, repeat):
+    results = {}
+    with db.reader() as conn:
+        for name in REPORT_QUERIES:
+            query = report_sql(name)
+            seconds, _ = best_of(repeat, lambda: conn.execute(query, report_params(name)).fetchall())
+            results[f"{name}_ms"] = seconds * 1000
+    return results
+
+
+def bench_ledger_reports(db, tmp, repeat):
+    seconds, analytics = best_of(repeat, lambda: LedgerAnalytics(db))
+    results = {'load_s': seconds}
+    for name in REPORTS:
+        seconds, _ = best_of(repeat, lambda: run_report(analytics, name))
+        results[f"{re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')}_ms"] = seconds * 1000
+    return results
+
+
+def bench_profit_loss(db, tmp, repeat):
+    # What FinanceManager.calculate_profit_loss and the reports tab call
+    seconds, engine = best_of(repeat, lambda: ProfitLossEngine().load(db))
+    results = {'load_s': seconds}
+    seconds, _ = best_of(repeat, engine.net)
+    results['net_all_ms'] = seconds * 1000
+    rng = np.random.default_rng(0)
+    days = np.datetime64(START) + rng.integers(0, 365 * YEARS, (PNL_RANGES, 2))
+    ranges = [(str(first), str(last)) for first, last in np.sort(days, axis=1)]
+    seconds, _ = best_of(repeat, lambda: [engine.net(first, last) for first, last in ranges])
+    results['net_range_per_s'] = PNL_RANGES / seconds
+    return results
+
+
+def bench_invoices(db, tmp, repeat):
+    results = {}
+    for size in INVOICE_SIZES:
+        output = Path(tmp) / f"invoice_{size}.pdf"
+        seconds, _ = best_of(repeat, lambda: render_invoice(make_invoice(size), output))
+        results[f"render_{size}_lines_ms"] = seconds * 1000
+    return results
+
+
+def bench_backup(db, tmp, repeat):
+    manager = BackupManager(db, backup_dir=Path(tmp) / 'backups')
+    started = time.perf_counter()
+    manager.create()
+    results = {'first_snapshot_s': time.perf_counter() - started}
+    seconds, (_, manifest) = best_of(repeat, manager.create)
+    results['unchanged_snapshot_s'] = seconds
+    results['database_mb'] = manifest['size'] / 1e6
+    return results
+
+
+BENCHMARKS = {
+    'inserts': bench_inserts,
+    'report_queries': bench_report_queries,
+    'ledger_reports': bench_ledger_reports,
+    'profit_loss': bench_profit_loss,
+    'invoices': bench_invoices,
+    'backup': bench_backup,
+}
+
+
+def version():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline, tolerance):
+    # Prints metric changes against an earlier results file; returns the regressions
+    regressions = []
+    for bench, metrics in results['results'].items():
+        for metric, value in metrics.items():
+            before = baseline['results'].get(bench, {}).get(metric)
+            direction = next((rule for suffix, rule in DIRECTIONS.items() if metric.endswith(suffix)), None)
+            if before is None or direction is None or not before:
+                continue
+            bigger_is_better, unit = direction
+            change = value / before - 1
+            worse = -change if bigger_is_better else change
+            noise = unit is not None and abs(value - before) * unit < NOISE_FLOOR_S
+            flag = 'REGRESSION' if worse > tolerance and not noise else ''
+            if flag:
+                regressions.append(f"{bench}.{metric}")
+            print(f"{bench + '.' + metric:48} {before:14.3f} -> {value:14.3f} {change:+8.1%} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every benchmark headless and store the results as JSON")
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k', help="Synthetic rows per table")
+    parser.add_argument('--db', default=None,
+                        help="Reuse a database made by benchmarks.synthetic instead of generating one")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), default=None)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the fastest is kept")
+    parser.add_argument('--output', default=None, help="Results file (default: benchmarks/results/<version>-<size>.json)")
+    parser.add_argument('--baseline', default=None, help="Earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = {
+        'version': version(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'size': args.size,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.db) if args.db else Path(tmp) / 'ledger.db'
+        if not args.db:
+            started = time.perf_counter()
+            stock, records = build(path, SIZES[args.size])
+            results['results']['generate'] = {'seconds': time.perf_counter() - started, 'rows': stock + records}
+            print(f"Generated {stock + records:,} rows in {results['results']['generate']['seconds']:.1f}s")
+        db = Database(path)
+        if not db.initialize():
+            raise SystemExit(f"Could not open database {path}")
+        try:
+            for name, bench in BENCHMARKS.items():
+                if args.only and name not in args.only:
+                    continue
+                started = time.perf_counter()
+                results['results'][name] = bench(db, tmp, args.repeat)
+                print(f"{name:16} {time.perf_counter() - started:7.1f}s  " + ', '.join(
+                    f"{metric}={value:,.2f}" for metric, value in results['results'][name].items()
+                ))
+        finally:
+            db.close()
+
+    # The suite must stay runnable on a headless CI box
+    assert 'tkinter' not in sys.modules, "benchmark suite imported tkinter"
+
+    output = Path(args.output or Path(__file__).parent / 'results' / f"{results['version']}-{args.size}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=1))
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
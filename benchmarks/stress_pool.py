@@ -0,0 +1,95 @@
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from database import Database, FINANCIAL_RECORD_INSERT, financial_record_row, report_sql
+from export import iter_chunks
+from models import FinancialRecord
+
+
+def writer(db, stop, stats, seed):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        batch = [
+            FinancialRecord(
+                record_type=rng.choice(['income', 'expense']),
+                date=date(2024, 1, 1) + timedelta(days=rng.randint(0, 365)),
+                category=rng.choice(['Sales', 'Services', 'Supplies', 'Rent']),
+                description='stress',
+                amount=rng.randint(1, 1000)
+            )
+            for _ in range(rng.choice([1, 1, 1, 50]))
+        ]
+        try:
+            if len(batch) == 1:
+                with db.transaction() as conn:
+                    conn.execute(FINANCIAL_RECORD_INSERT, financial_record_row(batch[0]))
+            else:
+                db.insert_financial_records_many(batch)
+            with stats['lock']:
+                stats['writes'] += len(batch)
+        except Exception as e:
+            stats['errors'].append(repr(e))
+
+
+def reader(db, stop, stats):
+    query = report_sql('totals_by_category')
+    while not stop.is_set():
+        try:
+            with db.reader() as conn:
+                conn.execute(query, ('income', '2024-01-01', '2024-12-31')).fetchall()
+            # Long-running scan, like an export, running concurrently with writes
+            rows = sum(len(chunk) for chunk in iter_chunks(db, 'financial_records', fetch_size=2000))
+            with stats['lock']:
+                stats['reads'] += 1
+                stats['rows_scanned'] += rows
+        except Exception as e:
+            stats['errors'].append(repr(e))
+
+
+def run(path, seconds, writers, readers):
+    # Returns (stats, rows stored); every write must be stored and none may fail
+    db = Database(path, readers=readers)
+    db.initialize()
+    stop = threading.Event()
+    stats = {'writes': 0, 'reads': 0, 'rows_scanned': 0, 'errors': [], 'lock': threading.Lock()}
+    threads = [threading.Thread(target=writer, args=(db, stop, stats, n)) for n in range(writers)]
+    threads += [threading.Thread(target=reader, args=(db, stop, stats)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    stored = db.execute_query("SELECT COUNT(*) FROM financial_records").fetchone()[0]
+    db.close()
+    return stats, stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent writers and readers against a pooled Database")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats, stored = run(Path(tmp) / 'stress.db', args.seconds, args.writers, args.readers)
+
+    print(f"{stats['writes']} rows written ({stats['writes'] / args.seconds:,.0f}/s), "
+          f"{stats['reads']} report+scan passes ({stats['rows_scanned']:,} rows scanned)")
+    print(f"rows in table: {stored}, errors: {len(stats['errors'])}")
+    for error in stats['errors'][:10]:
+        print(f"  {error}")
+    if stats['errors'] or stored != stats['writes']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
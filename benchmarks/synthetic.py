@@ -0,0 +1,218 @@
+import argparse
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+from batch import FinancialRecordBatch, Labels, StockBatch
+from database import Database
+
+# Rows per table for each named size
+SIZES = {'10k': 10000, '1m': 1000000, '10m': 10000000}
+START = date(2019, 1, 1)
+YEARS = 5
+CHUNK_ROWS = 100000
+
+VENDORS = [
+    'Acme Wholesale', 'Northwind', 'Contoso Foods', 'Globex', 'Initech Supply', 'Umbrella Goods',
+    'Stark Distribution', 'Wayne Imports', 'Tyrell Parts', 'Soylent Trading', 'Hooli Retail',
+    'Vandelay Industries', 'Cyberdyne Components', 'Wonka Confectionery', 'Duff Beverages',
+    'Oceanic Freight', 'Gringotts Metals', 'Monarch Paper', 'Sterling Cooper', 'Pied Piper Packaging',
+]
+ITEM_COUNT = 5000
+ITEMS = [f"SKU-{n:05d}" for n in range(ITEM_COUNT)]
+# Share of stock rows that are sales, and their markup over the purchase price
+SALE_SHARE = 0.6
+MARKUP = 1.35
+# Mon..Sun trading volume, and extra volume in December
+WEEKDAY_WEIGHTS = np.array([1.0, 1.0, 1.05, 1.1, 1.3, 0.7, 0.35])
+DECEMBER_BOOST = 1.4
+
+# type -> category -> (share of that type's records, median amount in dollars, lognormal sigma)
+CATEGORIES = {
+    'income': {
+        'Sales': (0.70, 120, 0.9),
+        'Services': (0.20, 450, 0.7),
+        'Consulting': (0.07, 1800, 0.5),
+        'Interest': (0.03, 15, 0.6),
+    },
+    'expense': {
+        'Supplies': (0.35, 80, 1.0),
+        'Payroll': (0.15, 2400, 0.3),
+        'Rent': (0.05, 3500, 0.05),
+        'Utilities': (0.10, 260, 0.4),
+        'Travel': (0.12, 340, 0.8),
+        'Marketing': (0.13, 600, 0.9),
+        'Insurance': (0.10, 900, 0.2),
+    },
+}
+INCOME_SHARE = 0.45
+# Flattened: (type, name, share of all records, log median amount, sigma)
+CATEGORY_TABLE = [
+    (record_type, name, share * (INCOME_SHARE if record_type == 'income' else 1 - INCOME_SHARE), np.log(median), sigma)
+    for record_type, names in CATEGORIES.items()
+    for name, (share, median, sigma) in names.items()
+]
+
+
+def _zipf_weights(count, exponent=1.1):
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _day_counts(rng, count, start, days):
+    # Rows per day, shaped by weekday and December seasonality
+    dates = np.datetime64(start) + np.arange(days)
+    weekday = (dates.view('int64') + 3) % 7  # 1970-01-01 was a Thursday
+    month = dates.astype('datetime64[M]').astype(int) % 12 + 1
+    weights = WEEKDAY_WEIGHTS[weekday] * np.where(month == 12, DECEMBER_BOOST, 1.0)
+    return dates, rng.multinomial(count, weights / weights.sum())
+
+
+class LedgerGenerator:
+    # Deterministic for a given seed: the same arguments always produce the
+    # same rows in the same order. Items and vendors follow Zipf popularity,
+    # each item has a fixed lognormal base price that sales mark up, and
+    # income/expense amounts are lognormal per category.
+    def __init__(self, seed=42, start=START, years=YEARS):
+        self.seed = seed
+        self.start = start
+        self.days = (date(start.year + years, start.month, start.day) - start).days
+        rng = np.random.default_rng(seed)
+        self.item_p = _zipf_weights(ITEM_COUNT)
+        self.vendor_p = _zipf_weights(len(VENDORS), 0.8)
+        # Popularity rank is independent of price
+        self.item_cents = np.maximum(np.rint(rng.lognormal(np.log(2000), 1.0, ITEM_COUNT)), 1).astype(np.int64)
+
+    def categories(self):
+        return [(record_type, name) for record_type, name, _, _, _ in CATEGORY_TABLE]
+
+    def stock_batches(self, rows, chunk_rows=CHUNK_ROWS):
+        # StockBatches of about chunk_rows in date order; (date, type, vendor, item) is
+        # unique per row, as the stock table requires
+        rng = np.random.default_rng([self.seed, 1])
+        dates, counts = _day_counts(rng, rows, self.start, self.days)
+        pending = []
+        pending_rows = 0
+        for day, count in zip(dates, counts.tolist()):
+            if not count:
+                continue
+            pending.append(self._stock_day(rng, day, count))
+            pending_rows += count
+            if pending_rows >= chunk_rows:
+                yield self._stock_batch(pending)
+                pending, pending_rows = [], 0
+        if pending:
+            yield self._stock_batch(pending)
+
+    def _stock_day(self, rng, day, count):
+        keys = np.empty(0, dtype=np.int64)
+        while len(keys) < count:
+            draw = int(count * 1.25) + 8
+            candidates = (
+                (rng.random(draw) < SALE_SHARE).astype(np.int64) * len(VENDORS) * ITEM_COUNT
+                + rng.choice(len(VENDORS), draw, p=self.vendor_p) * ITEM_COUNT
+                + rng.choice(ITEM_COUNT, draw, p=self.item_p)
+            )
+            keys = np.concatenate([keys, candidates])
+            _, first = np.unique(keys, return_index=True)
+            keys = keys[np.sort(first)]
+        keys = keys[:count]
+        type_code = (keys // (len(VENDORS) * ITEM_COUNT)).astype(np.int8)
+        vendor = keys // ITEM_COUNT % len(VENDORS)
+        item = keys % ITEM_COUNT
+        sale = type_code == 1
+        quantity = np.where(sale, rng.geometric(1 / 3, count), rng.geometric(1 / 25, count)).astype(np.float64)
+        price = self.item_cents[item] * np.where(sale, MARKUP, 1.0) * rng.normal(1.0, 0.04, count)
+        unit_cents = np.maximum(np.rint(price), 1).astype(np.int64)
+        return np.full(count, day), type_code, vendor, item, quantity, unit_cents
+
+    @staticmethod
+    def _stock_batch(days):
+        day, type_code, vendor, item, quantity, unit_cents = (np.concatenate(column) for column in zip(*days))
+        return StockBatch(
+            day, type_code, Labels.from_codes(vendor, VENDORS), Labels.from_codes(item, ITEMS),
+            quantity, unit_cents, unit_cents * quantity.astype(np.int64)
+        )
+
+    def record_batches(self, rows, chunk_rows=CHUNK_ROWS):
+        rng = np.random.default_rng([self.seed, 2])
+        dates, counts = _day_counts(rng, rows, self.start, self.days)
+        day = np.repeat(dates, counts)
+        record_types, names, shares, medians, sigmas = zip(*CATEGORY_TABLE)
+        type_codes = np.array([0 if record_type == 'income' else 1 for record_type in record_types], dtype=np.int8)
+        shares, medians, sigmas = np.array(shares), np.array(medians), np.array(sigmas)
+        for first in range(0, rows, chunk_rows):
+            count = min(chunk_rows, rows - first)
+            category = rng.choice(len(names), count, p=shares / shares.sum())
+            amount_cents = np.maximum(np.rint(rng.lognormal(medians[category], sigmas[category]) * 100), 1)
+            description = np.array(
+                [f"{names[code]} #{first + n}" for n, code in enumerate(category.tolist())], dtype=object
+            )
+            yield FinancialRecordBatch(
+                type_codes[category], day[first:first + count],
+                Labels.from_codes(category, names), description, amount_cents.astype(np.int64)
+            )
+
+    def fill(self, db, stock_rows, record_rows, chunk_rows=CHUNK_ROWS, progress=None):
+        # Adds the categories and both ledgers to db; returns (stock written, records written)
+        for record_type, name in self.categories():
+            db.add_category(record_type, name)
+        written = [0, 0]
+        for slot, batches in enumerate((self.stock_batches(stock_rows, chunk_rows),
+                                        self.record_batches(record_rows, chunk_rows))):
+            for batch in batches:
+                count, rejects = db.insert_batch(batch, chunk_size=len(batch))
+                if rejects:
+                    raise ValueError(f"Synthetic {batch.table} rows rejected: {rejects[:3]}")
+                written[slot] += count
+                if progress:
+                    progress(batch.table, written[slot])
+        return tuple(written)
+
+
+def build(path, stock_rows, record_rows=None, seed=42, overwrite=False, progress=None):
+    # Creates a fresh database at path filled by LedgerGenerator(seed)
+    path = Path(path)
+    if path.exists():
+        if not overwrite:
+            raise FileExistsError(f"Refusing to overwrite existing {path}")
+        path.unlink()
+    db = Database(path)
+    if not db.initialize():
+        raise OSError(f"Could not create database {path}")
+    try:
+        # Throwaway benchmark data: no need to fsync every chunk
+        db.execute_query("PRAGMA synchronous = OFF")
+        written = LedgerGenerator(seed).fill(
+            db, stock_rows, stock_rows if record_rows is None else record_rows, progress=progress
+        )
+        db.execute_query("ANALYZE", commit=True)
+    finally:
+        db.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a new database with a deterministic synthetic ledger")
+    parser.add_argument('db', help="Database file to create")
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k', help="Rows per table")
+    parser.add_argument('--stock-rows', type=int, default=None, help="Override the stock row count")
+    parser.add_argument('--record-rows', type=int, default=None, help="Override the financial_records row count")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="Replace db if it exists")
+    args = parser.parse_args()
+
+    stock_rows = SIZES[args.size] if args.stock_rows is None else args.stock_rows
+    record_rows = SIZES[args.size] if args.record_rows is None else args.record_rows
+    started = time.perf_counter()
+    stock, records = build(
+        args.db, stock_rows, record_rows, seed=args.seed, overwrite=args.force,
+        progress=lambda table, count: print(f"{table}: {count:,} rows", flush=True)
+    )
+    print(f"{stock:,} stock and {records:,} financial_records rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
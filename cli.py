@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import date
+
+from api import serve
+from archive import ArchiveError
+from backup import BackupError, BackupManager
+from config import SETTINGS_FIELDS
+from database import Database
+from importer import import_csv, PARSERS
+from inventory import InventoryEngine
+from invoicing import generate_invoices
+from money import format_cents
+from verifier import CHUNK_ROWS, INTEGRITY_MODES, verify_data
+
+
+def _column_mapping(pairs):
+    mapping = {}
+    for pair in pairs or []:
+        field, sep, column = pair.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"Column mapping must look like field=Header, got {pair!r}")
+        mapping[field.strip()] = column.strip()
+    return mapping
+
+
+def import_command(args):
+    written, rejected = import_csv(
+        args.db, args.kind, args.csv_path,
+        resume=not args.restart,
+        columns=_column_mapping(args.map),
+        chunk_rows=args.chunk_rows,
+        workers=args.workers,
+        on_conflict='upsert' if args.upsert else 'skip',
+        check_categories=args.check_categories
+    )
+    print(f"{written} rows written, {rejected} rejected")
+    return 0
+
+
+def _read_specs(path):
+    # A JSON array of invoice specs, or one spec per line (JSON Lines)
+    with open(path, encoding='utf-8') as handle:
+        text = handle.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def invoices_command(args):
+    db = Database(args.db)
+    if not db.initialize():
+        raise OSError(f"Could not open database {args.db}")
+    try:
+        tax_rate = db.config.tax_rate() if args.tax_rate is None else args.tax_rate
+        results, rate = generate_invoices(
+            _read_specs(args.specs), args.output_dir, workers=args.workers, logo_path=args.logo, tax_rate=tax_rate,
+            db=None if args.no_record else db
+        )
+    finally:
+        db.close()
+    failed = 0
+    for number, success, detail in results:
+        print(f"{'ok  ' if success else 'FAIL'} {number}: {detail}")
+        failed += not success
+    print(f"{len(results) - failed}/{len(results)} invoices rendered, {rate:.1f} invoices/sec")
+    return 1 if failed else 0
+
+
+def backup_command(args):
+    db = Database(args.db)
+    manager = BackupManager(db, backup_dir=args.backup_dir)
+    if args.action == 'create':
+        if not db.connect():
+            raise OSError(f"Could not open database {args.db}")
+        try:
+            name, manifest = manager.create()
+        finally:
+            db.close()
+        print(f"{name}: {manifest['size']} bytes, {manifest['new_blocks']}/{len(manifest['blocks'])} new blocks, "
+              f"{manifest['stored_bytes']} bytes stored")
+    elif args.action == 'list':
+        for name, manifest in manager.list():
+            print(f"{name}  {manifest['created']}  {manifest['size']} bytes  {len(manifest['blocks'])} blocks")
+    elif args.action == 'verify':
+        names = [args.name] if args.name else [name for name, _ in manager.list()]
+        failed = 0
+        for name in names:
+            problems = manager.verify(name)
+            print(f"{'ok  ' if not problems else 'FAIL'} {name}" + ''.join(f"\n  {p}" for p in problems))
+            failed += bool(problems)
+        return 1 if failed else 0
+    else:
+        if not args.name:
+            raise ValueError("restore needs a backup name (see 'backup list')")
+        manager.restore(args.name, args.target or args.db, overwrite=args.force)
+        print(f"Restored {args.name} to {args.target or args.db}")
+    return 0
+
+
+def archive_command(args):
+    db = Database(args.db)
+    if not db.initialize():
+        raise OSError(f"Could not open database {args.db}")
+    db.archives.start_month = args.start_month
+    try:
+        if args.action == 'year':
+            if args.year is None:
+                raise ValueError("archive year needs the fiscal year to move out, e.g. 'archive year 2021'")
+            entry = db.archives.archive_year(args.year, vacuum=not args.no_vacuum)
+            print(f"{entry['year']}: {entry['stock_rows']} stock rows and {entry['record_rows']} financial records "
+                  f"moved to {db.archives.path(entry['file'])}")
+        elif args.action == 'compact':
+            years = db.archives.compact()
+            print(f"Merged {years[0]}..{years[-1]} into one archive file" if years else "Nothing to merge")
+        elif args.action == 'list':
+            for entry in db.archives.entries():
+                print(f"{entry['year']}  {entry['first_day']}..{entry['last_day']}  {entry['file']:24} "
+                      f"{entry['stock_rows']:>10} stock {entry['record_rows']:>10} records  "
+                      f"archived {entry['archived_at']}")
+        else:
+            failed = 0
+            for year, problems in db.archives.verify(args.year).items():
+                print(f"{'ok  ' if not problems else 'FAIL'} {year}" + ''.join(f"\n  {p}" for p in problems))
+                failed += bool(problems)
+            return 1 if failed else 0
+    finally:
+        db.close()
+    return 0
+
+
+def inventory_command(args):
+    db = Database(args.db)
+    if not db.initialize():
+        raise OSError(f"Could not open database {args.db}")
+    engine = InventoryEngine(db)
+    try:
+        if args.action == 'rebuild':
+            print(f"Inventory rebuilt from {engine.rebuild()} stock rows")
+        elif args.action == 'sync':
+            print(f"{engine.sync()} stock rows applied")
+        elif args.action == 'value':
+            day = args.as_of or date.today().isoformat()
+            for item, on_hand, fifo, average in engine.items_as_of(day):
+                print(f"{item:30} {on_hand:12.2f} {fifo:14.2f} {average:14.2f}")
+            fifo, average = engine.value_as_of(day, sync=False)
+            print(f"Inventory value as of {day}: FIFO {fifo:.2f}, weighted average {average:.2f}")
+        else:
+            if not (args.start and args.end):
+                raise ValueError("cogs needs --start and --end")
+            fifo, average = engine.cogs(args.start, args.end)
+            print(f"COGS {args.start}..{args.end}: FIFO {fifo:.2f}, weighted average {average:.2f}")
+    finally:
+        db.close()
+    return 0
+
+
+def settings_command(args):
+    db = Database(args.db)
+    if not db.initialize():
+        raise OSError(f"Could not open database {args.db}")
+    try:
+        changes = {field: getattr(args, field) for field in SETTINGS_FIELDS if getattr(args, field) is not None}
+        if changes and not db.update_settings(**changes):
+            raise OSError("Settings update failed, see finance_manager.log")
+        settings = db.config.settings()
+        for field in SETTINGS_FIELDS:
+            print(f"{field:18} {getattr(settings, field)}")
+        for record_type, names in sorted(db.config.categories().items()):
+            print(f"{record_type + ' categories':18} {', '.join(sorted(names))}")
+    finally:
+        db.close()
+    return 0
+
+
+def search_command(args):
+    db = Database(args.db)
+    if not db.initialize():
+        raise OSError(f"Could not open database {args.db}")
+    try:
+        if args.rebuild:
+            if not db.rebuild_search_index():
+                raise OSError("Full-text index rebuild failed, see finance_manager.log")
+            print("Full-text index rebuilt")
+            return 0
+        if not db.search_available():
+            raise ValueError("This SQLite build has no FTS5; full-text search is unavailable")
+        results = db.search(
+            ' '.join(args.text), tables=args.table and [args.table], limit=args.limit,
+            offset=(args.page - 1) * args.limit, prefix=not args.exact, order='recent' if args.recent else 'rank'
+        )
+        for table, row_id, day, title, detail, amount_cents, _ in results:
+            print(f"{table:17} {row_id:>9} {day}  {title:24} {detail or '':40} {format_cents(amount_cents):>14}")
+        print(f"{len(results)} results (page {args.page})")
+    finally:
+        db.close()
+    return 0
+
+
+def serve_command(args):
+    db = Database(args.db, readers=args.readers)
+    if not db.initialize():
+        raise OSError(f"Could not open database {args.db}")
+    try:
+        asyncio.run(serve(
+            db, args.host, args.port, invoice_dir=args.invoice_dir, logo_path=args.logo,
+            render_workers=args.render_workers, max_batch=args.max_batch
+        ))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+    return 0
+
+
+def verify_command(args):
+    # readers=1 only switches on WAL; the verifier opens its own read-only connections
+    db = Database(args.db, readers=1)
+    if not db.initialize():
+        raise OSError(f"Could not open database {args.db}")
+    report = args.report or str(db.db_path.with_name(f"{db.db_path.stem}_verify.jsonl"))
+    try:
+        summary = verify_data(
+            db, report, workers=args.workers, chunk_rows=args.chunk_rows, integrity=args.integrity, full=args.full,
+            progress=lambda done, total, message: print(f"\r{message}", end='', file=sys.stderr, flush=True)
+        )
+    finally:
+        db.close()
+    print(file=sys.stderr)
+    checked = summary['checked']
+    print(f"{summary['mode'].capitalize()} check in {summary['seconds']:.1f}s: {checked['stock']} stock rows, "
+          f"{checked['financial_records']} financial records, {checked['items']} items")
+    for check, count in summary['findings'].items():
+        print(f"{check:12} {count} findings")
+    print(f"Report written to {report}")
+    return 1 if any(summary['findings'].values()) else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='finance-manager', description="Finance Manager command line tools")
+    parser.add_argument('--db', default='finance.db', help="SQLite database path (default: finance.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importer = commands.add_parser('import', help="Bulk import a bank/POS CSV file")
+    importer.add_argument('kind', choices=sorted(PARSERS))
+    importer.add_argument('csv_path')
+    importer.add_argument('--map', action='append', metavar='FIELD=HEADER',
+                          help="Read a model field from a differently named column (repeatable)")
+    importer.add_argument('--chunk-rows', type=int, default=20000)
+    importer.add_argument('--workers', type=int, default=None)
+    importer.add_argument('--upsert', action='store_true',
+                          help="Update existing stock rows on UNIQUE conflicts instead of rejecting them")
+    importer.add_argument('--restart', action='store_true', help="Ignore any checkpoint and start from the top")
+    importer.add_argument('--check-categories', action='store_true',
+                          help="Reject income/expense rows whose category is not in the categories table")
+    importer.set_defaults(handler=import_command)
+
+    invoices = commands.add_parser('invoices', help="Render a batch of invoices from a JSON/JSONL spec file")
+    invoices.add_argument('specs', help="Invoice specs with date, customer_name, customer_address, items and optionally number")
+    invoices.add_argument('--output-dir', default='invoices')
+    invoices.add_argument('--workers', type=int, default=None)
+    invoices.add_argument('--logo', default=None, help="Logo drawn on every invoice that does not set logo_path")
+    invoices.add_argument('--tax-rate', type=float, default=None,
+                          help="Rate for specs without tax_rate (default: the rate in settings)")
+    invoices.add_argument('--no-record', action='store_true',
+                          help="Render only: every spec needs a number and nothing goes into the invoices table")
+    invoices.set_defaults(handler=invoices_command)
+
+    backup = commands.add_parser('backup', help="Create, list, verify or restore incremental backups")
+    backup.add_argument('action', choices=('create', 'list', 'verify', 'restore'))
+    backup.add_argument('name', nargs='?', help="Manifest name for verify/restore (default: verify all)")
+    backup.add_argument('--backup-dir', default=None, help="Backup store (default: backups/ next to the database)")
+    backup.add_argument('--target', default=None, help="Restore into this file instead of --db")
+    backup.add_argument('--force', action='store_true', help="Let restore replace an existing file")
+    backup.set_defaults(handler=backup_command)
+
+    archive = commands.add_parser('archive', help="Move closed fiscal years into read-only files, list or verify them")
+    archive.add_argument('action', choices=('year', 'list', 'verify', 'compact'))
+    archive.add_argument('year', nargs='?', type=int, help="Fiscal year to archive, or to verify (default: all)")
+    archive.add_argument('--start-month', type=int, default=1, help="First month of the fiscal year (default: 1)")
+    archive.add_argument('--no-vacuum', action='store_true',
+                         help="Skip the VACUUM that shrinks the main database afterwards")
+    archive.set_defaults(handler=archive_command)
+
+    inventory = commands.add_parser('inventory', help="On-hand quantity, inventory value and COGS from stock")
+    inventory.add_argument('action', choices=('sync', 'rebuild', 'value', 'cogs'))
+    inventory.add_argument('--as-of', default=None, help="Valuation date for 'value' (default: today)")
+    inventory.add_argument('--start', default=None)
+    inventory.add_argument('--end', default=None)
+    inventory.set_defaults(handler=inventory_command)
+
+    search = commands.add_parser('search', help="Full-text search over vendors, items and descriptions")
+    search.add_argument('text', nargs='*', help="Words that must all match; each also matches as a prefix")
+    search.add_argument('--table', choices=('stock', 'financial_records'), default=None)
+    search.add_argument('--limit', type=int, default=20)
+    search.add_argument('--page', type=int, default=1)
+    search.add_argument('--exact', action='store_true', help="Match whole words only")
+    search.add_argument('--recent', action='store_true', help="Newest first instead of best match first")
+    search.add_argument('--rebuild', action='store_true', help="Rebuild the full-text index from the tables")
+    search.set_defaults(handler=search_command)
+
+    serve = commands.add_parser('serve', help="Run the local JSON API over HTTP")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765, help="0 picks a free port (printed at startup)")
+    serve.add_argument('--readers', type=int, default=4, help="Read-only connections serving GET requests")
+    serve.add_argument('--invoice-dir', default='invoices', help="Where POST /invoices writes PDFs")
+    serve.add_argument('--logo', default=None, help="Logo for invoices that do not set logo_path")
+    serve.add_argument('--render-workers', type=int, default=None, help="Invoice rendering processes")
+    serve.add_argument('--max-batch', type=int, default=256,
+                       help="Most write requests committed in one transaction (1 disables coalescing)")
+    serve.set_defaults(handler=serve_command)
+
+    verify = commands.add_parser('verify', help="Check totals, categories, on-hand quantities and file integrity")
+    verify.add_argument('--full', action='store_true', help="Re-check every row, not only new or changed ones")
+    verify.add_argument('--report', default=None,
+                        help="JSON Lines findings file (default: <db>_verify.jsonl next to the database)")
+    verify.add_argument('--workers', type=int, default=None)
+    verify.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Rows per parallel rowid range")
+    verify.add_argument('--integrity', choices=INTEGRITY_MODES, default='full',
+                        help="PRAGMA integrity_check (full), quick_check (quick) or neither (skip)")
+    verify.set_defaults(handler=verify_command)
+
+    settings = commands.add_parser('settings', help="Show settings, or change the ones given")
+    settings.add_argument('--company-name', dest='company_name', default=None)
+    settings.add_argument('--logo-path', dest='logo_path', default=None)
+    settings.add_argument('--address', default=None)
+    settings.add_argument('--tax-rate', dest='tax_rate', type=float, default=None, help="e.g. 0.08 for 8%%")
+    settings.set_defaults(handler=settings_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except (ValueError, OSError, ArchiveError, BackupError) as e:
+        logging.error(f"{args.command} failed: {str(e)}")
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
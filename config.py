@@ -0,0 +1,65 @@
+import logging
+import sqlite3
+import threading
+
+from models import Settings
+
+SETTINGS_FIELDS = ('company_name', 'logo_path', 'address', 'tax_rate')
+DEFAULT_SETTINGS = Settings("My Business", "assets/logo.png", "", 0.0)
+
+
+# Settings and the category list as the application sees them, read from the
+# database once and then served from memory. Database.update_settings and
+# Database.add_category are the only writers and invalidate the cache, so
+# invoice rendering and bulk import validation never query SQLite for
+# configuration.
+class ConfigCache:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        # (settings, categories), replaced as a whole so a lock-free reader
+        # never sees one refreshed without the other
+        self._state = None
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+
+    def _load(self):
+        with self.db.reader() as conn:
+            row = conn.execute(f"SELECT {', '.join(SETTINGS_FIELDS)} FROM settings WHERE id = 1").fetchone()
+            categories = {'income': set(), 'expense': set()}
+            for record_type, name in conn.execute("SELECT type, name FROM categories"):
+                categories.setdefault(record_type, set()).add(name)
+        settings = Settings(*row) if row else DEFAULT_SETTINGS
+        return settings, {record_type: frozenset(names) for record_type, names in categories.items()}
+
+    def _loaded(self):
+        state = self._state
+        if state is not None:
+            return state
+        with self._lock:
+            if self._state is None:
+                try:
+                    self._state = self._load()
+                    logging.info("Settings and categories loaded")
+                except sqlite3.Error as e:
+                    logging.error(f"Error loading settings: {str(e)}")
+                    raise
+            return self._state
+
+    def settings(self):
+        return self._loaded()[0]
+
+    def tax_rate(self):
+        return self._loaded()[0].tax_rate
+
+    def categories(self, record_type=None):
+        # frozenset of names for one record type, or {record type: frozenset}
+        categories = self._loaded()[1]
+        if record_type is None:
+            return dict(categories)
+        return categories.get(record_type, frozenset())
+
+    def has_category(self, record_type, name):
+        return name in self._loaded()[1].get(record_type, ())
@@ -1,12 +1,507 @@
 import sqlite3
+import queue
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 import logging
+from dataclasses import replace
 from datetime import datetime
+from archive import ArchiveManager
+from backup import BackupManager, BackupError
+from config import ConfigCache, SETTINGS_FIELDS
+from instrumentation import QueryStats
+from models import INVOICE_NUMBER, INVOICE_NUMBER_ERROR
+from money import multiply_cents, to_cents
+
+STOCK_INSERT = """
+    INSERT INTO stock (date, transaction_type, vendor_name, item_name, quantity, unit_price_cents, total_price_cents)
+    VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+STOCK_UPSERT = STOCK_INSERT + """
+    ON CONFLICT(date, transaction_type, vendor_name, item_name) DO UPDATE SET
+        quantity = excluded.quantity,
+        unit_price_cents = excluded.unit_price_cents,
+        total_price_cents = excluded.total_price_cents"""
+
+FINANCIAL_RECORD_INSERT = """
+    INSERT INTO financial_records (type, date, category, description, amount_cents)
+    VALUES (?, ?, ?, ?, ?)"""
+
+CONFLICT_POLICIES = ('skip', 'upsert')
+# Numbers checked per IN (...) lookup, well under SQLite's bound-parameter limit
+INVOICE_LOOKUP_CHUNK = 5000
+
+# Connection tuning used in pool mode (Database(readers=N) with N > 0)
+POOL_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+BUSY_TIMEOUT = 30.0
+
+# Schema migrations applied in order by Database.initialize and tracked with
+# PRAGMA user_version; never edit a released step, append a new one instead
+MIGRATIONS = [
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_financial_records_type_date "
+        "ON financial_records(type, date, category, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_financial_records_category_date "
+        "ON financial_records(category, date, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_stock_item_date ON stock(item_name, date)",
+        "CREATE INDEX IF NOT EXISTS idx_stock_vendor_date "
+        "ON stock(vendor_name, date, transaction_type, total_price)",
+    ]),
+    (2, [
+        """
+        CREATE TABLE IF NOT EXISTS financial_daily_totals (
+            day TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            entries INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, type, category)
+        ) WITHOUT ROWID""",
+        """
+        INSERT INTO financial_daily_totals (day, type, category, total, entries)
+        SELECT date, type, category, SUM(amount), COUNT(*)
+        FROM financial_records WHERE type IS NOT NULL
+        GROUP BY date, type, category""",
+        """
+        CREATE TRIGGER IF NOT EXISTS financial_daily_totals_insert
+        AFTER INSERT ON financial_records WHEN NEW.type IS NOT NULL
+        BEGIN
+            INSERT INTO financial_daily_totals (day, type, category, total, entries)
+            VALUES (NEW.date, NEW.type, NEW.category, NEW.amount, 1)
+            ON CONFLICT(day, type, category) DO UPDATE SET
+                total = total + excluded.total,
+                entries = entries + 1;
+        END""",
+        """
+        CREATE TRIGGER IF NOT EXISTS financial_daily_totals_delete
+        AFTER DELETE ON financial_records WHEN OLD.type IS NOT NULL
+        BEGIN
+            UPDATE financial_daily_totals
+            SET total = total - OLD.amount, entries = entries - 1
+            WHERE day = OLD.date AND type = OLD.type AND category = OLD.category;
+        END""",
+        """
+        CREATE TRIGGER IF NOT EXISTS financial_daily_totals_update
+        AFTER UPDATE OF type, date, category, amount ON financial_records
+        BEGIN
+            UPDATE financial_daily_totals
+            SET total = total - OLD.amount, entries = entries - 1
+            WHERE day = OLD.date AND type = OLD.type AND category = OLD.category;
+            INSERT INTO financial_daily_totals (day, type, category, total, entries)
+            SELECT NEW.date, NEW.type, NEW.category, NEW.amount, 1 WHERE NEW.type IS NOT NULL
+            ON CONFLICT(day, type, category) DO UPDATE SET
+                total = total + excluded.total,
+                entries = entries + 1;
+        END""",
+    ]),
+    (3, [
+        # Inventory valuation state kept by inventory.InventoryEngine
+        """
+        CREATE TABLE IF NOT EXISTS inventory_items (
+            item_name TEXT PRIMARY KEY,
+            on_hand REAL NOT NULL DEFAULT 0,
+            avg_cost REAL NOT NULL DEFAULT 0,
+            fifo_value REAL NOT NULL DEFAULT 0,
+            last_date TEXT,
+            last_stock_id INTEGER
+        ) WITHOUT ROWID""",
+        """
+        CREATE TABLE IF NOT EXISTS inventory_layers (
+            item_name TEXT NOT NULL,
+            stock_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            unit_cost REAL NOT NULL,
+            PRIMARY KEY (item_name, stock_id)
+        ) WITHOUT ROWID""",
+        """
+        CREATE TABLE IF NOT EXISTS inventory_movements (
+            item_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            stock_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            on_hand REAL NOT NULL,
+            fifo_value REAL NOT NULL,
+            avg_value REAL NOT NULL,
+            cogs_fifo REAL NOT NULL DEFAULT 0,
+            cogs_avg REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (item_name, date, stock_id)
+        ) WITHOUT ROWID""",
+        """
+        CREATE TABLE IF NOT EXISTS inventory_daily_cogs (
+            day TEXT PRIMARY KEY,
+            cogs_fifo REAL NOT NULL DEFAULT 0,
+            cogs_avg REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID""",
+        """
+        CREATE TABLE IF NOT EXISTS inventory_state (
+            key TEXT PRIMARY KEY,
+            value
+        ) WITHOUT ROWID""",
+        # Items whose history changed under the engine; re-replayed on the next sync
+        """
+        CREATE TABLE IF NOT EXISTS inventory_dirty (
+            item_name TEXT PRIMARY KEY
+        ) WITHOUT ROWID""",
+        # ON CONFLICT rather than INSERT OR IGNORE: an upsert's own conflict
+        # policy overrides OR IGNORE inside the triggers it fires, which made
+        # every stock upsert that updated a row fail on inventory_dirty
+        """
+        CREATE TRIGGER IF NOT EXISTS inventory_dirty_update
+        AFTER UPDATE OF date, transaction_type, item_name, quantity, unit_price ON stock
+        BEGIN
+            INSERT INTO inventory_dirty (item_name) VALUES (OLD.item_name), (NEW.item_name)
+            ON CONFLICT DO NOTHING;
+        END""",
+        """
+        CREATE TRIGGER IF NOT EXISTS inventory_dirty_delete
+        AFTER DELETE ON stock
+        BEGIN
+            INSERT OR IGNORE INTO inventory_dirty (item_name) VALUES (OLD.item_name);
+        END""",
+    ]),
+    (4, [
+        # Money becomes integer cents (see money.py). SQLite cannot change a
+        # column's type, so both tables are rebuilt; their indexes and triggers
+        # are dropped with the old tables and recreated on the new columns.
+        """
+        CREATE TABLE stock_cents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            transaction_type TEXT CHECK(transaction_type IN ('Purchase', 'Sale')),
+            vendor_name TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            quantity REAL NOT NULL CHECK(quantity > 0),
+            unit_price_cents INTEGER NOT NULL CHECK(unit_price_cents >= 0),
+            total_price_cents INTEGER NOT NULL CHECK(total_price_cents >= 0),
+            UNIQUE(date, transaction_type, vendor_name, item_name)
+        )""",
+        """
+        INSERT INTO stock_cents
+            (id, date, transaction_type, vendor_name, item_name, quantity, unit_price_cents, total_price_cents)
+        SELECT id, date, transaction_type, vendor_name, item_name, quantity,
+               to_cents(unit_price), multiply_cents(to_cents(unit_price), quantity)
+        FROM stock""",
+        """
+        CREATE TABLE financial_records_cents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT CHECK(type IN ('income', 'expense')),
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            description TEXT,
+            amount_cents INTEGER NOT NULL CHECK(amount_cents >= 0),
+            verified BOOLEAN DEFAULT 0 CHECK(verified IN (0, 1))
+        )""",
+        """
+        INSERT INTO financial_records_cents (id, type, date, category, description, amount_cents, verified)
+        SELECT id, type, date, category, description, to_cents(amount), verified
+        FROM financial_records""",
+        # Keep AUTOINCREMENT counters so ids of deleted rows are never reused
+        """
+        UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT seq FROM sqlite_sequence WHERE name = 'stock'))
+        WHERE name = 'stock_cents' AND EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'stock')""",
+        """
+        UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT seq FROM sqlite_sequence WHERE name = 'financial_records'))
+        WHERE name = 'financial_records_cents'
+            AND EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'financial_records')""",
+        "DROP TABLE stock",
+        "DROP TABLE financial_records",
+        "DROP TABLE financial_daily_totals",
+        "ALTER TABLE stock_cents RENAME TO stock",
+        "ALTER TABLE financial_records_cents RENAME TO financial_records",
+        "CREATE INDEX idx_financial_records_type_date ON financial_records(type, date, category, amount_cents)",
+        "CREATE INDEX idx_financial_records_category_date ON financial_records(category, date, amount_cents)",
+        "CREATE INDEX idx_stock_item_date ON stock(item_name, date)",
+        "CREATE INDEX idx_stock_vendor_date ON stock(vendor_name, date, transaction_type, total_price_cents)",
+        """
+        CREATE TABLE financial_daily_totals (
+            day TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            entries INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, type, category)
+        ) WITHOUT ROWID""",
+        """
+        INSERT INTO financial_daily_totals (day, type, category, total_cents, entries)
+        SELECT date, type, category, SUM(amount_cents), COUNT(*)
+        FROM financial_records WHERE type IS NOT NULL
+        GROUP BY date, type, category""",
+        """
+        CREATE TRIGGER financial_daily_totals_insert
+        AFTER INSERT ON financial_records WHEN NEW.type IS NOT NULL
+        BEGIN
+            INSERT INTO financial_daily_totals (day, type, category, total_cents, entries)
+            VALUES (NEW.date, NEW.type, NEW.category, NEW.amount_cents, 1)
+            ON CONFLICT(day, type, category) DO UPDATE SET
+                total_cents = total_cents + excluded.total_cents,
+                entries = entries + 1;
+        END""",
+        """
+        CREATE TRIGGER financial_daily_totals_delete
+        AFTER DELETE ON financial_records WHEN OLD.type IS NOT NULL
+        BEGIN
+            UPDATE financial_daily_totals
+            SET total_cents = total_cents - OLD.amount_cents, entries = entries - 1
+            WHERE day = OLD.date AND type = OLD.type AND category = OLD.category;
+        END""",
+        """
+        CREATE TRIGGER financial_daily_totals_update
+        AFTER UPDATE OF type, date, category, amount_cents ON financial_records
+        BEGIN
+            UPDATE financial_daily_totals
+            SET total_cents = total_cents - OLD.amount_cents, entries = entries - 1
+            WHERE day = OLD.date AND type = OLD.type AND category = OLD.category;
+            INSERT INTO financial_daily_totals (day, type, category, total_cents, entries)
+            SELECT NEW.date, NEW.type, NEW.category, NEW.amount_cents, 1 WHERE NEW.type IS NOT NULL
+            ON CONFLICT(day, type, category) DO UPDATE SET
+                total_cents = total_cents + excluded.total_cents,
+                entries = entries + 1;
+        END""",
+        """
+        CREATE TRIGGER inventory_dirty_update
+        AFTER UPDATE OF date, transaction_type, item_name, quantity, unit_price_cents ON stock
+        BEGIN
+            INSERT INTO inventory_dirty (item_name) VALUES (OLD.item_name), (NEW.item_name)
+            ON CONFLICT DO NOTHING;
+        END""",
+        """
+        CREATE TRIGGER inventory_dirty_delete
+        AFTER DELETE ON stock
+        BEGIN
+            INSERT OR IGNORE INTO inventory_dirty (item_name) VALUES (OLD.item_name);
+        END""",
+    ]),
+    (5, [
+        # Fiscal years moved out to read-only files by archive.ArchiveManager
+        """
+        CREATE TABLE archived_years (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            first_day TEXT NOT NULL,
+            last_day TEXT NOT NULL,
+            stock_rows INTEGER NOT NULL,
+            stock_total_cents INTEGER NOT NULL,
+            record_rows INTEGER NOT NULL,
+            record_total_cents INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            archived_at TEXT NOT NULL
+        )""",
+    ]),
+    (6, [
+        # Every invoice number handed out, claimed before its PDF is written so a
+        # number is never issued twice; see Database.reserve_invoice_numbers
+        """
+        CREATE TABLE invoices (
+            number TEXT PRIMARY KEY,
+            date TEXT NOT NULL,
+            customer_name TEXT,
+            subtotal_cents INTEGER,
+            tax_cents INTEGER,
+            total_cents INTEGER,
+            path TEXT,
+            status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'issued', 'void')),
+            created_at TEXT NOT NULL
+        )""",
+        "CREATE INDEX idx_invoices_customer_date ON invoices(customer_name, date)",
+    ]),
+    (7, [
+        # verified = 1 marks a row the DataVerifier (verifier.py) has checked; any
+        # edit to a checked column clears it, so re-runs only read the partial
+        # indexes. Deleting or renaming a stock row changes the on-hand history of
+        # an item without leaving an unverified row behind, so those items are
+        # queued in verify_pending_items; changes counts edits since it was queued
+        "ALTER TABLE stock ADD COLUMN verified BOOLEAN DEFAULT 0 CHECK(verified IN (0, 1))",
+        "CREATE INDEX idx_stock_unverified ON stock(id) WHERE verified = 0",
+        "CREATE INDEX idx_financial_records_unverified ON financial_records(id) WHERE verified = 0",
+        """
+        CREATE TABLE verify_pending_items (
+            item_name TEXT PRIMARY KEY,
+            changes INTEGER NOT NULL DEFAULT 1
+        ) WITHOUT ROWID""",
+        """
+        CREATE TRIGGER stock_verified_update
+        AFTER UPDATE OF date, transaction_type, vendor_name, item_name, quantity, unit_price_cents,
+            total_price_cents ON stock
+        BEGIN
+            UPDATE stock SET verified = 0 WHERE id = NEW.id AND verified = 1;
+            INSERT INTO verify_pending_items (item_name) VALUES (OLD.item_name)
+            ON CONFLICT DO UPDATE SET changes = changes + 1;
+        END""",
+        """
+        CREATE TRIGGER stock_verified_delete
+        AFTER DELETE ON stock
+        BEGIN
+            INSERT INTO verify_pending_items (item_name) VALUES (OLD.item_name)
+            ON CONFLICT DO UPDATE SET changes = changes + 1;
+        END""",
+        """
+        CREATE TRIGGER financial_records_verified_update
+        AFTER UPDATE OF type, date, category, description, amount_cents ON financial_records
+        BEGIN
+            UPDATE financial_records SET verified = 0 WHERE id = NEW.id AND verified = 1;
+        END""",
+    ]),
+    (8, [
+        # Resume points of importer.CsvImporter, written in the same transaction
+        # as the chunk they follow: a crash can never replay a committed chunk.
+        # rejects_size is the committed length of the rejects file, which a
+        # resumed import truncates back to
+        """
+        CREATE TABLE import_checkpoints (
+            csv_path TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            next_row INTEGER NOT NULL,
+            written INTEGER NOT NULL,
+            rejected INTEGER NOT NULL,
+            rejects_size INTEGER NOT NULL
+        ) WITHOUT ROWID""",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Reporting access patterns the indexes above are designed for. {financial_records}
+# and {stock} are filled in by report_sql; the last two parameters are always the
+# date range, which Database.report_query uses to pull in archived years
+REPORT_QUERIES = {
+    'records_by_type': """
+        SELECT date, category, amount_cents FROM {financial_records}
+        WHERE type = ? AND date BETWEEN ? AND ? ORDER BY date""",
+    'totals_by_category': """
+        SELECT category, SUM(amount_cents) FROM {financial_records}
+        WHERE type = ? AND date BETWEEN ? AND ? GROUP BY category""",
+    'category_total': """
+        SELECT SUM(amount_cents) FROM {financial_records}
+        WHERE category = ? AND date BETWEEN ? AND ?""",
+    'stock_by_item': """
+        SELECT date, transaction_type, vendor_name, quantity, unit_price_cents FROM {stock}
+        WHERE item_name = ? AND date BETWEEN ? AND ? ORDER BY date""",
+    'vendor_totals': """
+        SELECT transaction_type, SUM(total_price_cents) FROM {stock}
+        WHERE vendor_name = ? AND date BETWEEN ? AND ? GROUP BY transaction_type""",
+}
+
+
+# Columns each report reads, so the archive union stays within covering indexes
+REPORT_COLUMNS = {
+    'records_by_type': ('type', 'date', 'category', 'amount_cents'),
+    'totals_by_category': ('type', 'date', 'category', 'amount_cents'),
+    'category_total': ('category', 'date', 'amount_cents'),
+    'stock_by_item': ('item_name', 'date', 'transaction_type', 'vendor_name', 'quantity', 'unit_price_cents'),
+    'vendor_totals': ('vendor_name', 'date', 'transaction_type', 'total_price_cents'),
+}
+
+
+def report_sql(name, stock='stock', financial_records='financial_records'):
+    # REPORT_QUERIES[name] over the given table sources (the hot tables by default)
+    return REPORT_QUERIES[name].format(stock=stock, financial_records=financial_records)
+
+
+# Optional FTS5 indexes over the ledger's free text, created by
+# Database._ensure_search_index when the SQLite build has FTS5. They are
+# external-content tables: only the inverted index is stored, the text stays
+# in stock / financial_records and triggers keep the two in step.
+SEARCH_INDEXES = {
+    'stock': ('stock_search', ('vendor_name', 'item_name')),
+    'financial_records': ('financial_records_search', ('description', 'category')),
+}
+# No prefix= indexes: they cost more on every insert than they save on "abc*" lookups
+SEARCH_TOKENIZER = "unicode61 remove_diacritics 2"
+# table -> (date, title, detail, amount in cents) columns returned by Database.search
+SEARCH_RESULT_COLUMNS = {
+    'stock': "date, item_name, vendor_name || ' (' || transaction_type || ')', total_price_cents",
+    'financial_records': "date, category, description, amount_cents",
+}
+
+
+def _search_schema(table):
+    index, columns = SEARCH_INDEXES[table]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"NEW.{column}" for column in columns)
+    old_values = ', '.join(f"OLD.{column}" for column in columns)
+    return [
+        f"""CREATE VIRTUAL TABLE {index} USING fts5(
+            {column_list}, content='{table}', content_rowid='id', tokenize='{SEARCH_TOKENIZER}'
+        )""",
+        f"""CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {index} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+        END""",
+        f"""CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {index} ({index}, rowid, {column_list}) VALUES ('delete', OLD.id, {old_values});
+        END""",
+        f"""CREATE TRIGGER {index}_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+            INSERT INTO {index} ({index}, rowid, {column_list}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO {index} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+        END""",
+        f"INSERT INTO {index} ({index}) VALUES ('rebuild')",
+    ]
+
+
+def search_expression(text, prefix=True):
+    # User text -> FTS5 MATCH expression: every word must match, each one
+    # quoted so punctuation (SKU-00042, O'Brien) cannot break the syntax
+    terms = [term.replace('"', '""') for term in text.split()]
+    return ' '.join(f'"{term}"*' if prefix else f'"{term}"' for term in terms)
+
+
+def _date_text(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def stock_row(transaction):
+    unit_price_cents = transaction.unit_price_cents
+    return (
+        _date_text(transaction.date),
+        transaction.transaction_type,
+        transaction.vendor_name,
+        transaction.item_name,
+        transaction.quantity,
+        unit_price_cents,
+        multiply_cents(unit_price_cents, transaction.quantity)
+    )
+
+
+def _sql_to_cents(value):
+    return None if value is None else to_cents(value)
+
+
+def _sql_multiply_cents(cents, factor):
+    return None if cents is None or factor is None else multiply_cents(cents, factor)
+
+
+def financial_record_row(record):
+    return (
+        record.record_type,
+        _date_text(record.date),
+        record.category,
+        record.description,
+        record.amount_cents
+    )
 
 class Database:
-    def __init__(self, db_path='finance.db'):
+    def __init__(self, db_path='finance.db', readers=0):
         self.db_path = Path(db_path)
         self.conn = None
+        # readers > 0 enables pool mode: WAL journaling, one shared writer
+        # connection guarded by _write_lock and N read-only connections
+        self.readers = readers
+        self._write_lock = threading.RLock()
+        self._reader_pool = None
+        self._reader_conns = []
+        self.config = ConfigCache(self)
+        # Closed fiscal years in read-only files, attached on demand by the report paths
+        self.archives = ArchiveManager(self)
+        # QueryStats while instrumentation is enabled; execute_query checks only this
+        self.stats = None
+        self._hooks = None
         self.setup_logging()
         
     def setup_logging(self):
@@ -19,8 +514,18 @@ class Database:
     def connect(self):
         try:
             if not self.conn:
-                self.conn = sqlite3.connect(self.db_path)
+                if self.readers:
+                    self.conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+                    self.conn.execute("PRAGMA journal_mode = WAL")
+                    for pragma in POOL_PRAGMAS:
+                        self.conn.execute(pragma)
+                else:
+                    self.conn = sqlite3.connect(self.db_path)
                 self.conn.execute("PRAGMA foreign_keys = ON")
+                # Used by the integer-cents migration
+                self.conn.create_function('to_cents', 1, _sql_to_cents, deterministic=True)
+                self.conn.create_function('multiply_cents', 2, _sql_multiply_cents, deterministic=True)
+                self._install_hooks(self.conn)
                 logging.info("Database connection established")
             return True
         except sqlite3.Error as e:
@@ -28,11 +533,101 @@ class Database:
             return False
     
     def close(self):
+        for reader in self._reader_conns:
+            reader.close()
+        self._reader_conns = []
+        self._reader_pool = None
         if self.conn:
             self.conn.close()
             self.conn = None
             logging.info("Database connection closed")
     
+    def _open_readers(self):
+        with self._write_lock:
+            if self._reader_pool is not None:
+                return
+            self.connect()
+            pool = queue.Queue()
+            uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+            for _ in range(self.readers):
+                reader = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+                for pragma in POOL_PRAGMAS:
+                    reader.execute(pragma)
+                self._install_hooks(reader)
+                self._reader_conns.append(reader)
+                pool.put(reader)
+            self._reader_pool = pool
+            logging.info(f"Opened {self.readers} read-only connections")
+    
+    def enable_instrumentation(self, stats=None, trace=False, progress_steps=None):
+        # Starts timing execute_query (see instrumentation.QueryStats); trace and
+        # progress_steps also install sqlite3 hooks on every connection
+        with self._write_lock:
+            self.stats = stats or QueryStats()
+            if self.stats.explain is None:
+                self.stats.explain = self._explain_plan
+            self._hooks = (trace, progress_steps)
+            for conn in self._connections():
+                self._install_hooks(conn)
+        return self.stats
+    
+    def disable_instrumentation(self):
+        with self._write_lock:
+            for conn in self._connections():
+                QueryStats.remove_hooks(conn)
+            stats, self.stats, self._hooks = self.stats, None, None
+        return stats
+    
+    def _connections(self):
+        return ([self.conn] if self.conn else []) + self._reader_conns
+    
+    def _install_hooks(self, conn):
+        if self.stats is not None and self._hooks:
+            self.stats.install_hooks(conn, *self._hooks)
+    
+    def _explain_plan(self, query, params=()):
+        # For the slow-query log: bypasses execute_query so it is not itself timed
+        with self._write_lock:
+            self.connect()
+            return [row[3] for row in self.conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    
+    @contextmanager
+    def reader(self):
+        # A connection for read-only work; in pool mode it never waits on the
+        # writer, otherwise it is the single shared connection
+        if not self.readers:
+            with self._write_lock:
+                self.connect()
+                yield self.conn
+            return
+        self._open_readers()
+        conn = self._reader_pool.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._reader_pool.put(conn)
+    
+    @contextmanager
+    def transaction(self, archives=False):
+        # Serialises writers and runs the block in BEGIN IMMEDIATE ... COMMIT,
+        # rolling back if it raises. archives=True first attaches every archived
+        # year, for blocks that read whole histories through archives.source()
+        with self._write_lock:
+            self.connect()
+            if self.conn.in_transaction:
+                self.conn.commit()
+            if archives:
+                self.archives.attach(self.conn)
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+    
     def initialize(self):
         if not self.connect():
             return False
@@ -106,6 +701,10 @@ class Database:
                     pass
             
             self.conn.commit()
+            self._migrate()
+            self._ensure_search_index()
+            self.config.invalidate()
+            self.archives.invalidate()
             logging.info("Database initialized successfully")
             return True
             
@@ -113,26 +712,421 @@ class Database:
             logging.error(f"Database initialization failed: {str(e)}")
             return False
     
-    def execute_query(self, query, params=(), commit=False):
-        try:
-            self.connect()  # Ensure connection is open
+    def _migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, steps in MIGRATIONS:
+            if target <= version:
+                continue
             cursor = self.conn.cursor()
-            cursor.execute(query, params)
-            if commit:
+            try:
+                cursor.execute("BEGIN")
+                for step in steps:
+                    cursor.execute(step)
+                cursor.execute(f"PRAGMA user_version = {target}")
                 self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+            logging.info(f"Schema migrated to version {target}")
+    
+    def search_available(self):
+        with self._write_lock:
+            self.connect()
+            return all(self._table_exists(index) for index, _ in SEARCH_INDEXES.values())
+    
+    def _table_exists(self, name):
+        return self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+    
+    def _ensure_search_index(self):
+        # Builds any missing FTS5 index from the current rows; without FTS5
+        # the application works as before and search() raises
+        for table, (index, _) in SEARCH_INDEXES.items():
+            if self._table_exists(index):
+                continue
+            try:
+                with self.transaction() as conn:
+                    for step in _search_schema(table):
+                        conn.execute(step)
+            except sqlite3.OperationalError as e:
+                if 'fts5' not in str(e):
+                    raise
+                logging.warning(f"SQLite build lacks FTS5, full-text search disabled: {str(e)}")
+                return False
+            logging.info(f"Full-text index {index} built")
+        return True
+    
+    def rebuild_search_index(self):
+        # Re-reads every row into the FTS5 indexes (e.g. after bulk edits with triggers disabled)
+        if not self._ensure_search_index():
+            return False
+        try:
+            with self.transaction() as conn:
+                for index, _ in SEARCH_INDEXES.values():
+                    conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+                    conn.execute(f"INSERT INTO {index} ({index}) VALUES ('optimize')")
+            logging.info("Full-text indexes rebuilt")
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Full-text index rebuild failed: {str(e)}")
+            return False
+    
+    def search(self, text, tables=None, limit=50, offset=0, prefix=True, order='rank'):
+        # [(table, id, date, title, detail, amount_cents, score), ...] for rows
+        # matching every word of text. order='rank' sorts by bm25 relevance
+        # (score, lower is better); order='recent' newest first, which stops
+        # early on very common words
+        if order not in ('rank', 'recent'):
+            raise ValueError("order must be 'rank' or 'recent'")
+        expression = search_expression(text, prefix)
+        if not expression:
+            return []
+        wanted = offset + limit
+        results = []
+        with self.reader() as conn:
+            for table in tables or SEARCH_INDEXES:
+                index, _ = SEARCH_INDEXES[table]
+                ordering = "rank" if order == 'rank' else "rowid DESC"
+                rows = conn.execute(f"""
+                    SELECT matches.rowid, {SEARCH_RESULT_COLUMNS[table]}, matches.rank
+                    FROM (
+                        SELECT rowid, rank FROM {index} WHERE {index} MATCH ? ORDER BY {ordering} LIMIT ?
+                    ) AS matches
+                    CROSS JOIN {table} ON {table}.id = matches.rowid""", (expression, wanted)).fetchall()
+                results.extend((table, *row) for row in rows)
+        if order == 'rank':
+            results.sort(key=lambda row: row[-1])
+        else:
+            results.sort(key=lambda row: (row[2], row[1]), reverse=True)
+        return results[offset:wanted]
+    
+    def schema_version(self):
+        return self.execute_query("PRAGMA user_version").fetchone()[0]
+    
+    def report_query(self, name, params):
+        # Runs REPORT_QUERIES[name] over the hot tables plus any archived years in its date range
+        start, end = params[-2], params[-1]
+        with self.reader() as conn:
+            table = 'stock' if '{stock}' in REPORT_QUERIES[name] else 'financial_records'
+            sources = {table: self.archives.source(conn, table, start, end, REPORT_COLUMNS[name])}
+            return conn.execute(report_sql(name, **sources), params).fetchall()
+    
+    def explain_query_plan(self, query, params=()):
+        cursor = self.execute_query(f"EXPLAIN QUERY PLAN {query}", params)
+        return [row[3] for row in cursor.fetchall()]
+    
+    def execute_query(self, query, params=(), commit=False):
+        stats = self.stats
+        try:
+            with self._write_lock:
+                self.connect()  # Ensure connection is open
+                cursor = self.conn.cursor()
+                if stats is None:
+                    cursor.execute(query, params)
+                else:
+                    cursor = stats.execute(cursor, query, params)
+                if commit:
+                    self.conn.commit()
             return cursor
         except sqlite3.Error as e:
             logging.error(f"Query failed: {query} - Error: {str(e)}")
             raise
     
-    def backup_database(self):
-        backup_path = self.db_path.parent / f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+    def update_settings(self, **changes):
+        # The only write path for settings; validates the merged result and
+        # invalidates self.config so the next read sees the new values
+        unknown = set(changes) - set(SETTINGS_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        if not changes:
+            return True
+        settings = replace(self.config.settings(), **changes)
+        errors = settings.validate()
+        if errors:
+            raise ValueError('; '.join(errors))
         try:
-            with sqlite3.connect(str(backup_path)) as backup:
-                self.connect()
-                self.conn.backup(backup)
-            logging.info(f"Database backup created at {backup_path}")
+            with self.transaction() as conn:
+                conn.execute(
+                    f"UPDATE settings SET {', '.join(f'{field} = ?' for field in changes)} WHERE id = 1",
+                    [getattr(settings, field) for field in changes]
+                )
+            logging.info(f"Settings updated: {', '.join(sorted(changes))}")
             return True
         except sqlite3.Error as e:
+            logging.error(f"Settings update failed: {str(e)}")
+            return False
+        finally:
+            self.config.invalidate()
+    
+    def add_category(self, record_type, name):
+        try:
+            with self.transaction() as conn:
+                conn.execute("INSERT OR IGNORE INTO categories (type, name) VALUES (?, ?)", (record_type, name))
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Adding category {record_type}/{name} failed: {str(e)}")
+            return False
+        finally:
+            self.config.invalidate()
+    
+    def reserve_invoice_numbers(self, count=1):
+        # Takes the next `count` invoice numbers from settings.invoice_counter in
+        # one BEGIN IMMEDIATE transaction, so concurrent processes get disjoint,
+        # sequential blocks without a round trip per invoice
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        with self.transaction() as conn:
+            numbers = self._allocate_invoice_numbers(conn, count)
+        logging.info(f"Reserved invoice numbers {numbers[0]}..{numbers[-1]}")
+        return numbers
+    
+    def _allocate_invoice_numbers(self, conn, count, skip=()):
+        # Numbers already in invoices (typed in by hand) or in skip are passed over
+        numbers = []
+        counter = conn.execute("SELECT invoice_counter FROM settings WHERE id = 1").fetchone()[0] or 1
+        while len(numbers) < count:
+            block = min(count - len(numbers), INVOICE_LOOKUP_CHUNK)
+            candidates = [str(n) for n in range(counter, counter + block)]
+            taken = self._existing_invoices(conn, candidates).union(skip)
+            numbers.extend(number for number in candidates if number not in taken)
+            counter += block
+        conn.execute("UPDATE settings SET invoice_counter = ? WHERE id = 1", (counter,))
+        return numbers
+    
+    def _existing_invoices(self, conn, numbers):
+        taken = set()
+        for start in range(0, len(numbers), INVOICE_LOOKUP_CHUNK):
+            chunk = numbers[start:start + INVOICE_LOOKUP_CHUNK]
+            taken.update(number for (number,) in conn.execute(
+                f"SELECT number FROM invoices WHERE number IN ({', '.join('?' * len(chunk))})", chunk
+            ))
+        return taken
+    
+    def claim_invoices(self, invoices, conn=None):
+        # Records [(number, date, customer_name), ...] as pending before
+        # rendering and returns their numbers; a None number is allocated from the
+        # counter in the same transaction. All or nothing: raises ValueError,
+        # consuming no numbers, if any given number was issued before. With conn,
+        # runs inside the caller's open transaction
+        if conn is None:
+            with self.transaction() as conn:
+                return self.claim_invoices(invoices, conn)
+        given = [str(invoice[0]) for invoice in invoices if invoice[0] is not None]
+        if len(set(given)) != len(given):
+            raise ValueError("Duplicate invoice numbers in one batch")
+        invalid = [number for number in given if not INVOICE_NUMBER.fullmatch(number)]
+        if invalid:
+            raise ValueError(f"{INVOICE_NUMBER_ERROR}: {', '.join(repr(number) for number in invalid[:10])}")
+        created = datetime.now().isoformat(timespec='seconds')
+        taken = self._existing_invoices(conn, given)
+        if taken:
+            raise ValueError(f"Invoice numbers already issued: {', '.join(sorted(taken)[:10])}")
+        missing = sum(1 for invoice in invoices if invoice[0] is None)
+        allocated = iter(self._allocate_invoice_numbers(conn, missing, set(given)) if missing else ())
+        rows = [
+            (next(allocated) if number is None else str(number), str(day), customer)
+            for number, day, customer in invoices
+        ]
+        conn.executemany(
+            "INSERT INTO invoices (number, date, customer_name, created_at) VALUES (?, ?, ?, ?)",
+            [(*row, created) for row in rows]
+        )
+        return [row[0] for row in rows]
+    
+    def complete_invoices(self, results, conn=None):
+        # [(number, path, totals or None), ...] after rendering: totals (the dict
+        # from invoicing.render_invoice) mark the invoice issued, None marks it void
+        # so the number stays accounted for
+        if conn is None:
+            with self.transaction() as conn:
+                return self.complete_invoices(results, conn)
+        conn.executemany(
+            "UPDATE invoices SET status = 'issued', path = ?, subtotal_cents = ?, tax_cents = ?, total_cents = ? "
+            "WHERE number = ?",
+            [(str(path), totals['subtotal'], totals['tax'], totals['total'], str(number))
+             for number, path, totals in results if totals is not None]
+        )
+        conn.executemany(
+            "UPDATE invoices SET status = 'void' WHERE number = ?",
+            [(str(number),) for number, _, totals in results if totals is None]
+        )
+    
+    def find_invoice(self, number):
+        with self.reader() as conn:
+            cursor = conn.execute("SELECT * FROM invoices WHERE number = ?", (str(number),))
+            row = cursor.fetchone()
+            return dict(zip([column[0] for column in cursor.description], row)) if row else None
+    
+    def insert_stock_many(self, transactions, chunk_size=5000, on_conflict='skip', before_commit=None):
+        if on_conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"on_conflict must be one of {CONFLICT_POLICIES}")
+        query = STOCK_UPSERT if on_conflict == 'upsert' else STOCK_INSERT
+        return self._insert_many('stock', query, transactions, stock_row, chunk_size, before_commit)
+    
+    def insert_financial_records_many(self, records, chunk_size=5000, before_commit=None):
+        return self._insert_many(
+            'financial_records', FINANCIAL_RECORD_INSERT, records, financial_record_row, chunk_size, before_commit
+        )
+    
+    def insert_batch(self, batch, chunk_size=5000, on_conflict='skip'):
+        # Columnar variant of insert_*_many for batch.StockBatch / FinancialRecordBatch:
+        # validation runs vectorised over the whole batch, rows go through the same chunked writer
+        if on_conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"on_conflict must be one of {CONFLICT_POLICIES}")
+        if batch.table == 'stock':
+            query = STOCK_UPSERT if on_conflict == 'upsert' else STOCK_INSERT
+        else:
+            query = FINANCIAL_RECORD_INSERT
+        rows, rejects = batch.insert_rows()
+        written = 0
+        for start in range(0, len(rows), chunk_size):
+            written += self._write_chunk(query, rows[start:start + chunk_size], rejects)
+        rejects.sort(key=lambda reject: reject[0])
+        logging.info(f"Bulk insert into {batch.table}: {written} written, {len(rejects)} rejected")
+        return written, rejects
+    
+    def _insert_many(self, table, query, records, to_row, chunk_size, before_commit=None):
+        # Returns (rows written, [(input index, [errors]), ...]); bad rows never abort the batch.
+        # before_commit(cursor, rejects) runs inside each chunk's transaction, just before
+        # its commit, so callers can record progress atomically with the rows
+        written = 0
+        rejects = []
+        chunk = []
+        for index, record in enumerate(records):
+            try:
+                errors = record.validate()
+            except (AttributeError, TypeError) as e:
+                errors = [str(e)]
+            if errors:
+                rejects.append((index, errors))
+                continue
+            chunk.append((index, to_row(record)))
+            if len(chunk) >= chunk_size:
+                written += self._write_chunk(query, chunk, rejects, before_commit)
+                chunk = []
+        if chunk:
+            written += self._write_chunk(query, chunk, rejects, before_commit)
+        rejects.sort(key=lambda reject: reject[0])
+        logging.info(f"Bulk insert into {table}: {written} written, {len(rejects)} rejected")
+        return written, rejects
+    
+    def _write_chunk(self, query, chunk, rejects, before_commit=None):
+        with self._write_lock:
+            self.connect()
+            cursor = self.conn.cursor()
+            try:
+                cursor.executemany(query, [row for _, row in chunk])
+                if before_commit:
+                    before_commit(cursor, rejects)
+                self.conn.commit()
+                return len(chunk)
+            except sqlite3.IntegrityError:
+                self.conn.rollback()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                logging.error(f"Bulk insert failed: {query} - Error: {str(e)}")
+                raise
+            except BaseException:
+                self.conn.rollback()
+                raise
+        
+            # Some row violated a constraint: replay the chunk row by row in one
+            # transaction so only the offending rows are rejected
+            written = 0
+            try:
+                for index, row in chunk:
+                    try:
+                        cursor.execute(query, row)
+                        written += 1
+                    except sqlite3.IntegrityError as e:
+                        rejects.append((index, [str(e)]))
+                if before_commit:
+                    before_commit(cursor, rejects)
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                logging.error(f"Bulk insert failed: {query} - Error: {str(e)}")
+                raise
+            except BaseException:
+                self.conn.rollback()
+                raise
+            return written
+    
+    def daily_totals(self):
+        return self.execute_query(
+            "SELECT day, type, category, total_cents FROM financial_daily_totals WHERE entries > 0"
+        )
+    
+    def rebuild_daily_totals(self):
+        with self._write_lock:
+            # Recompute the summary table from financial_records and return every
+            # (day, type, category, stored, actual) that had drifted
+            self.connect()
+            if self.conn.in_transaction:
+                self.conn.commit()
+            # Archived days are still in the summary, so their rows count too
+            source = self.archives.source(
+                self.conn, 'financial_records', columns=('date', 'type', 'category', 'amount_cents')
+            )
+            cursor = self.conn.cursor()
+            try:
+                stored = {
+                    (day, record_type, category): total
+                    for day, record_type, category, total in cursor.execute(
+                        "SELECT day, type, category, total_cents FROM financial_daily_totals WHERE entries != 0"
+                    )
+                }
+                actual = {
+                    (day, record_type, category): (total, entries)
+                    for day, record_type, category, total, entries in cursor.execute(f"""
+                        SELECT date, type, category, SUM(amount_cents), COUNT(*)
+                        FROM {source} WHERE type IS NOT NULL
+                        GROUP BY date, type, category""")
+                }
+                drift = []
+                for key in stored.keys() | actual.keys():
+                    stored_total = stored.get(key, 0)
+                    actual_total = actual.get(key, (0, 0))[0]
+                    # Integer cents: any difference at all is drift
+                    if key not in stored or key not in actual or stored_total != actual_total:
+                        drift.append((*key, stored_total, actual_total))
+            
+                cursor.execute("DELETE FROM financial_daily_totals")
+                cursor.executemany(
+                    "INSERT INTO financial_daily_totals (day, type, category, total_cents, entries) VALUES (?, ?, ?, ?, ?)",
+                    [(*key, total, entries) for key, (total, entries) in actual.items()]
+                )
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                logging.error(f"Rebuilding daily totals failed: {str(e)}")
+                raise
+            drift.sort()
+            for day, record_type, category, stored_total, actual_total in drift:
+                logging.warning(
+                    f"Daily total drift {day} {record_type}/{category}: stored {stored_total}, actual {actual_total}"
+                )
+            logging.info(f"Daily totals rebuilt, {len(drift)} drifted entries repaired")
+            return drift
+    
+    def vacuum(self):
+        # Returns the space freed by deletes (e.g. archived years) to the file system
+        with self._write_lock:
+            self.connect()
+            if self.conn.in_transaction:
+                self.conn.commit()
+            before = self.db_path.stat().st_size
+            self.conn.execute("VACUUM")
+            if self.readers:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            logging.info(f"Database vacuumed: {before} -> {self.db_path.stat().st_size} bytes")
+    
+    def backup_database(self, progress=None, pages=1024):
+        # Incremental, deduplicated snapshot into backups/ (see backup.BackupManager);
+        # progress(remaining, total) follows the page copy and may raise to abort
+        try:
+            name, _ = BackupManager(self).create(progress=progress, pages=pages)
+            logging.info(f"Database backup created: {name}")
+            return True
+        except (sqlite3.Error, OSError, BackupError) as e:
             logging.error(f"Backup failed: {str(e)}")
-            return False
\ No newline at end of file
+            return False
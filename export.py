@@ -0,0 +1,140 @@
+import csv
+import gzip
+import json
+import logging
+import os
+from pathlib import Path
+
+EXPORT_COLUMNS = {
+    'stock': ('id', 'date', 'transaction_type', 'vendor_name', 'item_name', 'quantity', 'unit_price', 'total_price'),
+    'financial_records': ('id', 'type', 'date', 'category', 'description', 'amount', 'verified'),
+}
+# Money is stored in integer cents but exported as decimal amounts, so files keep their columns
+COLUMN_EXPRESSIONS = {
+    'unit_price': 'unit_price_cents / 100.0',
+    'total_price': 'total_price_cents / 100.0',
+    'amount': 'amount_cents / 100.0',
+}
+TYPE_COLUMNS = {'stock': 'transaction_type', 'financial_records': 'type'}
+FORMATS = ('csv', 'jsonl')
+FETCH_SIZE = 10000
+
+
+def _filters(table, start, end, record_type):
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Cannot export table {table!r}")
+    clauses, params = [], []
+    if start:
+        clauses.append("date >= ?")
+        params.append(str(start))
+    if end:
+        clauses.append("date <= ?")
+        params.append(str(end))
+    if record_type:
+        clauses.append(f"{TYPE_COLUMNS[table]} = ?")
+        params.append(record_type)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def export_queries(db, conn, table, start=None, end=None, record_type=None):
+    # [(sql, params)], one per archived file in the range (oldest first) and then
+    # main. Each walks its table in rowid order, NOT INDEXED so the planner never
+    # picks a date or type index whose order would need a sort: any sort, or a
+    # UNION ALL across files, would hold the whole result set in temp storage
+    where, params = _filters(table, start, end, record_type)
+    queries = []
+    for schema, present in db.archives.parts(conn, table, start, end):
+        # Columns added after an archive was written export as NULL
+        select = ', '.join(
+            COLUMN_EXPRESSIONS.get(column, column) if column in present or column in COLUMN_EXPRESSIONS
+            else f"NULL AS {column}"
+            for column in EXPORT_COLUMNS[table]
+        )
+        queries.append((f"SELECT {select} FROM {schema}.{table} NOT INDEXED{where} ORDER BY id", params))
+    return queries
+
+
+def iter_chunks(db, table, start=None, end=None, record_type=None, fetch_size=FETCH_SIZE):
+    # Yields lists of at most fetch_size rows; the full result set is never held in memory.
+    # Archived years in the range come first, each file in id order; ids stay unique across the files
+    with db.reader() as conn:
+        queries = export_queries(db, conn, table, start, end, record_type)
+        # One read transaction over every file, so rows archived mid-export are neither missed nor repeated
+        began = not conn.in_transaction
+        if began:
+            conn.execute("BEGIN")
+        try:
+            for query, params in queries:
+                cursor = conn.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            if began and conn.in_transaction:
+                conn.commit()
+
+
+def count_rows(db, table, start=None, end=None, record_type=None):
+    where, params = _filters(table, start, end, record_type)
+    with db.reader() as conn:
+        source = db.archives.source(conn, table, start, end)
+        return conn.execute(f"SELECT COUNT(*) FROM {source}{where}", params).fetchone()[0]
+
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def _format_for(path):
+    name = str(path).lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return 'jsonl' if name.endswith(('.jsonl', '.json')) else 'csv'
+
+
+def export_table(db, table, path, fmt=None, start=None, end=None, record_type=None, compress=None,
+                 fetch_size=FETCH_SIZE, progress=None):
+    # Format and compression default from the file name (e.g. ledger.jsonl.gz);
+    # progress(rows written) runs after every chunk. Returns rows written
+    fmt = fmt or _format_for(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Export format must be one of {FORMATS}")
+    if compress is None:
+        compress = str(path).lower().endswith('.gz')
+
+    columns = EXPORT_COLUMNS.get(table)
+    chunks = iter_chunks(db, table, start, end, record_type, fetch_size)
+    written = 0
+    # Written under a .part name and renamed at the end, so a failed or
+    # cancelled export never leaves a truncated file that looks complete
+    path = Path(path)
+    part = path.with_name(f"{path.name}.part")
+    try:
+        with _open_output(part, compress) as output:
+            if fmt == 'csv':
+                writer = csv.writer(output)
+                writer.writerow(columns)
+                for rows in chunks:
+                    writer.writerows(rows)
+                    written += len(rows)
+                    if progress:
+                        progress(written)
+            else:
+                encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+                for rows in chunks:
+                    output.write(''.join(encode(dict(zip(columns, row))) + '\n' for row in rows))
+                    written += len(rows)
+                    if progress:
+                        progress(written)
+        os.replace(part, path)
+    except BaseException:
+        chunks.close()
+        part.unlink(missing_ok=True)
+        raise
+    logging.info(f"Exported {written} {table} rows to {path} ({fmt}{', gzip' if compress else ''})")
+    return written
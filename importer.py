@@ -0,0 +1,305 @@
+import csv
+import json
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from database import Database
+from inventory import InventoryEngine
+from models import FinancialRecord, StockTransaction
+
+# Model field -> CSV header read by default; override per file with a column mapping
+DEFAULT_COLUMNS = {
+    'stock': {
+        'date': 'date',
+        'transaction_type': 'transaction_type',
+        'vendor_name': 'vendor_name',
+        'item_name': 'item_name',
+        'quantity': 'quantity',
+        'unit_price': 'unit_price',
+    },
+    'financial_records': {
+        'record_type': 'type',
+        'date': 'date',
+        'category': 'category',
+        'description': 'description',
+        'amount': 'amount',
+    },
+}
+CHUNK_ROWS = 20000
+CHECKPOINT_SAVE = """
+    INSERT OR REPLACE INTO import_checkpoints
+        (csv_path, kind, size, byte_offset, next_row, written, rejected, rejects_size)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def _number(text):
+    return float(text.replace('$', '').replace(',', '').strip())
+
+
+def _parse_stock(values):
+    return StockTransaction(
+        date=date.fromisoformat(values['date'].strip()),
+        transaction_type=values['transaction_type'].strip().capitalize(),
+        vendor_name=values['vendor_name'],
+        item_name=values['item_name'],
+        quantity=_number(values['quantity']),
+        unit_price=_number(values['unit_price'])
+    )
+
+
+def _parse_financial_record(values):
+    return FinancialRecord(
+        record_type=values['record_type'].strip().lower(),
+        date=date.fromisoformat(values['date'].strip()),
+        category=values['category'],
+        description=values.get('description') or '',
+        amount=_number(values['amount'])
+    )
+
+
+PARSERS = {'stock': _parse_stock, 'financial_records': _parse_financial_record}
+
+
+def parse_chunk(kind, positions, lines, first_row, categories=None):
+    # Runs in a worker process: CSV-decode, map and validate one chunk.
+    # categories ({record type: names}, from Database.config) rejects unknown ones.
+    # Returns ([(row, record)], [(row, errors)]) with 1-based data row numbers
+    parse = PARSERS[kind]
+    records, rejects = [], []
+    for offset, values in enumerate(csv.reader(line.decode('utf-8-sig') for line in lines)):
+        row = first_row + offset
+        if not values:
+            continue
+        try:
+            record = parse({field: values[index] for field, index in positions.items()})
+            errors = record.validate()
+        except (ValueError, IndexError, AttributeError) as e:
+            errors = [f"Could not parse row: {e}"]
+        if not errors and categories is not None and record.category not in categories.get(record.record_type, ()):
+            errors = [f"Unknown {record.record_type} category {record.category!r}"]
+        if errors:
+            rejects.append((row, errors))
+        else:
+            records.append((row, record))
+    return records, rejects
+
+
+def _read_chunks(handle, chunk_rows):
+    # Yields (lines, end offset) keeping quoted fields that span lines together
+    lines, pending = [], b''
+    for raw in handle:
+        pending += raw
+        if pending.count(b'"') % 2:
+            continue
+        lines.append(pending)
+        pending = b''
+        if len(lines) >= chunk_rows:
+            yield lines, handle.tell()
+            lines = []
+    if pending:
+        lines.append(pending)
+    if lines:
+        yield lines, handle.tell()
+
+
+# Chunked, resumable CSV import into stock or financial_records. Chunks of raw
+# lines are parsed and validated in a process pool, and a single writer thread
+# commits them in file order through Database's bulk insert API. Each chunk's
+# commit also records the byte offset reached in import_checkpoints, so a
+# failed import restarts from the last committed chunk and never replays one.
+class CsvImporter:
+    def __init__(self, db_path, kind, csv_path, columns=None, chunk_rows=CHUNK_ROWS, workers=None,
+                 on_conflict='skip', rejects_path=None, check_categories=False):
+        if kind not in PARSERS:
+            raise ValueError(f"Unknown import kind {kind!r}, expected one of {tuple(PARSERS)}")
+        self.db_path = db_path
+        self.kind = kind
+        self.csv_path = Path(csv_path)
+        self.columns = {**DEFAULT_COLUMNS[kind], **(columns or {})}
+        self.chunk_rows = chunk_rows
+        self.workers = workers or os.cpu_count() or 1
+        self.on_conflict = on_conflict
+        self.rejects_path = Path(rejects_path or f"{self.csv_path}.rejects.jsonl")
+        self.check_categories = check_categories and kind == 'financial_records'
+        self.written = 0
+        self.rejected = 0
+        # Length of the rejects file as of the last committed chunk
+        self.rejects_size = 0
+
+    def _positions(self, header_line):
+        header = [name.strip() for name in next(csv.reader([header_line.decode('utf-8-sig')]))]
+        positions = {}
+        for field, column in self.columns.items():
+            if column in header:
+                positions[field] = header.index(column)
+            elif field != 'description':
+                raise ValueError(f"Column {column!r} for {field} not found in {self.csv_path.name} header")
+        return positions
+
+    def _open_db(self):
+        db = Database(self.db_path)
+        if not db.initialize():
+            raise RuntimeError(f"Could not open database {self.db_path}")
+        return db
+
+    def _checkpoint_key(self):
+        return str(self.csv_path.resolve())
+
+    def _load_checkpoint(self, db, header_end):
+        state = db.execute_query(
+            "SELECT kind, size, byte_offset, next_row, written, rejected, rejects_size FROM import_checkpoints "
+            "WHERE csv_path = ?", (self._checkpoint_key(),)
+        ).fetchone()
+        self.rejects_size = self.rejects_path.stat().st_size if self.rejects_path.exists() else 0
+        if state is None:
+            return header_end, 1
+        kind, size, offset, row, written, rejected, rejects_size = state
+        if size != self.csv_path.stat().st_size or kind != self.kind:
+            logging.warning(f"Ignoring stale import checkpoint for {self.csv_path}")
+            return header_end, 1
+        self.written = written
+        self.rejected = rejected
+        # Rejects written for a chunk whose commit never happened are dropped; it is parsed again
+        self.rejects_size = min(rejects_size, self.rejects_size)
+        logging.info(f"Resuming import of {self.csv_path} at row {row}")
+        return offset, row
+
+    def _clear_checkpoint(self, db):
+        db.execute_query("DELETE FROM import_checkpoints WHERE csv_path = ?", (self._checkpoint_key(),), commit=True)
+
+    def _commit_progress(self, cursor, rejects_file, rejects, end_offset, next_row, written):
+        # Inside the chunk's transaction: rewrites the chunk's rejects after the
+        # last committed ones (so a rolled back attempt leaves no trace), then
+        # stores the resume point. Returns the rejects file length to adopt on commit
+        rejects_file.seek(self.rejects_size)
+        rejects_file.truncate()
+        for row, errors in sorted(rejects):
+            rejects_file.write(json.dumps({'row': row, 'errors': errors}).encode('utf-8') + b'\n')
+        rejects_file.flush()
+        os.fsync(rejects_file.fileno())
+        size = rejects_file.tell()
+        cursor.execute(CHECKPOINT_SAVE, (
+            self._checkpoint_key(), self.kind, self.csv_path.stat().st_size, end_offset, next_row,
+            self.written + written, self.rejected + len(rejects), size,
+        ))
+        return size
+
+    def _categories(self):
+        # Read once through the config cache and shipped to every worker with its chunk
+        if not self.check_categories:
+            return None
+        return self._with_db(lambda db: db.config.categories())
+
+    def _write(self, db, rejects_file, records, rejects, end_offset, next_row):
+        insert = db.insert_stock_many if self.kind == 'stock' else db.insert_financial_records_many
+        options = {'on_conflict': self.on_conflict} if self.kind == 'stock' else {}
+        rows = [row for row, _ in records]
+        committed = []
+
+        def before_commit(cursor, db_rejects):
+            chunk_rejects = rejects + [(rows[index], errors) for index, errors in db_rejects]
+            written = len(records) - len(db_rejects)
+            committed[:] = [self._commit_progress(
+                cursor, rejects_file, chunk_rejects, end_offset, next_row, written
+            ), written, len(chunk_rejects)]
+
+        db_rejects = []
+        if records:
+            _, db_rejects = insert(
+                [record for _, record in records], chunk_size=len(records), before_commit=before_commit, **options
+            )
+        if not committed:
+            # No row reached the database (all rejected): the checkpoint commits on its own
+            with db.transaction() as conn:
+                before_commit(conn.cursor(), db_rejects)
+        self.rejects_size, written, rejected = committed
+        self.written += written
+        self.rejected += rejected
+
+    def _writer(self, results, failure):
+        # Sole owner of the write connection; commits chunks in file order
+        try:
+            db = self._open_db()
+        except RuntimeError as e:
+            failure.append(e)
+            while results.get() is not None:
+                pass
+            return
+        try:
+            with open(self.rejects_path, 'ab') as rejects_file:
+                while True:
+                    item = results.get()
+                    if item is None:
+                        break
+                    self._write(db, rejects_file, *item)
+            if self.kind == 'stock' and not failure:
+                InventoryEngine(db).sync()
+        except Exception as e:
+            failure.append(e)
+            logging.error(f"Import writer failed: {str(e)}")
+            while results.get() is not None:
+                pass
+        finally:
+            db.close()
+
+    def _with_db(self, fn, *args):
+        db = self._open_db()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    def run(self, resume=True):
+        if not resume:
+            self.rejects_path.unlink(missing_ok=True)
+            self._with_db(self._clear_checkpoint)
+        categories = self._categories()
+
+        with open(self.csv_path, 'rb') as handle:
+            header_line = handle.readline()
+            positions = self._positions(header_line)
+            offset, row = self._with_db(self._load_checkpoint, handle.tell())
+            handle.seek(offset)
+
+            results = queue.Queue(maxsize=self.workers * 2)
+            failure = []
+            writer = threading.Thread(target=self._writer, args=(results, failure), daemon=True)
+            writer.start()
+            in_flight = deque()
+            try:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    for lines, end_offset in _read_chunks(handle, self.chunk_rows):
+                        if failure:
+                            break
+                        in_flight.append((pool.submit(parse_chunk, self.kind, positions, lines, row, categories),
+                                          end_offset, row + len(lines)))
+                        row += len(lines)
+                        while len(in_flight) > self.workers * 2:
+                            self._forward(in_flight.popleft(), results)
+                    while in_flight and not failure:
+                        self._forward(in_flight.popleft(), results)
+            finally:
+                results.put(None)
+                writer.join()
+
+        if failure:
+            raise failure[0]
+        self._with_db(self._clear_checkpoint)
+        logging.info(f"Imported {self.csv_path}: {self.written} rows written, {self.rejected} rejected")
+        return self.written, self.rejected
+
+    @staticmethod
+    def _forward(entry, results):
+        future, end_offset, next_row = entry
+        records, rejects = future.result()
+        results.put((records, rejects, end_offset, next_row))
+
+
+def import_csv(db_path, kind, csv_path, resume=True, **options):
+    return CsvImporter(db_path, kind, csv_path, **options).run(resume=resume)
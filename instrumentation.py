@@ -0,0 +1,312 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+# Upper bounds in seconds, Prometheus style; the last bucket catches everything
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_QUERY_SECONDS = 0.1
+SLOW_LOG_SIZE = 100
+# Statements seen only through the trace/progress hooks, outside execute_query
+OTHER = '<other>'
+METRIC_PREFIX = 'finance_query'
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    # One key per statement shape: literals become ?, IN lists collapse, whitespace folds
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (?, ...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class _Series:
+    __slots__ = ('count', 'total', 'max', 'rows', 'errors', 'slow', 'traced', 'vm_steps', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.slow = 0
+        self.traced = 0
+        self.vm_steps = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds, rows):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.rows += rows
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.count if self.count else 0.0,
+            'max_seconds': self.max,
+            'rows': self.rows,
+            'errors': self.errors,
+            'slow': self.slow,
+            'traced': self.traced,
+            'vm_steps': self.vm_steps,
+            # Cumulative, keyed by upper bound
+            'buckets': dict(zip([str(bound) for bound in BUCKETS] + ['+Inf'], _cumulative(self.buckets))),
+        }
+
+
+def _cumulative(counts):
+    total = 0
+    result = []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _TimedCursor:
+    # Wraps a row-returning cursor so fetch time and row count are added to the
+    # statement's sample once the result set is exhausted or the cursor closed
+    __slots__ = ('_stats', '_key', '_cursor', '_seconds', '_rows', '_query', '_params', '_done')
+
+    def __init__(self, stats, key, cursor, seconds, query, params):
+        self._stats = stats
+        self._key = key
+        self._cursor = cursor
+        self._seconds = seconds
+        self._rows = 0
+        self._query = query
+        self._params = params
+        self._done = False
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            self._stats.record(self._key, self._seconds, self._rows, self._query, self._params)
+
+    def _timed(self, fetch, *args):
+        # Most of a SELECT's work happens while stepping, so the progress hook is attributed here too
+        local = self._stats._local
+        local.key = self._key
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self._seconds += time.perf_counter() - started
+            local.key = None
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(self._cursor.fetchmany, self._cursor.arraysize if size is None else size)
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __del__(self):
+        self._finish()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+# Per-statement timing for Database.execute_query, enabled with
+# Database.enable_instrumentation. Samples are keyed by normalize_sql() so
+# "... WHERE id = 7" and "... WHERE id = 8" share one latency histogram.
+# Statements slower than slow_threshold are logged and kept with their
+# EXPLAIN QUERY PLAN in a bounded slow log. The optional trace and progress
+# hooks also count statements that bypass execute_query (reader connections,
+# executemany, transactions) and approximate VM work per statement.
+class QueryStats:
+    def __init__(self, slow_threshold=SLOW_QUERY_SECONDS, explain=None, slow_log_size=SLOW_LOG_SIZE):
+        self.slow_threshold = slow_threshold
+        # explain(query, params) -> [plan lines]; Database supplies one bound to its connection
+        self.explain = explain
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.started = time.time()
+        self._series = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get(self, key):
+        # Caller holds _lock
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series()
+        return series
+
+    def execute(self, cursor, query, params=()):
+        key = normalize_sql(query)
+        self._local.key = key
+        started = time.perf_counter()
+        try:
+            cursor.execute(query, params)
+        except sqlite3.Error:
+            with self._lock:
+                self._get(key).errors += 1
+            raise
+        finally:
+            self._local.key = None
+        seconds = time.perf_counter() - started
+        if cursor.description is None:
+            self.record(key, seconds, max(cursor.rowcount, 0), query, params)
+            return cursor
+        return _TimedCursor(self, key, cursor, seconds, query, params)
+
+    def record(self, key, seconds, rows, query=None, params=()):
+        with self._lock:
+            series = self._get(key)
+            series.observe(seconds, rows)
+            slow = seconds >= self.slow_threshold
+            if slow:
+                series.slow += 1
+        if slow:
+            self._log_slow(key, seconds, rows, query, params)
+
+    def _log_slow(self, key, seconds, rows, query, params):
+        plan = []
+        if self.explain and query is not None:
+            try:
+                plan = self.explain(query, params)
+            except sqlite3.Error as e:
+                plan = [f"EXPLAIN QUERY PLAN failed: {e}"]
+        entry = {
+            'at': time.time(),
+            'seconds': seconds,
+            'rows': rows,
+            'query': key,
+            'plan': plan,
+        }
+        self.slow_log.append(entry)
+        logging.warning(
+            f"Slow query ({seconds * 1000:.1f} ms, {rows} rows): {key}" + (f" | plan: {' | '.join(plan)}" if plan else "")
+        )
+
+    def install_hooks(self, conn, trace=False, progress_steps=None):
+        # Optional sqlite3 hooks on one connection
+        if trace:
+            conn.set_trace_callback(self._traced)
+        if progress_steps:
+            conn.set_progress_handler(lambda: self._progress(progress_steps), progress_steps)
+
+    @staticmethod
+    def remove_hooks(conn):
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, 0)
+
+    def _traced(self, statement):
+        # statement has its parameters expanded; normalising folds them back
+        key = normalize_sql(statement)
+        with self._lock:
+            self._get(key).traced += 1
+
+    def _progress(self, steps):
+        key = getattr(self._local, 'key', None) or OTHER
+        with self._lock:
+            self._get(key).vm_steps += steps
+        return 0
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+            self.slow_log.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            queries = {key: series.as_dict() for key, series in self._series.items()}
+        return {
+            'since': self.started,
+            'slow_threshold_seconds': self.slow_threshold,
+            'queries': dict(sorted(queries.items(), key=lambda item: -item[1]['total_seconds'])),
+            'slow_log': list(self.slow_log),
+        }
+
+    def top(self, count=10):
+        # [(normalized SQL, stats dict), ...] by total time spent
+        return list(self.snapshot()['queries'].items())[:count]
+
+    def to_json(self, indent=1):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        queries = self.snapshot()['queries']
+        lines = [
+            f"# HELP {prefix}_duration_seconds SQL statement latency through Database.execute_query",
+            f"# TYPE {prefix}_duration_seconds histogram",
+        ]
+        for key, stats in queries.items():
+            if not stats['count']:
+                continue
+            label = f'query="{_label(key)}"'
+            for bound, count in stats['buckets'].items():
+                lines.append(f'{prefix}_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f"{prefix}_duration_seconds_sum{{{label}}} {stats['total_seconds']}")
+            lines.append(f"{prefix}_duration_seconds_count{{{label}}} {stats['count']}")
+        for name, field, help_text in (
+            ('rows_total', 'rows', "Rows returned or changed"),
+            ('errors_total', 'errors', "Statements that raised sqlite3.Error"),
+            ('slow_total', 'slow', "Statements at or above the slow-query threshold"),
+            ('traced_total', 'traced', "Statements seen by the sqlite3 trace callback"),
+            ('vm_steps_total', 'vm_steps', "Approximate SQLite VM instructions (progress handler)"),
+        ):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for key, stats in queries.items():
+                if stats[field]:
+                    lines.append(f'{prefix}_{name}{{query="{_label(key)}"}} {stats[field]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        # .prom/.txt files get Prometheus text format, anything else JSON
+        text = self.to_prometheus() if str(path).endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(text)
+        return path
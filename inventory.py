@@ -0,0 +1,291 @@
+import logging
+from collections import deque
+
+SYNCED_KEY = 'synced_stock_id'
+FLUSH_ROWS = 10000
+# Quantities below this are rounding noise left after consuming a layer
+EPSILON = 1e-9
+
+# Valuation runs in float dollars: average costs and fractional quantities are not whole cents.
+# {stock} is the hot table, or the union with archived years for full replays
+STOCK_HISTORY = "SELECT id, date, transaction_type, item_name, quantity, unit_price_cents / 100.0 FROM {stock}"
+HISTORY_COLUMNS = ('id', 'date', 'transaction_type', 'item_name', 'quantity', 'unit_price_cents')
+MOVEMENT_INSERT = """
+    INSERT INTO inventory_movements
+        (stock_id, item_name, date, quantity, on_hand, fifo_value, avg_value, cogs_fifo, cogs_avg)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+DAILY_COGS_ADD = """
+    INSERT INTO inventory_daily_cogs (day, cogs_fifo, cogs_avg) VALUES (?, ?, ?)
+    ON CONFLICT(day) DO UPDATE SET
+        cogs_fifo = cogs_fifo + excluded.cogs_fifo,
+        cogs_avg = cogs_avg + excluded.cogs_avg"""
+# CROSS JOIN pins the loop order: one primary-key seek per item
+ITEMS_AS_OF = """
+    SELECT m.item_name, m.on_hand, m.fifo_value, m.avg_value
+    FROM inventory_items i CROSS JOIN inventory_movements m
+    ON m.item_name = i.item_name AND (m.date, m.stock_id) = (
+        SELECT date, stock_id FROM inventory_movements
+        WHERE item_name = i.item_name AND date <= ?
+        ORDER BY date DESC, stock_id DESC LIMIT 1
+    )"""
+
+
+class ItemState:
+    def __init__(self, item_name, on_hand=0.0, avg_cost=0.0, fifo_value=0.0, last_date=None, last_stock_id=None,
+                 layers=()):
+        self.item_name = item_name
+        self.on_hand = on_hand
+        self.avg_cost = avg_cost
+        self.fifo_value = fifo_value
+        self.last_date = last_date
+        self.last_stock_id = last_stock_id
+        # Open FIFO cost layers [stock_id, date, quantity, unit_cost], oldest
+        # first. Units sold before they were bought leave a single negative
+        # layer that later purchases fill before opening new layers.
+        self.layers = deque(list(layer) for layer in layers)
+
+    def apply(self, stock_id, day, transaction_type, quantity, unit_price):
+        # Applies one stock row (rows must arrive in date, id order) and
+        # returns its inventory_movements row
+        cogs_fifo = cogs_avg = 0.0
+        if transaction_type == 'Purchase':
+            if self.on_hand <= 0:
+                self.avg_cost = unit_price
+            else:
+                self.avg_cost = (self.on_hand * self.avg_cost + quantity * unit_price) / (self.on_hand + quantity)
+            remaining = quantity
+            if self.layers and self.layers[0][2] < 0:
+                head = self.layers[0]
+                filled = min(remaining, -head[2])
+                head[2] += filled
+                self.fifo_value += filled * head[3]
+                remaining -= filled
+                if head[2] > -EPSILON:
+                    self.layers.popleft()
+            if remaining > EPSILON:
+                self.layers.append([stock_id, day, remaining, unit_price])
+                self.fifo_value += remaining * unit_price
+            self.on_hand += quantity
+            signed = quantity
+        else:
+            remaining = quantity
+            while remaining > EPSILON and self.layers and self.layers[0][2] > 0:
+                head = self.layers[0]
+                used = min(remaining, head[2])
+                cogs_fifo += used * head[3]
+                head[2] -= used
+                remaining -= used
+                if head[2] < EPSILON:
+                    self.layers.popleft()
+            if remaining > EPSILON:
+                # Oversold: cost the shortfall at the current average until stock arrives
+                if self.layers:
+                    self.layers[0][2] -= remaining
+                    cogs_fifo += remaining * self.layers[0][3]
+                else:
+                    self.layers.append([stock_id, day, -remaining, self.avg_cost])
+                    cogs_fifo += remaining * self.avg_cost
+            self.fifo_value -= cogs_fifo
+            cogs_avg = quantity * self.avg_cost
+            self.on_hand -= quantity
+            signed = -quantity
+        self.last_date = day
+        self.last_stock_id = stock_id
+        return (
+            stock_id, self.item_name, day, signed, self.on_hand, self.fifo_value,
+            self.on_hand * self.avg_cost, cogs_fifo, cogs_avg
+        )
+
+
+# Per-item on-hand quantity, FIFO layers and weighted-average cost for the
+# stock table, persisted in the inventory_* side tables. sync() applies only
+# stock rows added since the last sync (tracked by stock id); items whose
+# history changed (backdated rows, edits and deletes, flagged by triggers) are
+# replayed on their own. Every movement stores the running quantity and value
+# after it and COGS is summed per day, so valuation as of any date is one
+# primary-key seek per item and COGS a range sum over days, never a replay.
+class InventoryEngine:
+    def __init__(self, db):
+        self.db = db
+
+    def sync(self):
+        # Returns the number of stock rows applied or replayed
+        with self.db.transaction(archives=True) as conn:
+            synced = self._synced(conn)
+            # New rows always land in the hot table; only replays need the archived years
+            rows = conn.execute(
+                f"{STOCK_HISTORY.format(stock='stock')} WHERE id > ? ORDER BY id", (synced,)
+            ).fetchall()
+            dirty = {item for (item,) in conn.execute("SELECT item_name FROM inventory_dirty")}
+            if not rows and not dirty:
+                return 0
+            if not synced and not conn.execute("SELECT 1 FROM inventory_items LIMIT 1").fetchone():
+                applied = self._replay(conn)
+                conn.execute("DELETE FROM inventory_dirty")
+                logging.info(f"Inventory built from {applied} stock rows")
+                return applied
+
+            # A row dated before its item's last movement cannot be appended; replay that item
+            last_dates = {}
+            for _, day, _, item, _, _ in rows:
+                if item in dirty:
+                    continue
+                if item not in last_dates:
+                    found = conn.execute(
+                        "SELECT last_date FROM inventory_items WHERE item_name = ?", (item,)
+                    ).fetchone()
+                    last_dates[item] = found[0] if found else None
+                if last_dates[item] is not None and day < last_dates[item]:
+                    dirty.add(item)
+                else:
+                    last_dates[item] = day
+
+            states = {}
+            movements = []
+            for stock_id, day, transaction_type, item, quantity, unit_price in rows:
+                if item in dirty:
+                    continue
+                state = states.get(item) or states.setdefault(item, self._load_state(conn, item))
+                movements.append(state.apply(stock_id, day, transaction_type, quantity, unit_price))
+                if len(movements) >= FLUSH_ROWS:
+                    self._write_movements(conn, movements)
+                    movements = []
+            self._write_movements(conn, movements)
+            self._save_states(conn, states.values())
+
+            replayed = self._replay(conn, dirty) if dirty else 0
+            conn.execute("DELETE FROM inventory_dirty")
+            if rows:
+                self._set_synced(conn, rows[-1][0])
+        applied = len(rows) - sum(1 for row in rows if row[3] in dirty)
+        logging.info(f"Inventory synced: {applied} stock rows applied, {len(dirty)} items replayed ({replayed} rows)")
+        return applied + replayed
+
+    def rebuild(self):
+        # Full repair path: discard the side tables and replay all of stock
+        with self.db.transaction(archives=True) as conn:
+            replayed = self._replay(conn)
+            conn.execute("DELETE FROM inventory_dirty")
+        logging.info(f"Inventory rebuilt from {replayed} stock rows")
+        return replayed
+
+    def items_as_of(self, day, sync=True):
+        # [(item_name, on_hand, fifo_value, average_value), ...] after the last movement on or before day
+        if sync:
+            self.sync()
+        with self.db.reader() as conn:
+            return conn.execute(f"{ITEMS_AS_OF} ORDER BY m.item_name", (str(day),)).fetchall()
+
+    def value_as_of(self, day, sync=True):
+        # (FIFO value, weighted-average value) of everything on hand at the end of day
+        if sync:
+            self.sync()
+        with self.db.reader() as conn:
+            fifo, average = conn.execute(
+                f"SELECT SUM(fifo_value), SUM(avg_value) FROM ({ITEMS_AS_OF})", (str(day),)
+            ).fetchone()
+        return fifo or 0.0, average or 0.0
+
+    def cogs(self, start, end, item_name=None, sync=True):
+        # (FIFO, weighted-average) cost of goods sold for sales dated in [start, end]
+        if sync:
+            self.sync()
+        if item_name is None:
+            query = "SELECT SUM(cogs_fifo), SUM(cogs_avg) FROM inventory_daily_cogs WHERE day BETWEEN ? AND ?"
+            params = (str(start), str(end))
+        else:
+            query = ("SELECT SUM(cogs_fifo), SUM(cogs_avg) FROM inventory_movements "
+                     "WHERE item_name = ? AND date BETWEEN ? AND ?")
+            params = (item_name, str(start), str(end))
+        with self.db.reader() as conn:
+            fifo, average = conn.execute(query, params).fetchone()
+        return fifo or 0.0, average or 0.0
+
+    def _synced(self, conn):
+        row = conn.execute("SELECT value FROM inventory_state WHERE key = ?", (SYNCED_KEY,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_synced(self, conn, stock_id):
+        conn.execute(
+            "INSERT INTO inventory_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (SYNCED_KEY, stock_id)
+        )
+
+    def _load_state(self, conn, item):
+        row = conn.execute(
+            "SELECT on_hand, avg_cost, fifo_value, last_date, last_stock_id FROM inventory_items WHERE item_name = ?",
+            (item,)
+        ).fetchone()
+        if row is None:
+            return ItemState(item)
+        layers = conn.execute(
+            "SELECT stock_id, date, quantity, unit_cost FROM inventory_layers WHERE item_name = ? ORDER BY stock_id",
+            (item,)
+        ).fetchall()
+        return ItemState(item, *row, layers=layers)
+
+    def _save_states(self, conn, states):
+        states = list(states)
+        conn.executemany(
+            "INSERT OR REPLACE INTO inventory_items "
+            "(item_name, on_hand, avg_cost, fifo_value, last_date, last_stock_id) VALUES (?, ?, ?, ?, ?, ?)",
+            [(s.item_name, s.on_hand, s.avg_cost, s.fifo_value, s.last_date, s.last_stock_id) for s in states]
+        )
+        conn.executemany("DELETE FROM inventory_layers WHERE item_name = ?", [(s.item_name,) for s in states])
+        conn.executemany(
+            "INSERT INTO inventory_layers (item_name, stock_id, date, quantity, unit_cost) VALUES (?, ?, ?, ?, ?)",
+            [(s.item_name, *layer) for s in states for layer in s.layers]
+        )
+
+    def _write_movements(self, conn, movements):
+        conn.executemany(MOVEMENT_INSERT, movements)
+        daily = {}
+        for movement in movements:
+            if movement[7] or movement[8]:
+                totals = daily.setdefault(movement[2], [0.0, 0.0])
+                totals[0] += movement[7]
+                totals[1] += movement[8]
+        conn.executemany(DAILY_COGS_ADD, [(day, fifo, average) for day, (fifo, average) in daily.items()])
+
+    def _replay(self, conn, items=None):
+        # Recomputes the given items (all when None) from stock in (date, id) order
+        history = STOCK_HISTORY.format(stock=self.db.archives.source(conn, 'stock', columns=HISTORY_COLUMNS))
+        if items is None:
+            for table in ('inventory_movements', 'inventory_layers', 'inventory_items', 'inventory_daily_cogs'):
+                conn.execute(f"DELETE FROM {table}")
+            batches = [conn.execute(f"{history} ORDER BY item_name, date, id")]
+        else:
+            keys = [(item,) for item in sorted(items)]
+            for key in keys:
+                conn.executemany(DAILY_COGS_ADD, conn.execute(
+                    "SELECT date, -SUM(cogs_fifo), -SUM(cogs_avg) FROM inventory_movements "
+                    "WHERE item_name = ? GROUP BY date", key
+                ).fetchall())
+            for table in ('inventory_movements', 'inventory_layers', 'inventory_items'):
+                conn.executemany(f"DELETE FROM {table} WHERE item_name = ?", keys)
+            batches = (
+                conn.execute(f"{history} WHERE item_name = ? ORDER BY date, id", key).fetchall()
+                for key in keys
+            )
+
+        replayed = 0
+        state = None
+        movements = []
+        for cursor in batches:
+            for stock_id, day, transaction_type, item, quantity, unit_price in cursor:
+                if state is None or state.item_name != item:
+                    if state is not None:
+                        self._save_states(conn, [state])
+                    state = ItemState(item)
+                movements.append(state.apply(stock_id, day, transaction_type, quantity, unit_price))
+                replayed += 1
+                if len(movements) >= FLUSH_ROWS:
+                    self._write_movements(conn, movements)
+                    movements = []
+        self._write_movements(conn, movements)
+        if state is not None:
+            self._save_states(conn, [state])
+        if items is None:
+            self._set_synced(conn, conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock").fetchone()[0])
+        return replayed
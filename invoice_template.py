@@ -1,49 +1,55 @@
 import os
 import logging
+import sqlite3
 import subprocess
 import webbrowser
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
+from tkinter import ttk, messagebox
 from datetime import datetime
-from PIL import ImageTk, Image
-import uuid
-import urllib.request
-
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-
-# Download logo from provided URL if not already downloaded
+from pathlib import Path
+from config import DEFAULT_SETTINGS
+from money import format_cents, multiply_cents, to_cents
+from totals import ProfitLossEngine
+
+# Nothing here touches the network, creates Tk windows or imports ReportLab/PIL
+# at import time: the logo comes from a local cache and rendering modules are
+# imported on first use, so this module stays importable headless.
 logo_url = "https://static.vecteezy.com/system/resources/previews/008/214/517/non_2x/abstract-geometric-logo-or-infinity-line-logo-for-your-company-free-vector.jpg"
 downloaded_logo = "downloaded_logo.png"
-
-def download_logo():
-    if not os.path.exists(downloaded_logo):
-        try:
-            urllib.request.urlretrieve(logo_url, downloaded_logo)
-            print("Logo downloaded successfully.")
-        except Exception as e:
-            print(f"Error downloading logo: {e}")
-
-download_logo()
-
-# Default logo path is the downloaded logo if available
-logo_path = downloaded_logo if os.path.exists(downloaded_logo) else "assets/logo.png"
-selected_logo_path = logo_path
-
-# Initialize Tkinter window
-root = tk.Tk()
-root.title("Finance Manager")
-root.geometry("500x600")
+# Checked in order; the first file that exists is used
+LOGO_CANDIDATES = (downloaded_logo, "assets/logo.png", "assests/logo.png")
+DOWNLOAD_TIMEOUT = 10
+
+def resolve_logo(preferred=None):
+    for candidate in ((preferred,) if preferred else ()) + LOGO_CANDIDATES:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def download_logo(timeout=DOWNLOAD_TIMEOUT):
+    # Explicit, opt-in refresh of the cached logo; never called at import
+    if os.path.exists(downloaded_logo):
+        return True
+    import urllib.request
+
+    partial = Path(f"{downloaded_logo}.part")
+    try:
+        with urllib.request.urlopen(logo_url, timeout=timeout) as response:
+            partial.write_bytes(response.read())
+        os.replace(partial, downloaded_logo)
+        logging.info("Logo downloaded successfully.")
+        return True
+    except Exception as e:
+        partial.unlink(missing_ok=True)
+        logging.warning(f"Error downloading logo: {e}")
+        return False
 
 class FinanceManager:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.stock_records = []
         self.income_expense = {"income": [], "expense": []}
+        self.totals = ProfitLossEngine()
 
     def add_stock(self, entry_type, vendor, product, quantity, price):
         self.stock_records.append({
@@ -59,71 +65,47 @@ class FinanceManager:
             "category": category,
             "amount": amount
         })
+        self.totals.add(entry_type, category, to_cents(amount))
 
-    def calculate_profit_loss(self):
-        total_income = sum(entry['amount'] for entry in self.income_expense['income'])
-        total_expense = sum(entry['amount'] for entry in self.income_expense['expense'])
-        return total_income - total_expense
+    def calculate_profit_loss(self, start=None, end=None):
+        return self.totals.net(start, end)
 
-    def generate_invoice(self, invoice_data):
+    def _render(self, invoice_data):
+        # (success, path or error, totals in cents or None)
+        from invoicing import render_invoice, invoice_filename
         try:
-            output_path = f"Invoice_{invoice_data['number']}.pdf"
-            c = canvas.Canvas(output_path, pagesize=letter)
-            width, height = letter
-
-            # Draw header text
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(50, height - 50, "Invoice")
-
-            # Draw logo on top-right
-            if os.path.exists(invoice_data["logo_path"]):
-                c.drawImage(invoice_data["logo_path"], width - 150, height - 100, width=100, height=50)
-
-            # Draw invoice info
-            c.setFont("Helvetica", 12)
-            c.drawString(50, height - 80, f"Invoice #: {invoice_data['number']}")
-            c.drawString(50, height - 100, f"Date: {invoice_data['date']}")
-
-            # Draw customer info
-            c.drawString(50, height - 130, f"Customer Name: {invoice_data['customer_name']}")
-            c.drawString(50, height - 150, f"Address: {invoice_data['customer_address']}")
-
-            # Draw the items table using ReportLab's Table
-            self._draw_items_table(c, width, height, invoice_data)
-
-            c.save()
+            path = invoice_filename(invoice_data['number'])
+            if os.path.exists(path):
+                raise FileExistsError(f"{path} already exists; invoices are never overwritten")
+            output_path, totals = render_invoice(invoice_data, path)
             self.logger.info(f"Invoice generated successfully at {output_path}")
-            self.preview_pdf(output_path)
-            return True, output_path
+            return True, output_path, totals
         except Exception as e:
             self.logger.error(f"Invoice generation failed: {str(e)}")
-            return False, str(e)
-
-    def _draw_items_table(self, c, width, height, invoice):
-        data = [["Description", "Quantity", "Unit Price", "Total"]]
-        for item in invoice["items"]:
-            data.append([
-                item["description"],
-                str(item["quantity"]),
-                f"${item['price']:.2f}",
-                f"${item['quantity'] * item['price']:.2f}"
-            ])
-        data.append(["", "", "Subtotal:", f"${invoice['subtotal']:.2f}"])
-        data.append(["", "", "Tax (10%):", f"${invoice['tax']:.2f}"])
-        data.append(["", "", "Total:", f"${invoice['total']:.2f}"])
-
-        table = Table(data, colWidths=[300, 60, 80, 80])
-        style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-        ])
-        table.setStyle(style)
-        table.wrapOn(c, width, height)
-        table.drawOn(c, 50, height - 300)
+            return False, str(e), None
+
+    def generate_invoice(self, invoice_data, preview=True):
+        success, detail, _ = self._render(invoice_data)
+        if success and preview:
+            self.preview_pdf(detail)
+        return success, detail
+
+    def issue_invoice(self, db, invoice_data, preview=True):
+        # generate_invoice numbered and recorded through db: a blank number is
+        # taken from settings.invoice_counter, and the number is claimed in the
+        # invoices table before rendering so it can never be issued twice.
+        # Returns (success, path or error, invoice number)
+        number = invoice_data.get("number") or None
+        try:
+            number, = db.claim_invoices([(number, invoice_data["date"], invoice_data.get("customer_name"))])
+        except (ValueError, sqlite3.Error) as e:
+            self.logger.error(f"Invoice {number} not issued: {str(e)}")
+            return False, str(e), number
+        success, detail, totals = self._render({**invoice_data, "number": number})
+        db.complete_invoices([(number, detail, totals)])
+        if success and preview:
+            self.preview_pdf(detail)
+        return success, detail, number
 
     def preview_pdf(self, file_path):
         try:
@@ -131,113 +113,184 @@ class FinanceManager:
                 os.startfile(file_path)
             elif os.name == 'posix':
                 cmd = "open" if "darwin" in os.sys.platform else "xdg-open"
-                subprocess.run([cmd, file_path], check=True)
+                # Popen rather than run: the viewer must not block the UI until it exits
+                subprocess.Popen([cmd, file_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             else:
                 webbrowser.open(file_path)
         except Exception as e:
             messagebox.showerror("Error", f"Could not open PDF: {e}")
 
-finance_manager = FinanceManager()
-
-# Invoice Input Variables
-invoice_number = tk.StringVar()
-invoice_date = tk.StringVar(value=datetime.today().strftime('%Y-%m-%d'))
-customer_name = tk.StringVar()
-
-# Function to generate invoice from user inputs and stock records
-def generate_invoice_gui():
-    # If invoice number is empty, generate a random 8-character hash
-    if not invoice_number.get().strip():
-        invoice_number.set(str(uuid.uuid4())[:8])
-    
-    if not customer_name.get().strip():
-        messagebox.showerror("Error", "Customer name is required.")
-        return
-
-    address = customer_address.get("1.0", "end").strip()
-    if not address:
-        messagebox.showerror("Error", "Customer address is required.")
-        return
-
-    # Use the first stock record as the invoice item, if available.
-    if not finance_manager.stock_records:
-        messagebox.showerror("Error", "No stock records available.")
-        return
-
-    stock_item = finance_manager.stock_records[0]
-
-    invoice_data = {
-        "number": invoice_number.get().strip(),
-        "date": invoice_date.get().strip(),
-        "customer_name": customer_name.get().strip(),
-        "customer_address": address,
-        "items": [{
-            "description": stock_item["product"],
-            "quantity": stock_item["quantity"],
-            "price": stock_item["price"]
-        }],
-        "subtotal": stock_item["quantity"] * stock_item["price"],
-        "tax": (stock_item["quantity"] * stock_item["price"]) * 0.1,
-        "total": (stock_item["quantity"] * stock_item["price"]) * 1.1,
-        "logo_path": selected_logo_path if os.path.exists(selected_logo_path) else logo_path
-    }
-
-    success, msg = finance_manager.generate_invoice(invoice_data)
-    messagebox.showinfo("Invoice", "Invoice generated successfully!" if success else f"Error: {msg}")
-
-# Additional functions for stock, income, expense management using CLI input (kept as-is)
-def add_stock_entry():
-    vendor = input("Enter vendor: ")
-    product = input("Enter product: ")
-    quantity = int(input("Enter quantity: "))
-    price = float(input("Enter price: "))
-    entry_type = input("Enter type (purchase/sale): ").strip().lower()
-    if entry_type not in ["purchase", "sale"]:
-        messagebox.showerror("Error", "Invalid entry type. Use 'purchase' or 'sale'.")
-        return
-    finance_manager.add_stock(entry_type, vendor, product, quantity, price)
-    messagebox.showinfo("Success", f"{entry_type.capitalize()} entry added.")
-
-def add_income():
-    category = input("Enter income category: ")
-    amount = float(input("Enter amount: "))
-    finance_manager.add_income_expense(category, amount, "income")
-    messagebox.showinfo("Success", "Income added.")
-
-def add_expense():
-    category = input("Enter expense category: ")
-    amount = float(input("Enter amount: "))
-    finance_manager.add_income_expense(category, amount, "expense")
-    messagebox.showinfo("Success", "Expense added.")
-
-def show_profit_loss():
-    profit_loss = finance_manager.calculate_profit_loss()
-    status = "Profit" if profit_loss >= 0 else "Loss"
-    messagebox.showinfo("Net Profit/Loss", f"Net {status}: ${abs(profit_loss):.2f}")
-
-# UI Layout
-frame = ttk.Frame(root, padding=20)
-frame.pack(expand=True)
-
-# Invoice input fields
-ttk.Label(frame, text="Invoice #").pack()
-ttk.Entry(frame, textvariable=invoice_number).pack()
-
-ttk.Label(frame, text="Date").pack()
-ttk.Entry(frame, textvariable=invoice_date, state="readonly").pack()
-
-ttk.Label(frame, text="Customer Name").pack()
-ttk.Entry(frame, textvariable=customer_name).pack()
-
-ttk.Label(frame, text="Customer Address").pack()
-customer_address = tk.Text(frame, height=3, width=40)
-customer_address.pack()
-
-# Buttons for other functionalities
-ttk.Button(frame, text="Add Stock Entry", command=add_stock_entry).pack(pady=5)
-ttk.Button(frame, text="Add Income", command=add_income).pack(pady=5)
-ttk.Button(frame, text="Add Expense", command=add_expense).pack(pady=5)
-ttk.Button(frame, text="Show Net Profit/Loss", command=show_profit_loss).pack(pady=5)
-ttk.Button(frame, text="Generate Invoice", command=generate_invoice_gui).pack(pady=5)
-
-root.mainloop()
+class InvoiceTemplate:
+    # Invoice rendering for FinanceManagerApp, bound to its database
+    def __init__(self, db):
+        self.db = db
+        self.finance_manager = FinanceManager()
+
+    def generate_invoice(self, invoice_data, preview=True):
+        invoice_data = {
+            "tax_rate": self.db.config.tax_rate(),
+            **invoice_data,
+            "logo_path": resolve_logo(invoice_data.get("logo_path")),
+        }
+        success, detail, _ = self.finance_manager.issue_invoice(self.db, invoice_data, preview=preview)
+        return success, detail
+
+class InvoiceApp:
+    def __init__(self, root, config=None, db=None):
+        from tasks import TaskScheduler
+
+        self.root = root
+        # With a Database, blank invoice numbers come from its counter and every
+        # invoice is recorded; without config invoices use the default settings' tax rate
+        self.db = db
+        self.config = config or (db.config if db else None)
+        self.root.title("Finance Manager")
+        self.root.geometry("500x600")
+        self.tasks = TaskScheduler(root)
+        self.finance_manager = FinanceManager()
+        self.selected_logo_path = resolve_logo()
+
+        # Invoice Input Variables
+        self.invoice_number = tk.StringVar()
+        self.invoice_date = tk.StringVar(value=datetime.today().strftime('%Y-%m-%d'))
+        self.customer_name = tk.StringVar()
+
+        self._build_layout()
+
+        # Refresh the cached logo in the background; the window never waits on it
+        if not os.path.exists(downloaded_logo):
+            self.tasks.submit("Download logo", lambda task: download_logo(), on_success=self._logo_downloaded)
+
+    def _logo_downloaded(self, success):
+        if success:
+            self.selected_logo_path = resolve_logo()
+
+    # Function to generate invoice from user inputs and stock records
+    def generate_invoice_gui(self):
+        # A blank number is allocated when the invoice is issued
+        if not self.invoice_number.get().strip() and self.db is None:
+            messagebox.showerror("Error", "Invoice number is required without a database.")
+            return
+
+        if not self.customer_name.get().strip():
+            messagebox.showerror("Error", "Customer name is required.")
+            return
+
+        address = self.customer_address.get("1.0", "end").strip()
+        if not address:
+            messagebox.showerror("Error", "Customer address is required.")
+            return
+
+        # Use the first stock record as the invoice item, if available.
+        if not self.finance_manager.stock_records:
+            messagebox.showerror("Error", "No stock records available.")
+            return
+
+        stock_item = self.finance_manager.stock_records[0]
+        tax_rate = self.config.tax_rate() if self.config else DEFAULT_SETTINGS.tax_rate
+        subtotal = multiply_cents(to_cents(stock_item["price"]), stock_item["quantity"])
+        tax = multiply_cents(subtotal, tax_rate)
+
+        invoice_data = {
+            "number": self.invoice_number.get().strip(),
+            "date": self.invoice_date.get().strip(),
+            "customer_name": self.customer_name.get().strip(),
+            "customer_address": address,
+            "items": [{
+                "description": stock_item["product"],
+                "quantity": stock_item["quantity"],
+                "price": stock_item["price"]
+            }],
+            "tax_rate": tax_rate,
+            "subtotal": subtotal,
+            "tax": tax,
+            "total": subtotal + tax,
+            "logo_path": resolve_logo(self.selected_logo_path)
+        }
+
+        def rendered(result):
+            success, msg, number = result
+            if success:
+                self.invoice_number.set(number)
+                self.finance_manager.preview_pdf(msg)
+            messagebox.showinfo(
+                "Invoice", f"Invoice {number} generated successfully!" if success else f"Error: {msg}"
+            )
+
+        def issue(task):
+            if self.db is None:
+                return (*self.finance_manager.generate_invoice(invoice_data, preview=False), invoice_data["number"])
+            return self.finance_manager.issue_invoice(self.db, invoice_data, preview=False)
+
+        # Number, render and record off the Tk thread; the preview opens once the PDF is written
+        self.tasks.submit("Generate invoice", issue, on_success=rendered)
+
+    # Additional functions for stock, income, expense management using CLI input (kept as-is)
+    def add_stock_entry(self):
+        vendor = input("Enter vendor: ")
+        product = input("Enter product: ")
+        quantity = int(input("Enter quantity: "))
+        price = float(input("Enter price: "))
+        entry_type = input("Enter type (purchase/sale): ").strip().lower()
+        if entry_type not in ["purchase", "sale"]:
+            messagebox.showerror("Error", "Invalid entry type. Use 'purchase' or 'sale'.")
+            return
+        self.finance_manager.add_stock(entry_type, vendor, product, quantity, price)
+        messagebox.showinfo("Success", f"{entry_type.capitalize()} entry added.")
+
+    def add_income(self):
+        category = input("Enter income category: ")
+        amount = float(input("Enter amount: "))
+        self.finance_manager.add_income_expense(category, amount, "income")
+        messagebox.showinfo("Success", "Income added.")
+
+    def add_expense(self):
+        category = input("Enter expense category: ")
+        amount = float(input("Enter amount: "))
+        self.finance_manager.add_income_expense(category, amount, "expense")
+        messagebox.showinfo("Success", "Expense added.")
+
+    def show_profit_loss(self):
+        profit_loss = self.finance_manager.calculate_profit_loss()
+        status = "Profit" if profit_loss >= 0 else "Loss"
+        messagebox.showinfo("Net Profit/Loss", f"Net {status}: {format_cents(abs(profit_loss))}")
+
+    def _build_layout(self):
+        # UI Layout
+        frame = ttk.Frame(self.root, padding=20)
+        frame.pack(expand=True)
+
+        # Invoice input fields
+        ttk.Label(frame, text="Invoice #").pack()
+        ttk.Entry(frame, textvariable=self.invoice_number).pack()
+
+        ttk.Label(frame, text="Date").pack()
+        ttk.Entry(frame, textvariable=self.invoice_date, state="readonly").pack()
+
+        ttk.Label(frame, text="Customer Name").pack()
+        ttk.Entry(frame, textvariable=self.customer_name).pack()
+
+        ttk.Label(frame, text="Customer Address").pack()
+        self.customer_address = tk.Text(frame, height=3, width=40)
+        self.customer_address.pack()
+
+        # Buttons for other functionalities
+        ttk.Button(frame, text="Add Stock Entry", command=self.add_stock_entry).pack(pady=5)
+        ttk.Button(frame, text="Add Income", command=self.add_income).pack(pady=5)
+        ttk.Button(frame, text="Add Expense", command=self.add_expense).pack(pady=5)
+        ttk.Button(frame, text="Show Net Profit/Loss", command=self.show_profit_loss).pack(pady=5)
+        ttk.Button(frame, text="Generate Invoice", command=self.generate_invoice_gui).pack(pady=5)
+
+def main():
+    from database import Database
+
+    # Setup logging
+    logging.basicConfig(level=logging.INFO)
+    db = Database()
+    root = tk.Tk()
+    InvoiceApp(root, db=db if db.initialize() else None)
+    root.mainloop()
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import LongTable, PageBreak, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from config import DEFAULT_SETTINGS
+from models import INVOICE_NUMBER, INVOICE_NUMBER_ERROR
+from money import format_cents, multiply_cents, to_cents
+
+ITEM_HEADER = ["Description", "Quantity", "Unit Price", "Total"]
+COLUMN_WIDTHS = [300, 60, 80, 80]
+MARGIN = 50
+# Room left on the first page for the invoice/customer block drawn by _draw_first_page
+FIRST_PAGE_HEADER = 130
+
+# Built once per process instead of once per invoice
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+])
+
+TOTALS_TABLE_STYLE = TableStyle([
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (2, -1), (-1, -1), 'Helvetica-Bold'),
+    ('GRID', (2, 0), (-1, -1), 1, colors.grey)
+])
+
+# logo path -> ImageReader; ImageReader keeps the decoded pixels after the
+# first draw, so each process decodes a logo at most once
+_logo_cache = {}
+
+
+def load_logo(path):
+    if not path or not os.path.exists(path):
+        return None
+    reader = _logo_cache.get(path)
+    if reader is None:
+        reader = _logo_cache[path] = ImageReader(path)
+    return reader
+
+
+def invoice_filename(number):
+    # Refuses numbers that could reach outside the output directory
+    if not INVOICE_NUMBER.fullmatch(str(number)):
+        raise ValueError(f"{INVOICE_NUMBER_ERROR}: {number!r}")
+    return f"Invoice_{number}.pdf"
+
+
+class _FlowableStream(list):
+    # Story handed to doc.build that pulls flowables from a generator only when
+    # the list runs dry, so just the table for the current page is ever alive
+    def __init__(self, flowables):
+        super().__init__()
+        self._pending = iter(flowables)
+
+    def __len__(self):
+        if not super().__len__():
+            flowable = next(self._pending, None)
+            if flowable is not None:
+                self.append(flowable)
+        return super().__len__()
+
+
+def _rows_per_page(doc):
+    # Every cell is a single line, so row heights are constant; measure them once
+    def height(rows):
+        return Table(rows, colWidths=COLUMN_WIDTHS, style=ITEMS_TABLE_STYLE).wrap(doc.width, doc.height)[1]
+    header_height = height([ITEM_HEADER])
+    row_height = height([ITEM_HEADER, ["x"] * 4]) - header_height
+    # Frames pad 6pt top and bottom; keep a point of slack for rounding
+    usable = doc.height - 12 - 1 - header_height
+    first = int((usable - FIRST_PAGE_HEADER) // row_height)
+    later = int(usable // row_height)
+    return max(first, 1), max(later, 1)
+
+
+def tax_label(tax_rate):
+    # Significant digits, not whole percents: 0.075 prints as 7.5%, matching the tax charged
+    return f"{tax_rate * 100:g}%"
+
+
+def _items_story(items, tax_rate, rows_first, rows_later, totals):
+    # One LongTable per page with the header row repeated, built from the item
+    # iterator while subtotal/tax/total accumulate in integer cents in the same pass
+    yield Spacer(1, FIRST_PAGE_HEADER)
+    subtotal = 0
+    lines = 0
+    page_rows = [ITEM_HEADER]
+    capacity = rows_first
+    for item in items:
+        price = to_cents(item["price"])
+        line_total = multiply_cents(price, item["quantity"])
+        subtotal += line_total
+        lines += 1
+        page_rows.append([
+            item["description"],
+            str(item["quantity"]),
+            format_cents(price),
+            format_cents(line_total)
+        ])
+        if len(page_rows) > capacity:
+            yield LongTable(page_rows, colWidths=COLUMN_WIDTHS, repeatRows=1, style=ITEMS_TABLE_STYLE)
+            yield PageBreak()
+            page_rows = [ITEM_HEADER]
+            capacity = rows_later
+    if len(page_rows) > 1:
+        yield LongTable(page_rows, colWidths=COLUMN_WIDTHS, repeatRows=1, style=ITEMS_TABLE_STYLE)
+
+    tax = multiply_cents(subtotal, tax_rate)
+    totals.update(subtotal=subtotal, tax=tax, total=subtotal + tax, lines=lines)
+    yield Table([
+        ["", "", "Subtotal:", format_cents(subtotal)],
+        ["", "", f"Tax ({tax_label(tax_rate)}):", format_cents(tax)],
+        ["", "", "Total:", format_cents(subtotal + tax)],
+    ], colWidths=COLUMN_WIDTHS, style=TOTALS_TABLE_STYLE)
+
+
+def _draw_first_page(invoice_data):
+    def draw(c, doc):
+        width, height = doc.pagesize
+        c.saveState()
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(50, height - 50, "Invoice")
+
+        logo = load_logo(invoice_data.get("logo_path"))
+        if logo is not None:
+            c.drawImage(logo, width - 150, height - 100, width=100, height=50)
+
+        c.setFont("Helvetica", 12)
+        c.drawString(50, height - 80, f"Invoice #: {invoice_data['number']}")
+        c.drawString(50, height - 100, f"Date: {invoice_data['date']}")
+        c.drawString(50, height - 130, f"Customer Name: {invoice_data['customer_name']}")
+        c.drawString(50, height - 150, f"Address: {invoice_data['customer_address']}")
+        c.restoreState()
+    return draw
+
+
+def _draw_later_page(invoice_data):
+    def draw(c, doc):
+        width, height = doc.pagesize
+        c.saveState()
+        c.setFont("Helvetica", 9)
+        c.drawString(50, height - 30, f"Invoice #: {invoice_data['number']} (continued)")
+        c.drawRightString(width - 50, 30, f"Page {doc.page}")
+        c.restoreState()
+    return draw
+
+
+def render_invoice(invoice_data, output_path):
+    # Items may be any iterable (e.g. a generator over stock rows); returns
+    # (output path, {'subtotal', 'tax', 'total', 'lines'}) computed while drawing,
+    # money in integer cents
+    doc = SimpleDocTemplate(
+        str(output_path), pagesize=letter,
+        leftMargin=MARGIN, rightMargin=MARGIN, topMargin=MARGIN, bottomMargin=MARGIN,
+        title=f"Invoice {invoice_data['number']}"
+    )
+    rows_first, rows_later = _rows_per_page(doc)
+    totals = {}
+    story = _items_story(
+        invoice_data["items"], invoice_data.get("tax_rate", DEFAULT_SETTINGS.tax_rate), rows_first, rows_later, totals
+    )
+    doc.build(
+        _FlowableStream(story),
+        onFirstPage=_draw_first_page(invoice_data),
+        onLaterPages=_draw_later_page(invoice_data)
+    )
+    return str(output_path), totals
+
+
+def init_worker(logo_path):
+    load_logo(logo_path)
+
+
+def render_one(job):
+    # (invoice_data, output_dir) -> (number, success, path or error, totals or None);
+    # runs in a worker process, never overwrites an existing PDF
+    invoice_data, output_dir = job
+    number = invoice_data.get('number') or '?'
+    try:
+        if number == '?':
+            raise ValueError("invoice has no number")
+        path = Path(output_dir) / invoice_filename(number)
+        if path.exists():
+            raise FileExistsError(f"{path} already exists; invoices are never overwritten")
+        path, totals = render_invoice(invoice_data, path)
+        return number, True, path, totals
+    except Exception as e:
+        return number, False, f"{type(e).__name__}: {e}", None
+
+
+def generate_invoices(specs, output_dir, workers=None, logo_path=None, chunksize=8, tax_rate=None, db=None):
+    # Renders every spec across a process pool without previewing anything.
+    # tax_rate (default: Database.config.tax_rate()) applies to specs without one.
+    # With a Database, specs without a number get the next ones from
+    # settings.invoice_counter and every invoice is recorded in the invoices
+    # table, claimed before rendering and issued (or voided) afterwards.
+    # Returns ([(number, success, path or error), ...] in input order, invoices/sec)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if tax_rate is None and db is not None:
+        tax_rate = db.config.tax_rate()
+    defaults = {} if tax_rate is None else {'tax_rate': tax_rate}
+    specs = list(specs)
+    if db is not None:
+        specs = [{**spec, 'date': spec.get('date') or date.today().isoformat()} for spec in specs]
+        numbers = db.claim_invoices([
+            (spec.get('number') or None, spec['date'], spec.get('customer_name')) for spec in specs
+        ])
+        specs = [{**spec, 'number': number} for spec, number in zip(specs, numbers)]
+    jobs = [({**defaults, **spec, 'logo_path': spec.get('logo_path', logo_path)}, str(output_dir)) for spec in specs]
+
+    started = time.perf_counter()
+    rendered = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(logo_path,)) as pool:
+            for result in pool.map(render_one, jobs, chunksize=chunksize):
+                rendered.append(result)
+    finally:
+        if db is not None:
+            # Claims the pool never got to (BrokenProcessPool, KeyboardInterrupt) are voided, not left pending
+            unfinished = [(spec['number'], None, None) for spec in specs[len(rendered):]]
+            db.complete_invoices([(number, detail, totals) for number, _, detail, totals in rendered] + unfinished)
+    elapsed = time.perf_counter() - started
+    results = [(number, success, detail) for number, success, detail, _ in rendered]
+
+    failed = [result for result in results if not result[1]]
+    for number, _, error in failed:
+        logging.error(f"Invoice {number} failed: {error}")
+    rate = len(results) / elapsed if elapsed else 0.0
+    logging.info(f"Batch rendered {len(results) - len(failed)}/{len(results)} invoices at {rate:.1f}/sec")
+    return results, rate
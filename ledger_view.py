@@ -0,0 +1,231 @@
+import logging
+import tkinter as tk
+from concurrent.futures import CancelledError
+from tkinter import ttk
+
+from money import format_cents
+from paging import FILTER_COLUMNS, LedgerPager, SORT_KEYS
+
+# (column, heading, width, money) shown by LedgerView
+LEDGER_COLUMNS = {
+    'stock': (
+        ('id', "ID", 70, False),
+        ('date', "Date", 90, False),
+        ('transaction_type', "Type", 80, False),
+        ('vendor_name', "Vendor", 180, False),
+        ('item_name', "Item", 180, False),
+        ('quantity', "Quantity", 80, False),
+        ('unit_price_cents', "Unit Price", 100, True),
+        ('total_price_cents', "Total", 110, True),
+    ),
+    'financial_records': (
+        ('id', "ID", 70, False),
+        ('date', "Date", 90, False),
+        ('category', "Category", 150, False),
+        ('description', "Description", 360, False),
+        ('amount_cents', "Amount", 110, True),
+        ('verified', "Verified", 70, False),
+    ),
+}
+
+
+# A Treeview that only ever holds the rows on screen: one item per visible line,
+# whose values are rewritten as the view scrolls over a LedgerPager. The
+# scrollbar is driven from the pager's row count rather than the Treeview, so
+# a million-row table costs the same few dozen widgets as a ten-row one.
+# Missing pages show placeholders and are polled with after() until loaded
+class LedgerView(ttk.Frame):
+    def __init__(self, parent, db, table, fixed=None, poll_ms=25, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.table = table
+        self.fixed = dict(fixed or {})
+        self.poll_ms = poll_ms
+        self.pager = LedgerPager(db, table, [column for column, *_ in LEDGER_COLUMNS[table]])
+        self.pager.configure(filters=self.fixed)
+        self.columns = LEDGER_COLUMNS[table]
+        self.top = 0
+        self.visible = 0
+        self._items = []
+        self._waiting = []
+        self._poll_id = None
+        self._filters = {}
+        self._range = (None, None)
+        self._build()
+
+    def _build(self):
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill=tk.X, pady=(0, 5))
+        headings = {column: heading for column, heading, *_ in self.columns}
+        self._filter_columns = {
+            headings.get(column, column): column for column in FILTER_COLUMNS[self.table] if column not in self.fixed
+        }
+        self.filter_column = tk.StringVar(value=next(iter(self._filter_columns)))
+        self.filter_value = tk.StringVar()
+        self.start_date = tk.StringVar()
+        self.end_date = tk.StringVar()
+        ttk.Combobox(
+            toolbar, textvariable=self.filter_column, values=list(self._filter_columns), state="readonly", width=12
+        ).pack(side=tk.LEFT)
+        value = ttk.Entry(toolbar, textvariable=self.filter_value, width=24)
+        value.pack(side=tk.LEFT, padx=5)
+        value.bind("<Return>", lambda event: self.apply_filters())
+        ttk.Label(toolbar, text="From").pack(side=tk.LEFT)
+        ttk.Entry(toolbar, textvariable=self.start_date, width=11).pack(side=tk.LEFT, padx=5)
+        ttk.Label(toolbar, text="To").pack(side=tk.LEFT)
+        ttk.Entry(toolbar, textvariable=self.end_date, width=11).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="Filter", command=self.apply_filters).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="Clear", command=self.clear_filters).pack(side=tk.LEFT, padx=5)
+        self.status = tk.StringVar()
+        ttk.Label(toolbar, textvariable=self.status).pack(side=tk.RIGHT)
+
+        self.tree = ttk.Treeview(self, show="headings", columns=[column for column, *_ in self.columns],
+                                 selectmode="browse")
+        for column, heading, width, money in self.columns:
+            self.tree.heading(column, text=heading)
+            if column in SORT_KEYS[self.table]:
+                self.tree.heading(column, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, anchor=tk.E if money else tk.W, stretch=column == 'description')
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.tree.bind("<Configure>", self._resized)
+        self.tree.bind("<MouseWheel>", lambda event: self._wheel(-1 if event.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda event: self._wheel(-1))
+        self.tree.bind("<Button-5>", lambda event: self._wheel(1))
+        self.tree.bind("<Up>", lambda event: self._step(-1))
+        self.tree.bind("<Down>", lambda event: self._step(1))
+        self.tree.bind("<Prior>", lambda event: self._scroll(-max(1, self.visible - 1)))
+        self.tree.bind("<Next>", lambda event: self._scroll(max(1, self.visible - 1)))
+        self.tree.bind("<Home>", lambda event: self.scroll_to(0))
+        self.tree.bind("<End>", lambda event: self.scroll_to(self._last_top()))
+        self._show_sort()
+
+    def refresh(self):
+        # Re-reads the table, keeping sort, filters and (as far as possible) position
+        self.pager.refresh()
+        self._render()
+
+    def close(self):
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.pager.close()
+
+    def apply_filters(self):
+        column = self._filter_columns[self.filter_column.get()]
+        value = self.filter_value.get().strip()
+        self._filters = {column: value} if value else {}
+        self._range = (self.start_date.get().strip() or None, self.end_date.get().strip() or None)
+        self._reconfigure(self.pager.sort, self.pager.descending)
+
+    def clear_filters(self):
+        self.filter_value.set("")
+        self.start_date.set("")
+        self.end_date.set("")
+        self.apply_filters()
+
+    def sort_by(self, column):
+        descending = not self.pager.descending if column == self.pager.sort else False
+        self._reconfigure(column, descending)
+
+    def _reconfigure(self, sort, descending):
+        self.pager.configure(sort, descending, {**self._filters, **self.fixed}, *self._range)
+        self.top = 0
+        self._show_sort()
+        self._render()
+
+    def _show_sort(self):
+        for column, heading, *_ in self.columns:
+            arrow = (" ▼" if self.pager.descending else " ▲") if column == self.pager.sort else ""
+            self.tree.heading(column, text=heading + arrow)
+
+    def _row_height(self):
+        try:
+            return int(ttk.Style(self).lookup("Treeview", "rowheight") or 20)
+        except (tk.TclError, ValueError):
+            return 20
+
+    def _resized(self, event):
+        # Headings take about one row; keep exactly as many items as fit below them
+        visible = max(1, event.height // self._row_height() - 1)
+        if visible == self.visible:
+            return
+        while len(self._items) < visible:
+            self._items.append(self.tree.insert("", tk.END, values=()))
+        while len(self._items) > visible:
+            self.tree.delete(self._items.pop())
+        self.visible = visible
+        self._render()
+
+    def _last_top(self):
+        total = self.pager.total()
+        return max(0, total - self.visible) if total is not None else self.top
+
+    def scroll_to(self, top):
+        top = max(0, min(int(top), self._last_top()))
+        if top != self.top:
+            self.top = top
+            self._render()
+        return "break"
+
+    def _scroll(self, rows):
+        return self.scroll_to(self.top + rows)
+
+    def _wheel(self, direction):
+        return self._scroll(direction * 3)
+
+    def _step(self, delta):
+        # Arrow keys move the cursor inside the window and scroll at its edges
+        focus = self.tree.focus()
+        position = self._items.index(focus) if focus in self._items else 0
+        if 0 <= position + delta < len(self._items):
+            return None
+        return self._scroll(delta)
+
+    def _yview(self, *args):
+        total = self.pager.total()
+        if args[0] == 'moveto' and total:
+            self.scroll_to(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            self._scroll(amount * max(1, self.visible - 1) if args[2] == 'pages' else amount)
+
+    def _format(self, row):
+        return [
+            format_cents(value) if money and value is not None else value
+            for value, (_, _, _, money) in zip(row, self.columns)
+        ]
+
+    def _render(self):
+        if not self.visible:
+            return
+        total = self.pager.total()
+        rows, self._waiting = self.pager.window(self.top, self.visible)
+        if total is None:
+            self._waiting.append(self.pager.count_future())
+        for position, iid in enumerate(self._items):
+            row = rows[position] if position < len(rows) else ()
+            self.tree.item(iid, values=("…",) if row is None else self._format(row))
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible) / total))
+            self.status.set(f"{self.top + 1:,}-{min(total, self.top + self.visible):,} of {total:,}")
+        else:
+            self.scrollbar.set(0.0, 1.0)
+            self.status.set("No rows" if total == 0 else "Counting...")
+        if self._waiting and self._poll_id is None:
+            self._poll_id = self.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        if any(not future.done() for future in self._waiting):
+            self._poll_id = self.after(self.poll_ms, self._poll)
+            return
+        for future in self._waiting:
+            if future.cancelled() or isinstance(future.exception(), CancelledError):
+                continue
+            if future.exception() is not None:
+                logging.error(f"Loading {self.table} rows failed: {str(future.exception())}")
+                self.status.set("Loading failed, see finance_manager.log")
+                self._waiting = []
+                return
+        self._render()
@@ -1,11 +1,28 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from datetime import datetime
-import csv
+from decimal import Decimal
 import logging
+import os
 from database import Database
 from models import Settings
+from money import format_cents
 from invoice_template import InvoiceTemplate
+from totals import ProfitLossEngine
+from reports import LedgerAnalytics, REPORTS, run_report
+from export import export_table, count_rows
+from ledger_view import LedgerView
+from tasks import TaskScheduler
+from verifier import verify_data
+
+# Set to 1 to time every query (Tools > Export Query Stats, slow ones logged with their plan)
+QUERY_STATS_ENV = "FINANCE_MANAGER_QUERY_STATS"
+
+# Notebook tab -> (table, type filter) exported by File > Export Data
+EXPORT_TABS = {
+    "Stock": ("stock", None),
+    "Income": ("financial_records", "income"),
+    "Expense": ("financial_records", "expense"),
+}
 
 class FinanceManagerApp:
     def __init__(self, root):
@@ -13,14 +30,22 @@ class FinanceManagerApp:
         self.root.title("Finance Manager Pro")
         self.root.geometry("1200x800")
         
-        # Initialize database
-        self.db = Database()
+        # Initialize database; read connections let background tasks run
+        # alongside data entry, and the ledger tabs page without waiting on them
+        self.db = Database(readers=3)
+        if os.environ.get(QUERY_STATS_ENV) == "1":
+            self.db.enable_instrumentation()
+        self.tasks = TaskScheduler(self.root)
+        self.ledger_views = {}
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         try:
             if not self.db.initialize():
                 messagebox.showerror("Error", "Failed to initialize database")
                 self.root.destroy()
                 return
             
+            self.totals = ProfitLossEngine().load(self.db)
+            
             # Load settings
             self.settings = self._load_settings()
             if not self.settings:
@@ -30,14 +55,16 @@ class FinanceManagerApp:
             self._setup_ui()
             self._load_initial_data()
             
-            # Backup on startup
-            self.db.backup_database()
+            # Backup on startup, in the background so the window comes up immediately
+            self._run_task("Startup backup", self._backup_task, on_success=self._startup_backup_done)
             
         except Exception as e:
             messagebox.showerror("Error", f"Application failed to start: {str(e)}")
             self.root.destroy()
     
     def _setup_ui(self):
+        self._create_status_bar()
+        
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True)
         
@@ -50,39 +77,137 @@ class FinanceManagerApp:
         
         self._create_menu()
     
+    def _create_status_bar(self):
+        bar = ttk.Frame(self.root, padding=(10, 2))
+        bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_text = tk.StringVar(value="Ready")
+        ttk.Label(bar, textvariable=self.status_text).pack(side=tk.LEFT)
+        self.cancel_button = ttk.Button(bar, text="Cancel", command=self.tasks.cancel_all, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.RIGHT)
+        self.progress = ttk.Progressbar(bar, length=200, mode="determinate", maximum=1.0)
+        self.progress.pack(side=tk.RIGHT, padx=5)
+    
+    def _run_task(self, name, fn, *args, on_success=None):
+        # Runs fn(task, *args) off the Tk thread, mirroring its progress in the
+        # status bar; failures and cancellations are reported here
+        def finished(message):
+            if not self.tasks.active:
+                self.progress.stop()
+                self.progress.configure(mode="determinate", value=0)
+                self.cancel_button.configure(state=tk.DISABLED)
+            self.status_text.set(message)
+        
+        def progress(task, fraction, message):
+            if fraction is None:
+                if str(self.progress["mode"]) != "indeterminate":
+                    self.progress.configure(mode="indeterminate")
+                    self.progress.start(15)
+            else:
+                self.progress.stop()
+                self.progress.configure(mode="determinate", value=fraction)
+            self.status_text.set(f"{task.name}: {message}" if message else f"{task.name}...")
+        
+        def succeeded(result):
+            finished(f"{name} finished")
+            if on_success:
+                on_success(result)
+        
+        def failed(error):
+            finished(f"{name} failed")
+            messagebox.showerror("Error", f"{name} failed: {str(error)}")
+        
+        self.status_text.set(f"{name}...")
+        self.cancel_button.configure(state=tk.NORMAL)
+        return self.tasks.submit(
+            name, fn, *args,
+            on_success=succeeded, on_error=failed, on_progress=progress,
+            on_cancel=lambda: finished(f"{name} cancelled")
+        )
+    
     def _load_settings(self):
         try:
-            cursor = self.db.execute_query("SELECT * FROM settings WHERE id=1")
-            settings_data = cursor.fetchone()
-            if settings_data:
-                return Settings(
-                    company_name=settings_data[1],
-                    logo_path=settings_data[2],
-                    address=settings_data[3],
-                    tax_rate=settings_data[4]
-                )
-            return Settings("My Business", "assets/logo.png", "", 0.0)
+            return self.db.config.settings()
         except Exception as e:
             logging.error(f"Error loading settings: {str(e)}")
             return None
     
     def _load_initial_data(self):
-        pass
+        # Each tab counts its rows and loads its first page in the background
+        for view in self.ledger_views.values():
+            view.refresh()
+    
+    def _create_ledger_tab(self, title):
+        frame = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(frame, text=title)
+        table, record_type = EXPORT_TABS[title]
+        view = LedgerView(frame, self.db, table, fixed={"type": record_type} if record_type else None)
+        view.pack(fill=tk.BOTH, expand=True)
+        self.ledger_views[title] = view
     
     def _create_stock_tab(self):
-        pass
+        self._create_ledger_tab("Stock")
     
     def _create_income_tab(self):
-        pass
+        self._create_ledger_tab("Income")
     
     def _create_expense_tab(self):
-        pass
+        self._create_ledger_tab("Expense")
     
     def _create_invoice_tab(self):
         self.invoice_template = InvoiceTemplate(self.db)
     
     def _create_reports_tab(self):
-        pass
+        frame = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(frame, text="Reports")
+        self.analytics = None
+        
+        controls = ttk.Frame(frame)
+        controls.pack(fill=tk.X, pady=(0, 10))
+        self.report_name = tk.StringVar(value=next(iter(REPORTS)))
+        ttk.Combobox(
+            controls, textvariable=self.report_name, values=list(REPORTS), state="readonly", width=30
+        ).pack(side=tk.LEFT)
+        ttk.Button(controls, text="Run Report", command=self._run_report).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Reload Data", command=self._reload_analytics).pack(side=tk.LEFT)
+        
+        self.report_tree = ttk.Treeview(frame, show="headings")
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.report_tree.yview)
+        self.report_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.report_tree.pack(fill=tk.BOTH, expand=True)
+    
+    def _reload_analytics(self):
+        self.analytics = None
+        self._run_report()
+    
+    def _run_report(self):
+        if self.analytics is None:
+            def load(task):
+                task.report(None, "loading ledger")
+                return LedgerAnalytics(self.db)
+            
+            def loaded(analytics):
+                self.analytics = analytics
+                self._run_report()
+            
+            self._run_task("Loading report data", load, on_success=loaded)
+            return
+        
+        try:
+            columns, rows = run_report(self.analytics, self.report_name.get())
+        except Exception as e:
+            messagebox.showerror("Error", f"Report failed: {str(e)}")
+            return
+        
+        self.report_tree.delete(*self.report_tree.get_children())
+        self.report_tree["columns"] = columns
+        for column in columns:
+            self.report_tree.heading(column, text=column)
+            self.report_tree.column(column, anchor=tk.W if column == columns[0] else tk.E)
+        for row in rows:
+            self.report_tree.insert("", tk.END, values=[
+                f"{value:,.2f}" if isinstance(value, (float, Decimal)) else value for value in row
+            ])
     
     def _create_settings_tab(self):
         pass
@@ -100,18 +225,53 @@ class FinanceManagerApp:
         tools_menu = tk.Menu(menubar, tearoff=0)
         tools_menu.add_command(label="Verify Data", command=self._verify_data)
         tools_menu.add_command(label="Recalculate Totals", command=self._recalculate_totals)
+        tools_menu.add_command(label="Export Query Stats", command=self._export_query_stats)
         menubar.add_cascade(label="Tools", menu=tools_menu)
         
         self.root.config(menu=menubar)
     
+    def _backup_task(self, task):
+        def progress(remaining, total):
+            task.report(1 - remaining / total if total else None, f"{total - remaining}/{total} pages")
+        return self.db.backup_database(progress=progress)
+    
+    def _startup_backup_done(self, success):
+        if not success:
+            self.status_text.set("Startup backup failed, see finance_manager.log")
+    
     def _backup_database(self):
-        if self.db.backup_database():
-            messagebox.showinfo("Success", "Database backup created successfully")
-        else:
-            messagebox.showerror("Error", "Failed to create database backup")
+        def done(success):
+            if success:
+                messagebox.showinfo("Success", "Database backup created successfully")
+            else:
+                messagebox.showerror("Error", "Failed to create database backup")
+        self._run_task("Backup", self._backup_task, on_success=done)
+    
+    def _export_query_stats(self):
+        if self.db.stats is None:
+            messagebox.showinfo("Query Stats", f"Query statistics are off; start the app with {QUERY_STATS_ENV}=1")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[('JSON', '*.json'), ('Prometheus Text', '*.prom'), ('All Files', '*.*')],
+            title="Export Query Stats"
+        )
+        if not file_path:
+            return
+        try:
+            self.db.stats.write(file_path)
+            messagebox.showinfo("Success", f"Query statistics written to {file_path}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not write query statistics: {str(e)}")
     
     def _export_data(self):
-        file_types = [('CSV Files', '*.csv'), ('All Files', '*.*')]
+        file_types = [
+            ('CSV Files', '*.csv'),
+            ('JSON Lines', '*.jsonl'),
+            ('Compressed CSV', '*.csv.gz'),
+            ('Compressed JSON Lines', '*.jsonl.gz'),
+            ('All Files', '*.*')
+        ]
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
             filetypes=file_types,
@@ -121,17 +281,88 @@ class FinanceManagerApp:
         if not file_path:
             return
         
-        try:
-            current_tab = self.notebook.tab(self.notebook.select(), "text")
-            self.invoice_template.export_data(current_tab, file_path)
-        except Exception as e:
-            messagebox.showerror("Error", f"Export failed: {str(e)}")
+        current_tab = self.notebook.tab(self.notebook.select(), "text")
+        table, record_type = EXPORT_TABS.get(current_tab, ("financial_records", None))
+        
+        def export(task):
+            total = count_rows(self.db, table, record_type=record_type)
+            return export_table(
+                self.db, table, file_path, record_type=record_type,
+                progress=lambda rows: task.report(rows / total if total else None, f"{rows}/{total} rows")
+            )
+        
+        self._run_task(
+            "Export", export,
+            on_success=lambda rows: messagebox.showinfo("Success", f"Exported {rows} rows to {file_path}")
+        )
     
     def _verify_data(self):
-        pass
+        incremental = messagebox.askyesnocancel(
+            "Verify Data", "Check only rows added or changed since the last verification?\n\n"
+                           "Choose No to re-check every row."
+        )
+        if incremental is None:
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".jsonl",
+            filetypes=[('JSON Lines', '*.jsonl'), ('All Files', '*.*')],
+            initialfile=f"{self.db.db_path.stem}_verify.jsonl",
+            title="Save Verification Report"
+        )
+        if not file_path:
+            return
+        
+        def verify(task):
+            def progress(done, total, message):
+                task.check()
+                task.report(done / total, message)
+            return verify_data(self.db, file_path, progress=progress, full=not incremental)
+        
+        self._run_task("Verify data", verify, on_success=self._data_verified)
+    
+    def _data_verified(self, summary):
+        for view in self.ledger_views.values():
+            view.refresh()
+        checked = summary['checked']
+        findings = "\n".join(f"{check}: {count}" for check, count in summary['findings'].items())
+        text = (
+            f"Checked {checked['stock']} stock rows, {checked['financial_records']} financial records "
+            f"and {checked['items']} items in {summary['seconds']:.1f}s.\n\n{findings}\n\n"
+            f"Report: {summary['report']}"
+        )
+        if any(summary['findings'].values()):
+            messagebox.showwarning("Verification Found Problems", text)
+        else:
+            messagebox.showinfo("Verification", text)
     
     def _recalculate_totals(self):
-        pass
+        def rebuild(task):
+            task.report(None, "rebuilding daily totals")
+            engine = ProfitLossEngine()
+            return engine, engine.rebuild(self.db)
+        self._run_task("Recalculate totals", rebuild, on_success=self._totals_rebuilt)
+    
+    def _totals_rebuilt(self, result):
+        self.totals, drift = result
+        net = self.totals.net()
+        if drift:
+            details = "\n".join(
+                f"{day} {record_type}/{category}: {format_cents(stored)} -> {format_cents(actual)}"
+                for day, record_type, category, stored, actual in drift[:10]
+            )
+            more = f"\n... and {len(drift) - 10} more" if len(drift) > 10 else ""
+            messagebox.showwarning(
+                "Totals Repaired",
+                f"Repaired {len(drift)} drifted daily totals:\n{details}{more}\n\nNet: {format_cents(net)}"
+            )
+        else:
+            messagebox.showinfo("Totals", f"Totals are consistent.\nNet: {format_cents(net)}")
+    
+    def _on_close(self):
+        for view in self.ledger_views.values():
+            view.close()
+        self.tasks.shutdown()
+        self.root.destroy()
     
     def __del__(self):
         if hasattr(self, 'db'):
@@ -3,6 +3,15 @@ from datetime import date
 from typing import List, Dict
 import re
 
+from money import check_range, multiply_cents, to_cents
+
+# Module-level so validate() does not rebuild them on every call
+TRANSACTION_TYPES = frozenset(('Purchase', 'Sale'))
+RECORD_TYPES = frozenset(('income', 'expense'))
+# Invoice numbers become part of the PDF file name, so no separators or dots
+INVOICE_NUMBER = re.compile(r'[\w-]+')
+INVOICE_NUMBER_ERROR = "Invoice numbers may only contain letters, digits, '_' and '-'"
+
 @dataclass
 class StockTransaction:
     date: date
@@ -14,7 +23,7 @@ class StockTransaction:
     
     def validate(self):
         errors = []
-        if self.transaction_type not in ['Purchase', 'Sale']:
+        if self.transaction_type not in TRANSACTION_TYPES:
             errors.append("Transaction type must be 'Purchase' or 'Sale'")
         if not self.vendor_name.strip():
             errors.append("Vendor name cannot be empty")
@@ -22,10 +31,26 @@ class StockTransaction:
             errors.append("Item name cannot be empty")
         if self.quantity <= 0:
             errors.append("Quantity must be positive")
-        if self.unit_price < 0:
+        try:
+            unit_cents = self.unit_price_cents
+            total_cents = multiply_cents(unit_cents, self.quantity)
+        except (TypeError, ValueError):
+            errors.append("Quantity and unit price must be numbers")
+            return errors
+        if unit_cents < 0:
             errors.append("Unit price cannot be negative")
+        errors.extend(check_range(unit_cents, "Unit price"))
+        errors.extend(check_range(total_cents, "Total price"))
         return errors
 
+    @property
+    def unit_price_cents(self):
+        return to_cents(self.unit_price)
+
+    @property
+    def total_price_cents(self):
+        return multiply_cents(self.unit_price_cents, self.quantity)
+
 @dataclass
 class FinancialRecord:
     record_type: str  # 'income' or 'expense'
@@ -36,19 +61,55 @@ class FinancialRecord:
     
     def validate(self):
         errors = []
-        if self.record_type not in ['income', 'expense']:
+        if self.record_type not in RECORD_TYPES:
             errors.append("Record type must be 'income' or 'expense'")
         if not self.category.strip():
             errors.append("Category cannot be empty")
-        if self.amount <= 0:
+        try:
+            amount_cents = self.amount_cents
+        except (TypeError, ValueError):
+            errors.append("Amount must be a number")
+            return errors
+        if amount_cents <= 0:
             errors.append("Amount must be positive")
+        errors.extend(check_range(amount_cents, "Amount"))
+        return errors
+
+    @property
+    def amount_cents(self):
+        return to_cents(self.amount)
+
+@dataclass(frozen=True, slots=True)
+class InvoiceItem:
+    description: str
+    quantity: float
+    price: float
+
+    @classmethod
+    def from_dict(cls, item):
+        return cls(item.get('description', ''), item.get('quantity', 0), item.get('price', 0))
+
+    def as_dict(self):
+        return {'description': self.description, 'quantity': self.quantity, 'price': self.price}
+
+    def validate(self):
+        errors = []
+        if not self.description.strip():
+            errors.append("Item description cannot be empty")
+        if self.quantity <= 0:
+            errors.append("Item quantity must be positive")
+        try:
+            if to_cents(self.price) <= 0:
+                errors.append("Item price must be positive")
+        except (TypeError, ValueError):
+            errors.append("Item price must be a number")
         return errors
 
 @dataclass
 class Invoice:
     customer_name: str
     customer_address: str
-    items: List[Dict]  # List of {'description': str, 'quantity': int, 'price': float}
+    items: List[Dict]  # {'description': str, 'quantity': int, 'price': float} dicts or InvoiceItems
     tax_rate: float
     
     def validate(self):
@@ -58,12 +119,9 @@ class Invoice:
         if not self.items:
             errors.append("Invoice must have at least one item")
         for item in self.items:
-            if not item.get('description', '').strip():
-                errors.append("Item description cannot be empty")
-            if item.get('quantity', 0) <= 0:
-                errors.append("Item quantity must be positive")
-            if item.get('price', 0) <= 0:
-                errors.append("Item price must be positive")
+            if not isinstance(item, InvoiceItem):
+                item = InvoiceItem.from_dict(item)
+            errors.extend(item.validate())
         if self.tax_rate < 0:
             errors.append("Tax rate cannot be negative")
         return errors
@@ -81,4 +139,39 @@ class Settings:
             errors.append("Company name cannot be empty")
         if self.tax_rate < 0:
             errors.append("Tax rate cannot be negative")
-        return errors
\ No newline at end of file
+        return errors
+
+# Immutable variants with slots for holding many records at once (no
+# per-instance __dict__); same fields, cents properties and validation rules
+@dataclass(frozen=True, slots=True)
+class FrozenStockTransaction:
+    date: date
+    transaction_type: str
+    vendor_name: str
+    item_name: str
+    quantity: float
+    unit_price: float
+
+    validate = StockTransaction.validate
+    unit_price_cents = StockTransaction.unit_price_cents
+    total_price_cents = StockTransaction.total_price_cents
+
+@dataclass(frozen=True, slots=True)
+class FrozenFinancialRecord:
+    record_type: str
+    date: date
+    category: str
+    description: str
+    amount: float
+
+    validate = FinancialRecord.validate
+    amount_cents = FinancialRecord.amount_cents
+
+@dataclass(frozen=True, slots=True)
+class FrozenInvoice:
+    customer_name: str
+    customer_address: str
+    items: tuple  # InvoiceItems
+    tax_rate: float
+
+    validate = Invoice.validate
@@ -0,0 +1,68 @@
+import math
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Money is stored and summed as integer cents; floats and Decimals only appear
+# at the edges (user input, CSV files, display). Rounding is half-up on the
+# decimal text of a value, so 1.005 becomes 101 cents, not float-rounded 100.
+CENTS = 100
+# Keeps every stored amount, and any realistic sum of them, inside int64
+MAX_CENTS = 10 ** 15
+_ONE = Decimal(1)
+
+
+def to_cents(value):
+    if isinstance(value, bool):
+        raise TypeError("Money amount cannot be a bool")
+    if isinstance(value, int):
+        return value * CENTS
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"Money amount must be finite, got {value!r}")
+        # Fast path: a value already in whole cents lands within float error of
+        # an integer, far from any half-cent tie
+        scaled = value * CENTS
+        nearest = round(scaled)
+        if abs(scaled - nearest) < 1e-6 and abs(value) < 1e12:
+            return int(nearest)
+        # repr gives the shortest text that round-trips, i.e. what the user typed
+        value = repr(value)
+    try:
+        cents = (Decimal(str(value).strip()) * CENTS).quantize(_ONE, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Not a money amount: {value!r}") from None
+    if not cents.is_finite():
+        raise ValueError(f"Money amount must be finite, got {value!r}")
+    return int(cents)
+
+
+def from_cents(cents):
+    return Decimal(cents) / CENTS
+
+
+def to_float(cents):
+    # For charts and NumPy reports only; never feed the result back into storage
+    return cents / CENTS
+
+
+def format_cents(cents, symbol='$'):
+    sign = '-' if cents < 0 else ''
+    units, rest = divmod(abs(int(cents)), CENTS)
+    return f"{sign}{symbol}{units}.{rest:02d}"
+
+
+def multiply_cents(cents, factor):
+    # cents * factor (a quantity or a rate) rounded half-up to whole cents
+    if isinstance(factor, int) or (isinstance(factor, float) and factor.is_integer()):
+        return cents * int(factor)
+    try:
+        product = Decimal(cents) * Decimal(repr(factor) if isinstance(factor, float) else str(factor))
+        return int(product.quantize(_ONE, rounding=ROUND_HALF_UP))
+    except (InvalidOperation, OverflowError):
+        raise ValueError(f"Cannot multiply money by {factor!r}") from None
+
+
+def check_range(cents, label):
+    # Error strings in the style of the models' validate() methods
+    if not -MAX_CENTS < cents < MAX_CENTS:
+        return [f"{label} is too large"]
+    return []
@@ -0,0 +1,278 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+PAGE_SIZE = 200
+CACHE_PAGES = 64
+
+# Sortable columns per table and the keyset they page by. Every key ends in id
+# so it is unique, and each is a prefix of an existing index
+# (sqlite_autoindex_stock_1, idx_stock_item_date, idx_stock_vendor_date,
+# idx_financial_records_type_date/_category_date), so a page is an index range
+# scan with at most a small sort among rows sharing a date
+SORT_KEYS = {
+    'stock': {
+        'id': ('id',),
+        'date': ('date', 'id'),
+        'item_name': ('item_name', 'date', 'id'),
+        'vendor_name': ('vendor_name', 'date', 'id'),
+    },
+    'financial_records': {
+        'id': ('id',),
+        'date': ('date', 'id'),
+        'category': ('category', 'date', 'id'),
+    },
+}
+# Equality filters, all leading or second columns of those indexes
+FILTER_COLUMNS = {
+    'stock': ('transaction_type', 'vendor_name', 'item_name'),
+    'financial_records': ('type', 'category'),
+}
+
+def sort_key(table, sort):
+    key = SORT_KEYS[table].get(sort)
+    if key is None:
+        raise ValueError(f"Cannot sort {table} by {sort!r}; choose from {sorted(SORT_KEYS[table])}")
+    return key
+
+
+def keyset_filters(table, filters=None, start=None, end=None):
+    # WHERE clauses and parameters for equality filters and a date range
+    clauses, params = [], []
+    for column, value in sorted((filters or {}).items()):
+        if column not in FILTER_COLUMNS[table]:
+            raise ValueError(f"Cannot filter {table} by {column!r}")
+        if value not in (None, ''):
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if start:
+        clauses.append("date >= ?")
+        params.append(str(start))
+    if end:
+        clauses.append("date <= ?")
+        params.append(str(end))
+    return clauses, params
+
+
+def keyset_query(table, columns, key, clauses, params, after=None, descending=False, limit=1, offset=0):
+    # SELECT columns in key order, starting after the key values `after` (exclusive)
+    clauses, params = list(clauses), list(params)
+    if after is not None:
+        clauses.append(f"({', '.join(key)}) {'<' if descending else '>'} ({', '.join('?' * len(key))})")
+        params.extend(after)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    order = ', '.join(f"{column} DESC" if descending else column for column in key)
+    sql = f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY {order} LIMIT {int(limit)}"
+    if offset:
+        sql += f" OFFSET {int(offset)}"
+    return sql, params
+
+
+class _Keyset:
+    # One sort/filter configuration. bounds[i] is the key of the last row
+    # before page i (row i * page_size - 1); pages are read forward from it.
+    # Replaced wholesale by LedgerPager.configure, so late results from an
+    # older configuration land in a discarded object
+    def __init__(self, key, descending, clauses, params):
+        self.key = key
+        self.descending = descending
+        self.clauses = clauses
+        self.params = params
+        self.bounds = {}
+        self.pages = OrderedDict()
+        self.pending = {}
+        self.total = None
+        self.counting = None
+        self.closed = False
+
+
+# Pages through one table in (sort key, id) order for ledger_view.LedgerView. Pages are read
+# with WHERE (key) > (last key of the previous page) ... LIMIT page_size, never
+# OFFSET from the top, so page 5,000 costs what page 1 does once its boundary
+# key is known. Boundaries are remembered as pages load; a jump to an unseen
+# page (dragging the scrollbar) seeks from the nearest known boundary, the start
+# or the end, and the key it finds is kept for the next jump. All queries run on
+# one background thread per pager through db.reader(); the Tk thread only ever
+# looks at the page cache and gets Futures for what is missing
+class LedgerPager:
+    def __init__(self, db, table, columns, page_size=PAGE_SIZE, cache_pages=CACHE_PAGES):
+        if table not in SORT_KEYS:
+            raise ValueError(f"No ledger paging for table {table!r}")
+        self.db = db
+        self.table = table
+        self.columns = tuple(columns)
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self.sort = 'date'
+        self.descending = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'ledger-{table}')
+        self._state = None
+        self.configure()
+
+    def configure(self, sort='date', descending=False, filters=None, start=None, end=None):
+        # Replaces sort and filters; cached pages, boundaries and the count start over
+        key = sort_key(self.table, sort)
+        clauses, params = keyset_filters(self.table, filters, start, end)
+        with self._lock:
+            old, self._state = self._state, _Keyset(key, descending, clauses, params)
+            self.sort, self.descending = sort, descending
+        if old is not None:
+            self._retire(old)
+
+    def refresh(self):
+        # Same configuration, fresh data (after rows were added or changed)
+        with self._lock:
+            old = self._state
+            self._state = _Keyset(old.key, old.descending, old.clauses, old.params)
+        self._retire(old)
+
+    def _retire(self, state):
+        state.closed = True
+        for future in list(state.pending.values()):
+            future.cancel()
+
+    def close(self):
+        self._retire(self._state)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _query(self, state, columns, after=None, backward=False, limit=1, offset=0):
+        # backward reads the keyset in reverse, from after (exclusive) towards the start
+        return keyset_query(
+            self.table, columns, state.key, state.clauses, state.params, after,
+            state.descending != backward, limit, offset
+        )
+
+    def total(self):
+        # Matching rows, or None while the COUNT runs in the background
+        with self._lock:
+            state = self._state
+            if state.total is None and state.counting is None:
+                state.counting = self._executor.submit(self._count, state)
+            return state.total
+
+    def count_future(self):
+        self.total()
+        with self._lock:
+            state = self._state
+            if state.total is not None:
+                return _done(state.total)
+            return state.counting
+
+    def _count(self, state):
+        if state.closed:
+            raise CancelledError()
+        where = f" WHERE {' AND '.join(state.clauses)}" if state.clauses else ""
+        with self.db.reader() as conn:
+            state.total = conn.execute(f"SELECT COUNT(*) FROM {self.table}{where}", state.params).fetchone()[0]
+        return state.total
+
+    def cached(self, index):
+        with self._lock:
+            page = self._state.pages.get(index)
+            if page is not None:
+                self._state.pages.move_to_end(index)
+            return page
+
+    def request(self, index):
+        # A Future for page index (a list of row tuples, empty past the end)
+        with self._lock:
+            state = self._state
+            if index in state.pages:
+                state.pages.move_to_end(index)
+                return _done(state.pages[index])
+            future = state.pending.get(index)
+            if future is None or future.cancelled():
+                future = self._executor.submit(self._load, state, index)
+                state.pending[index] = future
+            return future
+
+    def discard(self, keep):
+        # Drops queued page loads not in keep, so a fast scrollbar drag does
+        # not leave a backlog of seeks to pages already scrolled past
+        with self._lock:
+            state = self._state
+            for index, future in list(state.pending.items()):
+                if index not in keep and future.cancel():
+                    del state.pending[index]
+
+    def page(self, index):
+        return self.request(index).result()
+
+    def window(self, start, count, prefetch=1):
+        # Rows start..start+count as far as they are cached, plus Futures for the
+        # missing pages; the pages either side are requested in the background
+        first, last = start // self.page_size, (start + count - 1) // self.page_size
+        rows, missing = [], []
+        for index in range(first, last + 1):
+            page = self.cached(index)
+            if page is None:
+                missing.append(self.request(index))
+                rows.extend([None] * self.page_size)
+            else:
+                rows.extend(page)
+                if len(page) < self.page_size:
+                    break
+        keep = set(range(max(0, first - prefetch), last + prefetch + 1))
+        self.discard(keep)
+        if not missing:
+            for index in sorted(keep - set(range(first, last + 1))):
+                self.request(index)
+        offset = start - first * self.page_size
+        return rows[offset:offset + count], missing
+
+    def _load(self, state, index):
+        if state.closed:
+            raise CancelledError()
+        width = len(self.columns)
+        with self.db.reader() as conn:
+            after = self._seek(conn, state, index)
+            if after is _END:
+                rows = []
+            else:
+                sql, params = self._query(state, self.columns + state.key, after, limit=self.page_size)
+                rows = conn.execute(sql, params).fetchall()
+        if len(rows) == self.page_size:
+            state.bounds[index + 1] = rows[-1][width:]
+        page = [row[:width] for row in rows]
+        with self._lock:
+            state.pending.pop(index, None)
+            state.pages[index] = page
+            while len(state.pages) > self.cache_pages:
+                state.pages.popitem(last=False)
+        return page
+
+    def _seek(self, conn, state, index):
+        # The boundary key before page index: known, or found from the nearest
+        # known boundary (or either end) by walking the index in key order
+        if index == 0:
+            return None
+        if index in state.bounds:
+            return state.bounds[index]
+        target = index * self.page_size - 1
+        known = sorted(state.bounds)
+        before = max((i for i in known if i < index), default=0)
+        options = [((target - (before * self.page_size - 1)), state.bounds.get(before), False)]
+        after = min((i for i in known if i > index), default=None)
+        if after is not None:
+            options.append(((after - index) * self.page_size, state.bounds[after], True))
+        if state.total is not None:
+            if target >= state.total:
+                return _END
+            options.append((state.total - target, None, True))
+        distance, key, backward = min(options, key=lambda option: option[0])
+        sql, params = self._query(state, state.key, key, backward=backward, offset=distance - 1)
+        row = conn.execute(sql, params).fetchone()
+        if row is None:
+            return _END
+        state.bounds[index] = tuple(row)
+        return state.bounds[index]
+
+
+_END = object()
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
@@ -0,0 +1,268 @@
+import logging
+import numpy as np
+
+from money import from_cents
+
+FETCH_SIZE = 50000
+# Per-row bytes of the columnar layouts below, used to enforce memory_budget
+FINANCIAL_ROW_BYTES = 4 + 1 + 4 + 8
+STOCK_ROW_BYTES = 4 + 1 + 4 + 4 + 8 + 8 + 8
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+FINANCIAL_COLUMNS = ('date', 'type', 'category', 'amount_cents')
+STOCK_COLUMNS = ('date', 'transaction_type', 'vendor_name', 'item_name', 'quantity', 'unit_price_cents',
+                 'total_price_cents')
+
+
+def _date_filter(start, end):
+    clauses, params = [], []
+    if start:
+        clauses.append("date >= ?")
+        params.append(str(start))
+    if end:
+        clauses.append("date <= ?")
+        params.append(str(end))
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class _Dictionary:
+    # Maps string labels to dense int32 codes a whole chunk at a time
+    def __init__(self):
+        self.labels = []
+        self.codes = {}
+
+    def encode(self, values):
+        uniques, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+        mapping = np.empty(len(uniques), dtype=np.int32)
+        for position, label in enumerate(uniques):
+            code = self.codes.get(label)
+            if code is None:
+                code = self.codes[label] = len(self.labels)
+                self.labels.append(label)
+            mapping[position] = code
+        return mapping[inverse]
+
+
+def _group_sum(codes, cents, size):
+    # Exact per-group int64 sums; bincount would go through float64
+    totals = np.zeros(size, dtype=np.int64)
+    np.add.at(totals, codes, cents)
+    return totals
+
+
+def _to_days(dates):
+    return np.asarray(dates, dtype='U10').astype('datetime64[D]').astype(np.int32)
+
+
+# Columnar (NumPy) copy of financial_records and stock for reporting. Rows are
+# streamed from SQLite in FETCH_SIZE chunks into preallocated arrays, so peak
+# memory is the arrays plus one chunk of Python tuples. Money stays in int64
+# cents; money totals in the reports are exact Decimals, averages are floats.
+class LedgerAnalytics:
+    def __init__(self, db, start=None, end=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.db = db
+        self.start = start
+        self.end = end
+        self.memory_budget = memory_budget
+        self.categories = _Dictionary()
+        self.vendors = _Dictionary()
+        self.items = _Dictionary()
+        # One read transaction, so both tables come from the same snapshot;
+        # archived years in the range are attached before it starts
+        with db.reader() as conn:
+            records = db.archives.source(conn, 'financial_records', start, end, FINANCIAL_COLUMNS)
+            stock = db.archives.source(conn, 'stock', start, end, STOCK_COLUMNS)
+            snapshot = not conn.in_transaction
+            if snapshot:
+                conn.execute("BEGIN")
+            try:
+                self._load_financial_records(conn, records)
+                self._load_stock(conn, stock)
+            finally:
+                if snapshot:
+                    conn.rollback()
+
+    def _count(self, conn, source, where, params):
+        return conn.execute(f"SELECT COUNT(*) FROM {source}{where}", params).fetchone()[0]
+
+    def _check_budget(self, rows, row_bytes, table):
+        needed = rows * row_bytes
+        if needed > self.memory_budget:
+            raise MemoryError(
+                f"Loading {rows} {table} rows needs {needed} bytes, over the {self.memory_budget} byte budget; "
+                "narrow the date range or raise memory_budget"
+            )
+
+    def _load_financial_records(self, conn, source):
+        where, params = _date_filter(self.start, self.end)
+        rows = self._count(conn, source, where, params)
+        self._check_budget(rows, FINANCIAL_ROW_BYTES, 'financial_records')
+        self.fin_day = np.empty(rows, dtype=np.int32)
+        self.fin_income = np.empty(rows, dtype=np.bool_)
+        self.fin_category = np.empty(rows, dtype=np.int32)
+        self.fin_cents = np.empty(rows, dtype=np.int64)
+
+        cursor = conn.execute(f"SELECT {', '.join(FINANCIAL_COLUMNS)} FROM {source}{where}", params)
+        filled = 0
+        while filled < rows:
+            chunk = cursor.fetchmany(FETCH_SIZE)
+            if not chunk:
+                break
+            dates, types, categories, amounts = zip(*chunk)
+            stop = filled + len(chunk)
+            self.fin_day[filled:stop] = _to_days(dates)
+            self.fin_income[filled:stop] = np.asarray(types, dtype=object) == 'income'
+            self.fin_category[filled:stop] = self.categories.encode(categories)
+            self.fin_cents[filled:stop] = amounts
+            filled = stop
+        for name in ('fin_day', 'fin_income', 'fin_category', 'fin_cents'):
+            setattr(self, name, getattr(self, name)[:filled])
+        logging.info(f"Loaded {filled} financial records into columnar arrays")
+
+    def _load_stock(self, conn, source):
+        where, params = _date_filter(self.start, self.end)
+        rows = self._count(conn, source, where, params)
+        self._check_budget(rows, STOCK_ROW_BYTES, 'stock')
+        self.stock_day = np.empty(rows, dtype=np.int32)
+        self.stock_sale = np.empty(rows, dtype=np.bool_)
+        self.stock_vendor = np.empty(rows, dtype=np.int32)
+        self.stock_item = np.empty(rows, dtype=np.int32)
+        self.stock_quantity = np.empty(rows, dtype=np.float64)
+        self.stock_unit_cents = np.empty(rows, dtype=np.int64)
+        self.stock_total_cents = np.empty(rows, dtype=np.int64)
+
+        cursor = conn.execute(
+            f"SELECT {', '.join(STOCK_COLUMNS)} FROM {source}{where}", params
+        )
+        filled = 0
+        while filled < rows:
+            chunk = cursor.fetchmany(FETCH_SIZE)
+            if not chunk:
+                break
+            dates, types, vendors, items, quantities, unit_prices, totals = zip(*chunk)
+            stop = filled + len(chunk)
+            self.stock_day[filled:stop] = _to_days(dates)
+            self.stock_sale[filled:stop] = np.asarray(types, dtype=object) == 'Sale'
+            self.stock_vendor[filled:stop] = self.vendors.encode(vendors)
+            self.stock_item[filled:stop] = self.items.encode(items)
+            self.stock_quantity[filled:stop] = quantities
+            self.stock_unit_cents[filled:stop] = unit_prices
+            self.stock_total_cents[filled:stop] = totals
+            filled = stop
+        for name in ('stock_day', 'stock_sale', 'stock_vendor', 'stock_item',
+                     'stock_quantity', 'stock_unit_cents', 'stock_total_cents'):
+            setattr(self, name, getattr(self, name)[:filled])
+        logging.info(f"Loaded {filled} stock rows into columnar arrays")
+
+    @property
+    def nbytes(self):
+        return sum(
+            value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray)
+        )
+
+    def monthly_pnl(self):
+        # [(YYYY-MM, income, expense, net), ...]
+        if not len(self.fin_day):
+            return []
+        months = self.fin_day.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        first = months.min()
+        offsets = months - first
+        size = int(offsets.max()) + 1
+        income = _group_sum(offsets, np.where(self.fin_income, self.fin_cents, 0), size)
+        expense = _group_sum(offsets, np.where(self.fin_income, 0, self.fin_cents), size)
+        present = np.bincount(offsets, minlength=size) > 0
+        labels = np.arange(first, first + size).astype('datetime64[M]').astype(str)
+        return [
+            (labels[i], from_cents(int(income[i])), from_cents(int(expense[i])),
+             from_cents(int(income[i] - expense[i])))
+            for i in np.flatnonzero(present)
+        ]
+
+    def category_breakdown(self, record_type=None):
+        # [(type, category, total, entries), ...] largest first
+        rows = []
+        for current_type, mask in (('income', self.fin_income), ('expense', ~self.fin_income)):
+            if record_type and record_type != current_type:
+                continue
+            codes = self.fin_category[mask]
+            size = len(self.categories.labels)
+            totals = _group_sum(codes, self.fin_cents[mask], size)
+            counts = np.bincount(codes, minlength=size)
+            rows.extend(
+                (current_type, self.categories.labels[code], from_cents(int(totals[code])), int(counts[code]))
+                for code in np.flatnonzero(counts)
+            )
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def vendor_spend(self):
+        # [(vendor, purchase total, purchase rows), ...] largest first
+        purchases = ~self.stock_sale
+        size = len(self.vendors.labels)
+        totals = _group_sum(self.stock_vendor[purchases], self.stock_total_cents[purchases], size)
+        counts = np.bincount(self.stock_vendor[purchases], minlength=size)
+        order = np.argsort(-totals)
+        return [
+            (self.vendors.labels[code], from_cents(int(totals[code])), int(counts[code]))
+            for code in order if counts[code]
+        ]
+
+    def item_margin(self):
+        # [(item, avg purchase price, avg sale price, unit margin, margin %), ...]
+        # using quantity-weighted average unit prices on each side
+        size = len(self.items.labels)
+        value = self.stock_quantity * self.stock_unit_cents / 100
+        sold_qty = np.bincount(self.stock_item, weights=np.where(self.stock_sale, self.stock_quantity, 0.0), minlength=size)
+        sold_value = np.bincount(self.stock_item, weights=np.where(self.stock_sale, value, 0.0), minlength=size)
+        bought_qty = np.bincount(self.stock_item, weights=np.where(self.stock_sale, 0.0, self.stock_quantity), minlength=size)
+        bought_value = np.bincount(self.stock_item, weights=np.where(self.stock_sale, 0.0, value), minlength=size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sale_price = sold_value / sold_qty
+            purchase_price = bought_value / bought_qty
+            margin = sale_price - purchase_price
+            margin_pct = np.where(sale_price > 0, margin / sale_price * 100, np.nan)
+        both = (sold_qty > 0) & (bought_qty > 0)
+        return [
+            (self.items.labels[code], float(purchase_price[code]), float(sale_price[code]),
+             float(margin[code]), float(margin_pct[code]))
+            for code in np.flatnonzero(both)
+        ]
+
+    def rolling_average(self, window=30, record_type=None):
+        # Daily series (dates, rolling mean in dollars) of net amount, or of one type's amount
+        if not len(self.fin_day):
+            return np.array([], dtype='datetime64[D]'), np.array([])
+        if record_type == 'income':
+            cents = np.where(self.fin_income, self.fin_cents, 0)
+        elif record_type == 'expense':
+            cents = np.where(self.fin_income, 0, self.fin_cents)
+        else:
+            cents = np.where(self.fin_income, self.fin_cents, -self.fin_cents)
+        first = int(self.fin_day.min())
+        offsets = self.fin_day - first
+        daily = _group_sum(offsets, cents, int(offsets.max()) + 1)
+        # Window sums are exact int64 differences; only the mean is a float
+        sums = np.concatenate(([0], np.cumsum(daily)))
+        ends = np.arange(1, len(daily) + 1)
+        starts = np.maximum(ends - window, 0)
+        rolling = (sums[ends] - sums[starts]) / (ends - starts) / 100
+        days = np.arange(first, first + len(daily)).astype('datetime64[D]')
+        return days, rolling
+
+
+def _rolling_rows(analytics):
+    days, values = analytics.rolling_average()
+    return [(str(day), float(value)) for day, value in zip(days, values)]
+
+
+# Report name -> (column headings, function producing rows); drives the Reports tab
+REPORTS = {
+    'Monthly P&L': (('Month', 'Income', 'Expense', 'Net'), LedgerAnalytics.monthly_pnl),
+    'Category Breakdown': (('Type', 'Category', 'Total', 'Entries'), LedgerAnalytics.category_breakdown),
+    'Vendor Spend': (('Vendor', 'Purchases', 'Rows'), LedgerAnalytics.vendor_spend),
+    'Item Margin': (('Item', 'Avg Purchase', 'Avg Sale', 'Unit Margin', 'Margin %'), LedgerAnalytics.item_margin),
+    '30-Day Rolling Net': (('Date', 'Average Net'), _rolling_rows),
+}
+
+
+def run_report(analytics, name):
+    columns, build = REPORTS[name]
+    return columns, build(analytics)
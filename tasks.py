@@ -0,0 +1,109 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+    def __init__(self, name, events):
+        self.name = name
+        self.future = None
+        self._events = events
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        # A task that never started gets no event from its worker, post it here
+        if self.future is not None and self.future.cancel():
+            self._events.put(('cancelled', self, None))
+
+    def check(self):
+        # Called by the task body at safe points; unwinds the task once cancelled
+        if self._cancelled.is_set():
+            raise TaskCancelled(self.name)
+
+    def report(self, fraction=None, message=""):
+        # fraction in [0, 1], or None when the total amount of work is unknown
+        self.check()
+        self._events.put(('progress', self, (fraction, message)))
+
+
+# Runs slow work on a thread pool and hands results back to Tk. Worker threads
+# never touch widgets: they post events to a queue that the Tk main loop drains
+# every poll_ms via root.after, and callbacks run there. Task functions receive
+# the Task as their first argument to report progress and honour cancellation.
+class TaskScheduler:
+    def __init__(self, root, workers=2, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.events = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='finance-task')
+        self.active = set()
+        self._callbacks = {}
+        self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, name, fn, *args, on_success=None, on_error=None, on_progress=None, on_cancel=None,
+               **kwargs):
+        task = Task(name, self.events)
+        self._callbacks[task] = (on_success, on_error, on_progress, on_cancel)
+        self.active.add(task)
+
+        def run():
+            try:
+                task.check()
+                result = fn(task, *args, **kwargs)
+            except TaskCancelled:
+                self.events.put(('cancelled', task, None))
+            except Exception as e:
+                logging.error(f"Background task {name} failed: {str(e)}")
+                self.events.put(('error', task, e))
+            else:
+                self.events.put(('done', task, result))
+
+        task.future = self.executor.submit(run)
+        return task
+
+    def _poll(self):
+        try:
+            while True:
+                kind, task, payload = self.events.get_nowait()
+                self._dispatch(kind, task, payload)
+        except queue.Empty:
+            pass
+        self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def _dispatch(self, kind, task, payload):
+        on_success, on_error, on_progress, on_cancel = self._callbacks.get(task, (None,) * 4)
+        if kind == 'progress':
+            if on_progress and not task.cancelled:
+                on_progress(task, *payload)
+            return
+        if task not in self.active:
+            return
+        self.active.discard(task)
+        self._callbacks.pop(task, None)
+        if kind == 'done' and on_success:
+            on_success(payload)
+        elif kind == 'error' and on_error:
+            on_error(payload)
+        elif kind == 'cancelled' and on_cancel:
+            on_cancel()
+
+    def cancel_all(self):
+        for task in list(self.active):
+            task.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pytest
+
+from api import ApiError, ApiServer
+from database import Database
+from models import FinancialRecord
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(tmp_path / 'ledger.db', readers=2)
+    db.initialize()
+    yield db
+    db.close()
+
+
+def test_analytics_cache_notices_writes_from_other_connections(db):
+    async def run():
+        server = ApiServer(db, port=0, invoice_dir=db.db_path.parent / 'invoices')
+        await server.start()
+        try:
+            first = await server._ledger('2024-01-01', '2024-12-31')
+            assert await server._ledger('2024-01-01', '2024-12-31') is first
+            # Another process's import, not through the server's write queue
+            other = Database(db.db_path)
+            other.initialize()
+            other.insert_financial_records_many([FinancialRecord('income', '2024-03-01', 'Sales', 'cli', 120)])
+            other.close()
+            second = await server._ledger('2024-01-01', '2024-12-31')
+            assert second is not first
+            # and the server's own writes
+            await server.writes.submit(lambda conn: conn.execute(
+                "INSERT INTO financial_records (type, date, category, description, amount_cents) "
+                "VALUES ('expense', '2024-04-01', 'Rent', 'api', 5000)"
+            ))
+            assert await server._ledger('2024-01-01', '2024-12-31') is not second
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize('number', ['../../etc/passwd', 'a/b', '2024.1', 'x y'])
+def test_invoice_number_outside_the_file_name_alphabet_is_refused_before_claiming(db, number):
+    spec = {'number': number, 'customer_name': 'Acme', 'customer_address': '1 Main St',
+            'items': [{'description': 'Widget', 'quantity': 1, 'price': 10}]}
+
+    async def run():
+        server = ApiServer(db, port=0, invoice_dir=db.db_path.parent / 'invoices')
+        await server.start()
+        try:
+            with pytest.raises(ApiError) as error:
+                await server._create_invoice({}, json.dumps(spec).encode())
+            assert error.value.status == 400
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+    assert db.execute_query("SELECT COUNT(*) FROM invoices").fetchone()[0] == 0
+    with pytest.raises(ValueError):
+        db.claim_invoices([(number, '2024-01-01', 'Acme')])
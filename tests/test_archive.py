@@ -0,0 +1,62 @@
+from datetime import date
+
+import pytest
+
+from archive import DEFAULT_ATTACH_LIMIT
+from database import Database
+from inventory import InventoryEngine
+from models import FinancialRecord, StockTransaction
+
+FIRST_YEAR, LAST_YEAR = 2010, 2022
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(tmp_path / 'ledger.db')
+    db.initialize()
+    stock, records = [], []
+    for year in range(FIRST_YEAR, LAST_YEAR + 1):
+        for month in (2, 8):
+            day = date(year, month, 10)
+            stock.append(StockTransaction(day, 'Purchase', 'Acme', 'Widget', 10, 2.5 + year % 3))
+            stock.append(StockTransaction(day, 'Sale', 'Acme', 'Widget', 4, 9.0))
+            records.append(FinancialRecord('expense', day, 'Rent', f"rent {day}", 100 + year))
+    db.insert_stock_many(stock)
+    db.insert_financial_records_many(records)
+    yield db
+    db.close()
+
+
+def test_more_archived_years_than_sqlite_attaches(db):
+    engine = InventoryEngine(db)
+    value = engine.value_as_of(date(LAST_YEAR, 12, 31))
+    total = db.execute_query("SELECT SUM(amount_cents) FROM financial_records").fetchone()[0]
+
+    archived = range(FIRST_YEAR, FIRST_YEAR + DEFAULT_ATTACH_LIMIT + 1)
+    for year in archived:
+        db.archives.archive_year(year)
+    assert sorted(db.archives.years()) == list(archived)
+    assert len(db.archives.files()) <= DEFAULT_ATTACH_LIMIT
+    assert all(not problems for problems in db.archives.verify().values())
+
+    # Whole-history readers attach every file at once
+    assert engine.rebuild() == 4 * (LAST_YEAR - FIRST_YEAR + 1)
+    assert engine.value_as_of(date(LAST_YEAR, 12, 31)) == value
+    assert db.rebuild_daily_totals() == []
+    with db.reader() as conn:
+        source = db.archives.source(conn, 'financial_records', columns=('date', 'amount_cents'))
+        assert conn.execute(f"SELECT SUM(amount_cents) FROM {source}").fetchone()[0] == total
+        source = db.archives.source(conn, 'financial_records', '2010-01-01', '2010-12-31', ('date', 'amount_cents'))
+        assert conn.execute(f"SELECT COUNT(*) FROM {source} WHERE date BETWEEN '2010-01-01' AND '2010-12-31'"
+                            ).fetchone()[0] == 2
+
+
+def test_compact_merges_oldest_files(db):
+    for year in range(FIRST_YEAR, FIRST_YEAR + 4):
+        db.archives.archive_year(year)
+    before = {name: years for name, years in db.archives.files().items()}
+    assert db.archives.compact(limit=2) == [FIRST_YEAR, FIRST_YEAR + 1, FIRST_YEAR + 2]
+    files = db.archives.files()
+    assert list(files.values()) == [[FIRST_YEAR, FIRST_YEAR + 1, FIRST_YEAR + 2], [FIRST_YEAR + 3]]
+    assert not any(db.archives.path(name).exists() for name in before if name not in files)
+    assert all(not problems for problems in db.archives.verify().values())
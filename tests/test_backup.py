@@ -0,0 +1,36 @@
+import threading
+import time
+
+from backup import BackupManager
+from database import Database
+from models import FinancialRecord
+
+
+def test_overlapping_backups_both_complete(tmp_path):
+    db = Database(tmp_path / 'ledger.db', readers=2)
+    db.initialize()
+    db.insert_financial_records_many(
+        FinancialRecord('expense', '2024-01-01', 'Rent', f"row {n}", 10 + n % 90) for n in range(20000)
+    )
+    results, errors = [], []
+
+    def backup():
+        # A slow page copy, so the two runs would overlap without the directory lock
+        try:
+            results.append(BackupManager(db).create(progress=lambda remaining, total: time.sleep(0.01), pages=8))
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=backup) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [] and len(results) == 2
+    manager = BackupManager(db)
+    # Within one hour retention keeps only the newer one; whatever survives must be intact
+    names = [name for name, _ in manager.list()]
+    assert max(name for name, _ in results) in names
+    assert all(manager.verify(name) == [] for name in names)
+    assert list(manager.backup_dir.glob('*.tmp')) == []
+    db.close()
@@ -0,0 +1,71 @@
+import sqlite3
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from batch import FinancialRecordBatch, StockBatch
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE stock (id INTEGER PRIMARY KEY, date, transaction_type, vendor_name, item_name, "
+                 "quantity, unit_price_cents)")
+    conn.execute("CREATE TABLE financial_records (id INTEGER PRIMARY KEY, type, date, category, description, "
+                 "amount_cents)")
+    # Vendors and items that first appear in later fetch chunks, so labels must be re-coded on concat
+    conn.executemany("INSERT INTO stock VALUES (NULL, ?, ?, ?, ?, ?, ?)", [
+        (f"2024-01-{n % 28 + 1:02d}", 'Sale' if n % 3 else 'Purchase', f"Vendor {n // 700}", f"SKU-{n % 997}",
+         n % 9 + 0.5 * (n % 2), 100 + n % 700)
+        for n in range(5000)
+    ])
+    conn.executemany("INSERT INTO financial_records VALUES (NULL, ?, ?, ?, ?, ?)", [
+        ('income' if n % 2 else 'expense', f"2024-02-{n % 28 + 1:02d}", f"Category {n // 900}", f"row {n}", n + 1)
+        for n in range(5000)
+    ])
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('batch_type', [StockBatch, FinancialRecordBatch])
+def test_from_cursor_matches_from_rows(conn, batch_type):
+    sql = batch_type.select_sql(" ORDER BY id")
+    expected = batch_type.from_rows(conn.execute(sql).fetchall())
+    chunked = batch_type.from_cursor(conn.execute(sql), fetch_size=333)
+    assert len(chunked) == len(expected) == 5000
+    assert chunked.to_rows() == expected.to_rows()
+    assert {message: mask.tolist() for message, mask in chunked.validate_batch().items()} == \
+        {message: mask.tolist() for message, mask in expected.validate_batch().items()}
+
+
+def test_from_cursor_empty(conn):
+    batch = StockBatch.from_cursor(conn.execute(StockBatch.select_sql(" WHERE id < 0")))
+    assert len(batch) == 0
+    assert batch.to_rows() == []
+
+
+def test_concat_merges_labels():
+    first = StockBatch.from_rows([('2024-01-01', 'Sale', 'Globex', 'A', 1.0, 100)])
+    second = StockBatch.from_rows([('2024-01-02', 'Purchase', 'Acme', 'A', 2.0, 150),
+                                   ('2024-01-03', 'Sale', 'Globex', 'B', 3.0, 200)])
+    merged = StockBatch.concat([first, second])
+    assert merged.vendor.labels == ['Globex', 'Acme']
+    assert merged.vendor.values() == ['Globex', 'Acme', 'Globex']
+    assert merged.item.values() == ['A', 'A', 'B']
+    assert merged.total_price_cents.tolist() == [100, 300, 600]
+    assert isinstance(merged.day, np.ndarray) and len(merged) == 3
+
+
+def test_from_cursor_holds_one_chunk_of_rows(conn):
+    conn.executemany("INSERT INTO stock SELECT NULL, date, transaction_type, vendor_name, item_name, quantity, "
+                     "unit_price_cents FROM stock", [()] * 3)
+    sql = StockBatch.select_sql(" ORDER BY id")
+    peaks = []
+    for load in (lambda: StockBatch.from_rows(conn.execute(sql).fetchall()),
+                 lambda: StockBatch.from_cursor(conn.execute(sql), fetch_size=2000)):
+        tracemalloc.start()
+        load()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    assert peaks[1] < peaks[0] / 2
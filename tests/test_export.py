@@ -0,0 +1,70 @@
+import csv
+import itertools
+from datetime import date
+
+import pytest
+
+from database import Database
+from export import EXPORT_COLUMNS, TYPE_COLUMNS, export_queries, export_table
+from models import FinancialRecord, StockTransaction
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(tmp_path / 'ledger.db', readers=1)
+    db.initialize()
+    stock, records = [], []
+    for year in (2021, 2022, 2023):
+        for month in range(1, 13):
+            day = date(year, month, 5)
+            stock.append(StockTransaction(day, 'Purchase', 'Acme', f"SKU-{month}", 3, 1.25))
+            stock.append(StockTransaction(day, 'Sale', 'Acme', f"SKU-{month}", 1, 4.0))
+            records.append(FinancialRecord('income', day, 'Sales', f"sale {day}", 80))
+            records.append(FinancialRecord('expense', day, 'Rent', f"rent {day}", 50))
+    db.insert_stock_many(stock)
+    db.insert_financial_records_many(records)
+    db.execute_query("ANALYZE", commit=True)
+    yield db
+    db.close()
+
+
+TYPES = {'stock': 'Sale', 'financial_records': 'expense'}
+
+
+@pytest.mark.parametrize('archived', [False, True])
+@pytest.mark.parametrize('table', sorted(EXPORT_COLUMNS))
+def test_export_queries_never_sort(db, table, archived):
+    if archived:
+        db.archives.archive_year(2021)
+    for start, end, record_type in itertools.product(('2021-03-01', None), ('2023-06-30', None),
+                                                     (TYPES[table], None)):
+        with db.reader() as conn:
+            queries = export_queries(db, conn, table, start, end, record_type)
+            assert len(queries) == (2 if archived else 1)
+            for query, params in queries:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+                assert not any('TEMP B-TREE' in step for step in plan), (start, end, record_type, plan)
+
+
+def test_export_includes_archived_years_in_id_order(db, tmp_path):
+    db.archives.archive_year(2021)
+    path = tmp_path / 'expenses.csv'
+    assert export_table(db, 'financial_records', path, start='2021-06-01', record_type='expense') == 31
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row['id']) for row in rows] == sorted(int(row['id']) for row in rows)
+    assert {row[TYPE_COLUMNS['financial_records']] for row in rows} == {'expense'}
+    assert rows[0]['date'] == '2021-06-05' and rows[0]['amount'] == '50.0'
+
+
+def test_cancelled_export_leaves_no_file(db, tmp_path):
+    path = tmp_path / 'stock.csv.gz'
+
+    def cancel(written):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        export_table(db, 'stock', path, fetch_size=10, progress=cancel)
+    assert list(tmp_path.glob('stock.csv*')) == []
+    assert export_table(db, 'stock', path) == 72
+    assert list(tmp_path.glob('stock.csv*')) == [path]
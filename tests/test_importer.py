@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+import importer
+from database import Database
+
+
+@pytest.fixture
+def ledger_csv(tmp_path):
+    path = tmp_path / 'bank.csv'
+    with open(path, 'w') as f:
+        f.write('type,date,category,description,amount\n')
+        for n in range(1, 101):
+            f.write(f"expense,2024-01-01,Rent,row {n},{'bad' if n % 10 == 0 else f'{n}.00'}\n")
+    return path
+
+
+def _crash_on_chunk(monkeypatch, chunk):
+    # The chunk's progress is staged inside its transaction, then the write fails before the commit
+    calls = []
+    save = importer.CsvImporter._commit_progress
+
+    def commit_progress(self, *args):
+        size = save(self, *args)
+        calls.append(size)
+        if len(calls) == chunk:
+            raise OSError("disk full")
+        return size
+
+    monkeypatch.setattr(importer.CsvImporter, '_commit_progress', commit_progress)
+
+
+def test_resume_after_failed_chunk_writes_every_row_once(tmp_path, ledger_csv, monkeypatch):
+    db_path = tmp_path / 'ledger.db'
+    _crash_on_chunk(monkeypatch, 3)
+    with pytest.raises(OSError):
+        importer.import_csv(db_path, 'financial_records', ledger_csv, chunk_rows=20, workers=1)
+    monkeypatch.undo()
+
+    db = Database(db_path)
+    db.initialize()
+    assert db.execute_query("SELECT COUNT(*) FROM financial_records").fetchone()[0] == 36
+    assert db.execute_query("SELECT next_row FROM import_checkpoints").fetchone()[0] == 41
+
+    assert importer.import_csv(db_path, 'financial_records', ledger_csv, chunk_rows=20, workers=1) == (90, 10)
+    assert db.execute_query("SELECT COUNT(*), COUNT(DISTINCT description) FROM financial_records").fetchone() == \
+        (90, 90)
+    assert db.execute_query("SELECT COUNT(*) FROM import_checkpoints").fetchone()[0] == 0
+    db.close()
+
+    with open(f"{ledger_csv}.rejects.jsonl") as f:
+        assert [json.loads(line)['row'] for line in f] == list(range(10, 101, 10))
@@ -0,0 +1,66 @@
+import math
+import re
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate
+
+import invoicing
+from database import Database
+
+
+class BrokenPool:
+    # Stands in for ProcessPoolExecutor: renders the first job, then loses its workers
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def map(self, fn, jobs, chunksize=1):
+        jobs = iter(jobs)
+        yield fn(next(jobs))
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+
+def test_broken_pool_voids_unfinished_claims(tmp_path, monkeypatch):
+    db = Database(tmp_path / 'ledger.db')
+    db.initialize()
+    specs = [
+        {'customer_name': f"Customer {n}", 'customer_address': '1 Main St',
+         'items': [{'description': 'Widget', 'quantity': 2, 'price': 9.5}], 'tax_rate': 0.1}
+        for n in range(3)
+    ]
+    monkeypatch.setattr(invoicing, 'ProcessPoolExecutor', BrokenPool)
+    with pytest.raises(BrokenProcessPool):
+        invoicing.generate_invoices(specs, tmp_path / 'out', db=db)
+    statuses = db.execute_query("SELECT status FROM invoices ORDER BY number").fetchall()
+    assert [status for (status,) in statuses] == ['issued', 'void', 'void']
+    db.close()
+
+
+def test_tax_label_keeps_fractional_rates():
+    assert [invoicing.tax_label(rate) for rate in (0.075, 0.07, 0.1, 0, 0.0825)] == ['7.5%', '7%', '10%', '0%', '8.25%']
+
+
+def test_multi_page_invoice(tmp_path):
+    items = [{'description': f"Part {n}", 'quantity': n % 4 + 1, 'price': 1.25 + n % 10} for n in range(300)]
+    path, totals = invoicing.render_invoice({
+        'number': 'MP-1', 'date': '2024-05-01', 'customer_name': 'Acme', 'customer_address': '1 Main St',
+        'items': iter(items), 'tax_rate': 0.075,
+    }, tmp_path / 'Invoice_MP-1.pdf')
+
+    subtotal = sum(round(item['price'] * 100) * item['quantity'] for item in items)
+    assert totals == {'subtotal': subtotal, 'tax': round(subtotal * 0.075), 'total': subtotal + round(subtotal * 0.075),
+                      'lines': 300}
+    with open(path, 'rb') as f:
+        pdf = f.read()
+    pages = len(re.findall(rb'/Type /Page\b(?!s)', pdf))
+    rows_first, rows_later = invoicing._rows_per_page(SimpleDocTemplate(str(tmp_path / 'probe.pdf'), pagesize=letter,
+                                                                        topMargin=invoicing.MARGIN,
+                                                                        bottomMargin=invoicing.MARGIN))
+    assert pages == 1 + math.ceil((300 - rows_first) / rows_later)
@@ -0,0 +1,38 @@
+import copy
+import pickle
+from datetime import date
+
+import pytest
+
+from models import FrozenFinancialRecord, FrozenInvoice, FrozenStockTransaction, InvoiceItem
+
+RECORDS = [
+    FrozenStockTransaction(date(2024, 1, 2), 'Purchase', 'Globex', 'SKU-00001', 3.0, 4.25),
+    FrozenFinancialRecord('expense', date(2024, 1, 2), 'Supplies', 'Paper', 12.5),
+    InvoiceItem('Widget', 2, 19.99),
+    FrozenInvoice('Acme', '1 Main Street', (InvoiceItem('Widget', 2, 19.99), InvoiceItem('Bolt', 10, 0.25)), 0.08),
+]
+
+
+@pytest.mark.parametrize('record', RECORDS, ids=lambda record: type(record).__name__)
+def test_frozen_records_pickle_round_trip(record):
+    restored = pickle.loads(pickle.dumps(record))
+    assert restored == record
+    assert type(restored) is type(record)
+
+
+@pytest.mark.parametrize('record', RECORDS, ids=lambda record: type(record).__name__)
+def test_frozen_records_deepcopy(record):
+    assert copy.deepcopy(record) == record
+
+
+@pytest.mark.parametrize('record', RECORDS, ids=lambda record: type(record).__name__)
+def test_frozen_records_have_no_dict(record):
+    assert not hasattr(record, '__dict__')
+
+
+def test_frozen_stock_transaction_keeps_cents_and_validation():
+    transaction = pickle.loads(pickle.dumps(RECORDS[0]))
+    assert transaction.unit_price_cents == 425
+    assert transaction.total_price_cents == 1275
+    assert transaction.validate() == []
@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.bench_ingest import make_transactions
+from benchmarks.check_query_plans import SAMPLE_PARAMS, make_records
+from database import Database, REPORT_QUERIES, report_sql
+
+FULL_SCANS = ('SCAN stock', 'SCAN financial_records')
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    db = Database(tmp_path_factory.mktemp('plans') / 'plans.db')
+    db.initialize()
+    db.insert_stock_many(make_transactions(20000))
+    db.insert_financial_records_many(make_records(20000))
+    db.execute_query("ANALYZE", commit=True)
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize('name', sorted(REPORT_QUERIES))
+def test_report_query_never_scans_a_table(db, name):
+    plan = db.explain_query_plan(report_sql(name), SAMPLE_PARAMS[name])
+    assert any(step.startswith(('SEARCH stock', 'SEARCH financial_records')) for step in plan), plan
+    assert not any(step.startswith(FULL_SCANS) for step in plan), plan
@@ -0,0 +1,8 @@
+from benchmarks.stress_pool import run
+
+
+def test_concurrent_writers_and_readers(tmp_path):
+    stats, stored = run(tmp_path / 'stress.db', seconds=1.5, writers=3, readers=2)
+    assert stats['errors'] == []
+    assert stats['writes'] > 0 and stats['reads'] > 0
+    assert stored == stats['writes']
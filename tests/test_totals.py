@@ -0,0 +1,47 @@
+import random
+from datetime import date, timedelta
+
+from totals import FenwickTree, ProfitLossEngine
+
+
+def test_fenwick_values_round_trip():
+    values = [random.Random(3).randint(-50, 50) for _ in range(1000)]
+    assert FenwickTree(values).values() == values
+    tree = FenwickTree.zeros(10)
+    tree.add(4, 7)
+    assert tree.values() == [0, 0, 0, 0, 7, 0, 0, 0, 0, 0]
+
+
+def test_totals_match_a_brute_force_sum():
+    rng = random.Random(11)
+    engine = ProfitLossEngine()
+    entries = []
+    # Far-past, backdated and far-future days all force the day range to grow
+    for n in range(3000):
+        day = date(2024, 6, 1) + timedelta(days=rng.choice([rng.randint(-30, 30), rng.randint(-4000, 4000)]))
+        entry = (rng.choice(['income', 'expense']), f"Category {rng.randint(0, n // 100)}", rng.randint(1, 10 ** 6), day)
+        entries.append(entry)
+        engine.add(*entry)
+
+    def expected(record_type, start, end, category=None):
+        return sum(amount for kind, name, amount, day in entries
+                   if kind == record_type and start <= day <= end and category in (None, name))
+
+    for _ in range(200):
+        start = date(2024, 6, 1) + timedelta(days=rng.randint(-5000, 5000))
+        end = start + timedelta(days=rng.randint(0, 3000))
+        category = rng.choice([None, 'Category 0', 'Category 7', 'Category 99'])
+        assert engine.total('income', start, end, category) == expected('income', start, end, category)
+        assert engine.total('expense', start, end, category) == expected('expense', start, end, category)
+
+
+def test_new_category_leaves_other_trees_alone():
+    engine = ProfitLossEngine()
+    engine.add('income', 'Sales', 500, date(2024, 1, 10))
+    income, sales = engine.series[('income', None)], engine.series[('income', 'Sales')]
+    engine.add('income', 'Services', 250, date(2024, 3, 1))
+    engine.add('income', 'Sales', 100, date(2023, 11, 5))  # backdated, inside the headroom
+    assert engine.series[('income', None)] is income
+    assert engine.series[('income', 'Sales')] is sales
+    assert engine.total('income', date(2023, 1, 1), date(2024, 12, 31)) == 850
+    assert engine.total('income', category='Services') == 250
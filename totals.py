@@ -0,0 +1,167 @@
+from datetime import date, timedelta
+
+# Day slots kept free before the first and after the last known day, so
+# backdated and upcoming entries land in the existing trees
+HEADROOM_DAYS = 366
+
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class FenwickTree:
+    def __init__(self, values):
+        # O(n) construction from a dense list of per-slot values
+        self.tree = [0] + list(values)
+        for index in range(1, len(self.tree)):
+            parent = index + (index & -index)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[index]
+
+    @classmethod
+    def zeros(cls, size):
+        tree = cls.__new__(cls)
+        tree.tree = [0] * (size + 1)
+        return tree
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def values(self):
+        # Per-slot values back out of the tree; undoes the O(n) construction
+        values = self.tree[:]
+        for index in range(len(values) - 1, 0, -1):
+            parent = index + (index & -index)
+            if parent < len(values):
+                values[parent] -= values[index]
+        return values[1:]
+
+    def add(self, slot, value):
+        index = slot + 1
+        while index < len(self.tree):
+            self.tree[index] += value
+            index += index & -index
+
+    def prefix_sum(self, slot):
+        # Sum of slots [0, slot]
+        total = 0
+        index = min(slot + 1, len(self.tree) - 1)
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def range_sum(self, first, last):
+        if last < first:
+            return 0
+        return self.prefix_sum(last) - (self.prefix_sum(first - 1) if first > 0 else 0)
+
+
+# Running income/expense totals per type, category and day, in integer cents.
+# Each series is a Fenwick tree over day slots, so adding an entry and asking
+# for the total over any date range are both O(log days) instead of a pass
+# over every entry, and sums stay exact however many entries they cover.
+# All trees share one day range with headroom on both sides; a day outside it
+# doubles the range (amortised O(1) per entry), and a new category only gets
+# a tree of its own.
+class ProfitLossEngine:
+    def __init__(self):
+        self.origin = None
+        self.capacity = 0
+        self.daily = {}
+        self.series = {}
+
+    def add(self, record_type, category, amount_cents, day=None):
+        day = _as_date(day) or date.today()
+        key = (record_type, category, day)
+        self.daily[key] = self.daily.get(key, 0) + amount_cents
+        self._fit(day)
+        slot = self._slot(day)
+        for series_key in ((record_type, None), (record_type, category)):
+            tree = self.series.get(series_key)
+            if tree is None:
+                tree = self.series[series_key] = FenwickTree.zeros(self.capacity)
+            tree.add(slot, amount_cents)
+
+    def total(self, record_type, start=None, end=None, category=None):
+        tree = self.series.get((record_type, category))
+        if tree is None:
+            return 0
+        first = 0 if start is None else max(self._slot(_as_date(start)), 0)
+        last = len(tree) - 1 if end is None else min(self._slot(_as_date(end)), len(tree) - 1)
+        return tree.range_sum(first, last)
+
+    def net(self, start=None, end=None):
+        return self.total('income', start, end) - self.total('expense', start, end)
+
+    def monthly(self, start, end):
+        # [(YYYY-MM, income, expense, net), ...] in cents for every month touching [start, end]
+        start, end = _as_date(start), _as_date(end)
+        months = []
+        month_start = start.replace(day=1)
+        while month_start <= end:
+            next_month = (month_start + timedelta(days=32)).replace(day=1)
+            first = max(month_start, start)
+            last = min(next_month - timedelta(days=1), end)
+            income = self.total('income', first, last)
+            expense = self.total('expense', first, last)
+            months.append((month_start.strftime('%Y-%m'), income, expense, income - expense))
+            month_start = next_month
+        return months
+
+    def load(self, db):
+        self.daily = {}
+        for day, record_type, category, total in db.daily_totals():
+            key = (record_type, category, _as_date(day))
+            self.daily[key] = self.daily.get(key, 0) + total
+        self._rebuild_series()
+        return self
+
+    def rebuild(self, db):
+        # Full repair path: recompute the persisted summary from
+        # financial_records, then reload; returns the drift that was found
+        drift = db.rebuild_daily_totals()
+        self.load(db)
+        return drift
+
+    def _slot(self, day):
+        return (day - self.origin).days
+
+    def _fit(self, day):
+        # Makes room for day, re-basing every tree once when the range must grow
+        if self.origin is None:
+            self.origin = day - timedelta(days=HEADROOM_DAYS)
+            self.capacity = 2 * HEADROOM_DAYS + 1
+            return
+        slot = self._slot(day)
+        if 0 <= slot < self.capacity:
+            return
+        needed = self.capacity + (-slot if slot < 0 else slot - self.capacity + 1)
+        capacity = 2 * self.capacity
+        while capacity < needed:
+            capacity *= 2
+        # The new room goes on the side that ran out
+        shift = capacity - self.capacity if slot < 0 else 0
+        for key, tree in self.series.items():
+            values = [0] * capacity
+            values[shift:shift + self.capacity] = tree.values()
+            self.series[key] = FenwickTree(values)
+        self.origin -= timedelta(days=shift)
+        self.capacity = capacity
+
+    def _rebuild_series(self):
+        if not self.daily:
+            self.origin, self.capacity, self.series = None, 0, {}
+            return
+        days = [day for _, _, day in self.daily]
+        span = (max(days) - min(days)).days + 1
+        self.origin = min(days) - timedelta(days=HEADROOM_DAYS)
+        self.capacity = HEADROOM_DAYS + span + max(span, HEADROOM_DAYS)
+        dense = {}
+        for (record_type, category, day), amount_cents in self.daily.items():
+            slot = self._slot(day)
+            for series_key in ((record_type, None), (record_type, category)):
+                dense.setdefault(series_key, [0] * self.capacity)[slot] += amount_cents
+        self.series = {key: FenwickTree(values) for key, values in dense.items()}
@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from database import BUSY_TIMEOUT, POOL_PRAGMAS
+from money import multiply_cents
+
+# Rows per rowid range handed to one worker, and items per on-hand group
+CHUNK_ROWS = 50000
+ITEM_GROUP = 250
+INTEGRITY_MODES = ('full', 'quick', 'skip')
+# Most problems one PRAGMA integrity_check reports
+INTEGRITY_LIMIT = 100
+ON_HAND_TOLERANCE = 1e-9
+
+# quantity * unit price in cents as Database stores it (money.multiply_cents),
+# in plain SQL for whole quantities so most rows never call back into Python
+EXPECTED_TOTAL = (
+    "CASE WHEN quantity = CAST(quantity AS INTEGER) THEN unit_price_cents * CAST(quantity AS INTEGER) "
+    "ELSE multiply_cents(unit_price_cents, quantity) END"
+)
+# table -> (check name, condition every row must meet, columns reported for a row that does not)
+ROW_CHECKS = {
+    'stock': (
+        'total_price',
+        f"total_price_cents = {EXPECTED_TOTAL}",
+        f"id, date, item_name, quantity, unit_price_cents, total_price_cents, {EXPECTED_TOTAL} AS expected_cents",
+    ),
+    'financial_records': (
+        'category',
+        "EXISTS (SELECT 1 FROM categories "
+        "WHERE categories.type = financial_records.type AND categories.name = financial_records.category)",
+        "id, date, type, category",
+    ),
+}
+# Partial indexes over verified = 0 (migration 7); named explicitly because the
+# planner prefers a rowid range, which reads every checked row to find the few unverified ones
+UNVERIFIED_INDEXES = {'stock': 'idx_stock_unverified', 'financial_records': 'idx_financial_records_unverified'}
+ON_HAND_COLUMNS = ('id', 'date', 'transaction_type', 'item_name', 'quantity')
+# Running on-hand per item in (date, id) order, as InventoryEngine replays it;
+# one row per item whose sales take it below zero, at its lowest point
+ON_HAND_QUERY = """
+    SELECT item_name, id, date, MIN(on_hand), COUNT(*) FROM (
+        SELECT id, date, transaction_type, item_name, SUM(
+            CASE transaction_type WHEN 'Purchase' THEN quantity WHEN 'Sale' THEN -quantity ELSE 0 END
+        ) OVER (PARTITION BY item_name ORDER BY date, id) AS on_hand
+        FROM {stock} WHERE {items}
+    )
+    WHERE transaction_type = 'Sale' AND on_hand < ?
+    GROUP BY item_name"""
+
+
+def _sql_multiply_cents(cents, factor):
+    return None if cents is None or factor is None else multiply_cents(cents, factor)
+
+
+def _pending_rows(table, full):
+    # "FROM ..." text selecting the rows a run checks, ready for one more condition
+    return f"{table} WHERE" if full else f"{table} INDEXED BY {UNVERIFIED_INDEXES[table]} WHERE verified = 0 AND"
+
+
+def _mark_sql(table, condition, full):
+    # Re-applies the check in the writer: a row edited after a worker read it is
+    # only marked if its new values pass too
+    target = table if full else f"{table} INDEXED BY {UNVERIFIED_INDEXES[table]}"
+    mark = (f"UPDATE {target} SET verified = 1 "
+            f"WHERE id BETWEEN ? AND ? AND verified = 0 AND COALESCE({condition}, 0)")
+    if not full:
+        return [mark]
+    return [mark, f"UPDATE {table} SET verified = 0 WHERE id BETWEEN ? AND ? AND verified = 1 "
+                  f"AND NOT COALESCE({condition}, 0)"]
+
+
+# Checks the ledger in parallel and streams every finding to a JSON Lines
+# report:
+#   total_price  stock.total_price_cents == quantity * unit_price_cents
+#   category     financial_records.category exists in categories for its type
+#   on_hand      no sale takes an item's running quantity below zero
+#   integrity    PRAGMA integrity_check (or quick_check)
+# The tables are cut into rowid ranges checked by a thread pool, each thread on
+# its own read-only connection; SQLite does the scanning with the GIL released.
+# Rows that pass are marked verified = 1 by the single writer as each range
+# finishes, and the migration 7 triggers reset the flag on every edit, so an
+# incremental run (the default) reads only new or changed rows and the items
+# they touch. full=True re-checks everything and clears the flag on rows that
+# no longer pass. Needs a pooled (WAL) Database so workers never block the writer.
+class DataVerifier:
+    def __init__(self, db, report_path, workers=None, chunk_rows=CHUNK_ROWS, item_group=ITEM_GROUP,
+                 integrity='full', full=False):
+        if not db.readers:
+            raise ValueError("DataVerifier needs a pooled Database (readers > 0)")
+        if integrity not in INTEGRITY_MODES:
+            raise ValueError(f"Unknown integrity mode {integrity!r}, expected one of {INTEGRITY_MODES}")
+        self.db = db
+        self.report_path = Path(report_path)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self.item_group = item_group
+        self.integrity = integrity
+        self.full = full
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+
+    def _connection(self):
+        # One read-only connection per worker thread, opened on first use
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            uri = f"{self.db.db_path.resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            for pragma in POOL_PRAGMAS:
+                conn.execute(pragma)
+            conn.create_function('multiply_cents', 2, _sql_multiply_cents, deterministic=True)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _close_connections(self):
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+
+    def _ranges(self, conn, table):
+        # (first id, last id) spans of at most chunk_rows rows still to check;
+        # incremental runs walk only the partial index of unverified rows
+        rows = _pending_rows(table, self.full)
+        ranges = []
+        last = -1
+        while True:
+            first = conn.execute(f"SELECT MIN(id) FROM {rows} id > ?", (last,)).fetchone()[0]
+            if first is None:
+                return ranges
+            row = conn.execute(
+                f"SELECT id FROM {rows} id >= ? ORDER BY id LIMIT 1 OFFSET ?",
+                (first, self.chunk_rows - 1)
+            ).fetchone()
+            last = row[0] if row else conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+            ranges.append((first, last))
+
+    def _items(self, conn):
+        # Items whose on-hand history needs checking, and the change count of
+        # those queued in verify_pending_items when the run started
+        pending = dict(conn.execute("SELECT item_name, changes FROM verify_pending_items"))
+        if self.full:
+            items = [item for (item,) in conn.execute("SELECT DISTINCT item_name FROM stock ORDER BY item_name")]
+        else:
+            items = {item for (item,) in conn.execute(
+                f"SELECT DISTINCT item_name FROM stock INDEXED BY {UNVERIFIED_INDEXES['stock']} WHERE verified = 0"
+            )}
+            items = sorted(items.union(pending))
+        return items, pending
+
+    def _check_rows(self, table, first, last):
+        check, condition, columns = ROW_CHECKS[table]
+        source = _pending_rows(table, self.full)
+        conn = self._connection()
+        rows = conn.execute(f"SELECT COUNT(*) FROM {source} id BETWEEN ? AND ?", (first, last)).fetchone()[0]
+        cursor = conn.execute(
+            f"SELECT {columns} FROM {source} id BETWEEN ? AND ? AND NOT COALESCE({condition}, 0)",
+            (first, last)
+        )
+        names = [column[0] for column in cursor.description]
+        findings = [{'check': check, 'table': table, **dict(zip(names, row))} for row in cursor]
+        return rows, findings
+
+    def _check_on_hand(self, items):
+        conn = self._connection()
+        stock = self.db.archives.source(conn, 'stock', columns=ON_HAND_COLUMNS)
+        query = ON_HAND_QUERY.format(stock=stock, items=f"item_name IN ({', '.join('?' * len(items))})")
+        findings = [
+            {'check': 'on_hand', 'table': 'stock', 'item_name': item, 'id': row_id, 'date': day,
+             'lowest_on_hand': on_hand, 'negative_sales': sales}
+            for item, row_id, day, on_hand, sales in conn.execute(query, [*items, -ON_HAND_TOLERANCE])
+        ]
+        return len(items), findings
+
+    def _check_integrity(self):
+        pragma = 'integrity_check' if self.integrity == 'full' else 'quick_check'
+        results = [message for (message,) in self._connection().execute(f"PRAGMA {pragma}({INTEGRITY_LIMIT})")]
+        findings = [{'check': 'integrity', 'message': message} for message in results if message != 'ok']
+        return 1, findings
+
+    def _mark_rows(self, table, first, last):
+        _, condition, _ = ROW_CHECKS[table]
+        with self.db.transaction() as conn:
+            for statement in _mark_sql(table, condition, self.full):
+                conn.execute(statement, (first, last))
+
+    def _mark_items(self, items, findings, pending):
+        # Items that went negative stay queued so the next run reports them
+        # again; the rest leave the queue unless edited since the run started
+        negative = {finding['item_name'] for finding in findings}
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "DELETE FROM verify_pending_items WHERE item_name = ? AND changes = ?",
+                [(item, pending[item]) for item in items if item in pending and item not in negative]
+            )
+            conn.executemany(
+                "INSERT INTO verify_pending_items (item_name) VALUES (?) ON CONFLICT DO NOTHING",
+                [(item,) for item in sorted(negative)]
+            )
+
+    def _jobs(self, pool):
+        # {future: (kind, job arguments)}, integrity first as the longest single job
+        conn = self._connection()
+        jobs = {}
+        if self.integrity != 'skip':
+            jobs[pool.submit(self._check_integrity)] = ('integrity', ())
+        items, pending = self._items(conn)
+        for start in range(0, len(items), self.item_group):
+            group = items[start:start + self.item_group]
+            jobs[pool.submit(self._check_on_hand, group)] = ('on_hand', (group, pending))
+        for table in ROW_CHECKS:
+            for first, last in self._ranges(conn, table):
+                jobs[pool.submit(self._check_rows, table, first, last)] = (table, (first, last))
+        return jobs
+
+    def run(self, progress=None):
+        # Returns a summary dict; progress(done, total, message) is called after
+        # each job and may raise to stop the run (already marked rows stay marked)
+        started = time.perf_counter()
+        summary = {
+            'mode': 'full' if self.full else 'incremental',
+            'checked': {'stock': 0, 'financial_records': 0, 'items': 0, 'integrity': 0},
+            'findings': {check: 0 for check in ('total_price', 'category', 'on_hand', 'integrity')},
+            'report': str(self.report_path),
+        }
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='verifier')
+        try:
+            with open(self.report_path, 'w', encoding='utf-8') as report:
+                report.write(json.dumps({
+                    'database': str(self.db.db_path), 'mode': summary['mode'],
+                    'started_at': datetime.now().isoformat(timespec='seconds'),
+                }) + '\n')
+                jobs = self._jobs(pool)
+                for done, future in enumerate(as_completed(jobs), 1):
+                    kind, arguments = jobs[future]
+                    checked, findings = future.result()
+                    for finding in findings:
+                        report.write(json.dumps(finding, default=str) + '\n')
+                        summary['findings'][finding['check']] += 1
+                    report.flush()
+                    if kind in ROW_CHECKS:
+                        self._mark_rows(kind, *arguments)
+                        summary['checked'][kind] += checked
+                    elif kind == 'on_hand':
+                        self._mark_items(arguments[0], findings, arguments[1])
+                        summary['checked']['items'] += checked
+                    else:
+                        summary['checked']['integrity'] += checked
+                    if progress:
+                        progress(done, len(jobs), f"{done}/{len(jobs)} chunks, "
+                                                  f"{sum(summary['findings'].values())} findings")
+                summary['seconds'] = round(time.perf_counter() - started, 3)
+                report.write(json.dumps({'summary': summary}) + '\n')
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            self._close_connections()
+        logging.info(
+            f"Verified {summary['mode']}: {summary['checked']} checked, {summary['findings']} findings, "
+            f"report {self.report_path}"
+        )
+        return summary
+
+
+def verify_data(db, report_path, progress=None, **options):
+    return DataVerifier(db, report_path, **options).run(progress=progress)